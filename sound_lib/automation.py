@@ -0,0 +1,335 @@
+from __future__ import absolute_import
+
+import bisect
+import math
+import threading
+import time
+from logging import getLogger
+
+from .effects.effect import SoundEffect
+from .external.pybass import BASS_SYNC_POS
+from .main import BassError
+
+logger = getLogger("sound_lib.automation")
+
+
+class Curve(object):
+    """A parameter value over time, given by (seconds, value) points.
+
+    Args:
+        points: A sequence of (seconds, value) pairs, in order.
+        interpolation: How to get from one point to the next: "linear", "step" (hold each value until the next point),
+            or "exponential" (geometric, which sounds even for frequencies and gains; values must be positive). Defaults to "linear".
+        loop (bool): Repeat the curve once it ends. Defaults to False.
+    """
+
+    def __init__(self, points, interpolation="linear", loop=False):
+        if not points:
+            raise ValueError("A curve needs at least one point")
+        if interpolation not in ("linear", "step", "exponential"):
+            raise ValueError("Unknown interpolation %r" % interpolation)
+        self.times = [float(t) for t, v in points]
+        self.values = [float(v) for t, v in points]
+        if self.times != sorted(self.times):
+            raise ValueError("Curve points must be in time order")
+        if interpolation == "exponential" and min(self.values) <= 0:
+            raise ValueError("Exponential curve values must be positive")
+        self.interpolation = interpolation
+        self.loop = loop
+
+    @property
+    def duration(self):
+        """The time of the last point."""
+        return self.times[-1]
+
+    def value_at(self, t):
+        """Retrieves the curve's value at a time.
+
+        Args:
+          t (float): Seconds since the curve started.
+
+        Returns:
+            float: The value.
+        """
+        times, values = self.times, self.values
+        if self.loop and self.duration > 0:
+            t = t % self.duration
+        index = bisect.bisect_right(times, t)
+        if index == 0:
+            return values[0]
+        if index == len(times):
+            return values[-1]
+        if self.interpolation == "step":
+            return values[index - 1]
+        t0, t1 = times[index - 1], times[index]
+        v0, v1 = values[index - 1], values[index]
+        fraction = (t - t0) / (t1 - t0)
+        if self.interpolation == "exponential":
+            return v0 * math.pow(v1 / v0, fraction)
+        return v0 + (v1 - v0) * fraction
+
+
+class Lane(object):
+    """One automated parameter of an effect or channel, as returned by :meth:`Automation.automate`."""
+
+    __slots__ = ("target", "parameter", "curve", "start", "last")
+
+    def __init__(self, target, parameter, curve, start):
+        self.target = target
+        self.parameter = parameter
+        self.curve = curve
+        self.start = start
+        self.last = None
+
+    def finished(self, now):
+        return not self.curve.loop and now - self.start >= self.curve.duration
+
+
+def _check(target, parameter):
+    """Raises ValueError if parameter isn't one of an effect's parameters."""
+    if isinstance(target, SoundEffect):
+        type(target)._check_parameters((parameter,))
+
+
+def _set(target, parameter, value):
+    """Sets an effect parameter or channel attribute."""
+    if isinstance(target, SoundEffect):
+        setattr(target, parameter, value)
+    else:
+        target.set_attribute(parameter, value)
+
+
+class Automation(object):
+    """Plays parameter curves on effects and channel attributes from a single scheduler thread.
+
+    Every tick, each automated target is visited once: all of an effect's lanes are applied
+    together in one :meth:`sound_lib.effects.effect.SoundEffect.batch`, so an effect costs one
+    BASS call per tick however many of its parameters are automated, and values which haven't
+    changed since the last tick aren't sent at all. Lanes which reach the end of a
+    non-looping curve are applied one last time and dropped.
+
+    For sample accuracy, :meth:`set_at` and :meth:`schedule_curve` apply values from mixtime
+    position syncs on a channel instead.
+
+    Args:
+        interval (float): Seconds between ticks. Defaults to 0.005.
+        clock: A callable returning the current time in seconds. Defaults to :func:`time.monotonic`.
+    """
+
+    def __init__(self, interval=0.005, clock=time.monotonic):
+        self.interval = interval
+        self.clock = clock
+        self._lanes = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._running = False
+
+    def automate(self, target, parameter, curve, start=None):
+        """Starts automating a parameter.
+
+        Args:
+          target: A :class:`sound_lib.effects.effect.SoundEffect`, or a channel.
+          parameter (str): An effect parameter name (eg. "cut_off_freq"), or a channel attribute name or BASS_ATTRIB_xxx value.
+          curve: A :class:`Curve`, or a sequence of (seconds, value) points for a linear one.
+          start (float): When the curve starts, on this automation's clock. Defaults to now.
+
+        Returns:
+            Lane: The lane, for :meth:`remove`.
+
+        raises:
+            ValueError: If target is an effect without this parameter.
+        """
+        _check(target, parameter)
+        if not isinstance(curve, Curve):
+            curve = Curve(curve)
+        if start is None:
+            start = self.clock()
+        lane = Lane(target, parameter, curve, start)
+        with self._lock:
+            # Replace any existing lane for the same parameter
+            self._lanes = [
+                l
+                for l in self._lanes
+                if not (l.target is target and l.parameter == parameter)
+            ]
+            self._lanes.append(lane)
+        self._wakeup.set()
+        return lane
+
+    def remove(self, lane):
+        """Stops automating a parameter, leaving it at its current value.
+
+        Args:
+          lane: A lane returned by :meth:`automate`.
+        """
+        with self._lock:
+            self._lanes = [l for l in self._lanes if l is not lane]
+
+    def clear(self, target=None):
+        """Stops automating every parameter, or just those of one target.
+
+        Args:
+          target: An effect or channel. Defaults to None, for everything.
+        """
+        with self._lock:
+            if target is None:
+                self._lanes = []
+            else:
+                self._lanes = [l for l in self._lanes if l.target is not target]
+
+    @property
+    def lanes(self):
+        """The lanes currently automated."""
+        return list(self._lanes)
+
+    def tick(self, now=None):
+        """Applies every lane's value for the current time. Called by the scheduler thread, or directly from a game loop.
+
+        Args:
+          now (float): The time on this automation's clock. Defaults to now.
+
+        Returns:
+            int: The number of targets updated.
+        """
+        if now is None:
+            now = self.clock()
+        groups = {}
+        for lane in self._lanes:
+            if now >= lane.start:
+                groups.setdefault(id(lane.target), []).append(lane)
+        finished = []
+        updated = 0
+        for group in groups.values():
+            target = group[0].target
+            # Anything going wrong with one target drops its lanes, rather than stopping the
+            # scheduler thread and with it every other target's automation
+            try:
+                changed = []
+                for lane in group:
+                    value = lane.curve.value_at(now - lane.start)
+                    if lane.finished(now):
+                        finished.append(lane)
+                    if value != lane.last:
+                        lane.last = value
+                        changed.append(lane)
+                if not changed:
+                    continue
+                if isinstance(target, SoundEffect):
+                    with target.batch():
+                        for lane in changed:
+                            setattr(target, lane.parameter, lane.last)
+                else:
+                    for lane in changed:
+                        target.set_attribute(lane.parameter, lane.last)
+                updated += 1
+            except BassError:
+                # The channel or effect has probably been freed
+                logger.exception("Unable to automate %r, dropping its lanes", target)
+                self.clear(target)
+            except Exception:
+                logger.exception("Error automating %r, dropping its lanes", target)
+                self.clear(target)
+        if finished:
+            with self._lock:
+                self._lanes = [l for l in self._lanes if l not in finished]
+        return updated
+
+    def start(self):
+        """Starts the scheduler thread."""
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="Automation")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stops the scheduler thread."""
+        thread = self._thread
+        if thread is None:
+            return
+        self._running = False
+        self._wakeup.set()
+        thread.join()
+        self._thread = None
+
+    def _run(self):
+        next_tick = self.clock()
+        while self._running:
+            if not self._lanes:
+                # Sleep until there is something to do
+                self._wakeup.wait()
+                self._wakeup.clear()
+                next_tick = self.clock()
+                continue
+            self.tick()
+            next_tick += self.interval
+            delay = next_tick - self.clock()
+            if delay < 0:
+                # Running behind: skip the missed ticks rather than bunching them up
+                next_tick = self.clock()
+                continue
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+
+    def set_at(self, channel, seconds, target, parameter, value):
+        """Sets a parameter when a channel reaches a position, with sample accuracy.
+
+        The value is applied from a one-time mixtime position sync, as the channel's
+        data at that position is being processed, rather than by the scheduler thread.
+
+        Args:
+          channel: The channel whose position triggers the change.
+          seconds (float): The position in the channel.
+          target: A :class:`sound_lib.effects.effect.SoundEffect`, or a channel.
+          parameter (str): An effect parameter name, or a channel attribute name or BASS_ATTRIB_xxx value.
+          value (float): The value to set.
+
+        Returns:
+            int: The sync's handle.
+
+        raises:
+            ValueError: If target is an effect without this parameter.
+        """
+        _check(target, parameter)
+
+        def apply(handle, channel_handle, data, user):
+            try:
+                _set(target, parameter, value)
+            except BassError:
+                logger.exception("Unable to set %s at %.3fs", parameter, seconds)
+
+        return channel.set_sync(
+            BASS_SYNC_POS,
+            channel.seconds_to_bytes(seconds),
+            apply,
+            mixtime=True,
+            onetime=True,
+        )
+
+    def schedule_curve(self, channel, target, parameter, curve, offset=0.0):
+        """Sets a parameter to each point of a curve as a channel reaches it, with sample accuracy.
+
+        Values change in steps at the curve's points; add points for smoother changes.
+
+        Args:
+          channel: The channel whose position drives the curve.
+          target: A :class:`sound_lib.effects.effect.SoundEffect`, or a channel.
+          parameter (str): An effect parameter name, or a channel attribute name or BASS_ATTRIB_xxx value.
+          curve: A :class:`Curve`, or a sequence of (seconds, value) points.
+          offset (float): The position in the channel the curve starts at. Defaults to 0.
+
+        Returns:
+            list: The syncs' handles.
+
+        raises:
+            ValueError: If target is an effect without this parameter.
+        """
+        _check(target, parameter)
+        if not isinstance(curve, Curve):
+            curve = Curve(curve)
+        return [
+            self.set_at(channel, offset + t, target, parameter, value)
+            for t, value in zip(curve.times, curve.values)
+        ]
@@ -0,0 +1,151 @@
+from __future__ import absolute_import
+
+from .channel import Channel
+from .external import pybassmix
+from .external.pybass import BASS_ATTRIB_VOL, BASS_STREAM_DECODE
+from .main import bass_call
+from .mixer import Mixer
+from .stream import BaseStream
+
+
+class Bus(Mixer):
+    """A submix: a decoding mixer which sources are routed to, itself plugged into a parent mixer.
+
+    Effects added to a bus process the bus's mix once, rather than once per source, so sharing
+    a reverb or echo between dozens of sounds costs the same as applying it to one.
+    Buses can feed other buses.
+
+    Example:
+        master = Mixer(float=True)
+        ambience = Bus(master)
+        ambience.add_effect(Reverb, reverb_time=2000)
+        ambience.route(FileStream(file="wind.ogg", decode=True))
+        master.play()
+
+    Args:
+        parent: The :class:`sound_lib.mixer.Mixer` (or Bus) this bus is mixed into.
+        freq (int): Sample rate of the bus. Defaults to the parent's.
+        chans (int): Number of channels in the bus. Defaults to the parent's.
+        float (bool): Mix in 32-bit floating-point. Defaults to True.
+        nonstop (bool): Keep feeding the parent when no sources are playing, so effect tails such
+            as reverb decay aren't cut off. Defaults to True.
+    """
+
+    __slots__ = ("parent", "effects", "sends")
+
+    def __init__(self, parent, freq=None, chans=None, float=True, nonstop=True):
+        if freq is None or chans is None:
+            info = parent.get_info()
+            freq = freq or info.freq
+            chans = chans or info.chans
+        super(Bus, self).__init__(
+            freq=freq, chans=chans, float=float, nonstop=nonstop, decode=True
+        )
+        self.parent = parent
+        self.effects = []
+        self.sends = {}
+        parent.add_channel(self, norampin=True)
+
+    def add_effect(self, effect_class, priority=0, **parameters):
+        """Applies an effect to everything routed to this bus.
+
+        Args:
+          effect_class: A :class:`sound_lib.effects.effect.SoundEffect` subclass.
+          priority (int): Effects with higher priority are applied first. Defaults to 0.
+          **parameters: Initial values for the effect's parameters, by attribute name.
+
+        Returns:
+            The effect.
+
+        raises:
+            ValueError: If a parameter isn't one of the effect's.
+        """
+        effect_class._check_parameters(parameters)
+        effect = effect_class(self, priority=priority)
+        if parameters:
+            with effect.batch():
+                for name, value in parameters.items():
+                    setattr(effect, name, value)
+        self.effects.append(effect)
+        return effect
+
+    def remove_effect(self, effect):
+        """Removes an effect added with :meth:`add_effect`.
+
+        Args:
+          effect: The effect.
+        """
+        self.effects.remove(effect)
+        return effect.remove()
+
+    def route(self, channel, **kwargs):
+        """Sends a decoding channel to this bus, taking it out of any mixer it is already in.
+
+        Args:
+          channel: The channel to route. Can take both a sound_lib.channel or bass handle.
+          **kwargs: Options for :meth:`sound_lib.mixer.Mixer.add_channel`.
+
+        Returns:
+            bool: True on success.
+        """
+        handle = channel.handle if isinstance(channel, Channel) else channel
+        current = pybassmix.BASS_Mixer_ChannelGetMixer(handle)
+        if current == self.handle:
+            return True
+        if current:
+            bass_call(pybassmix.BASS_Mixer_ChannelRemove, handle)
+        return self.add_channel(handle, **kwargs)
+
+    def unroute(self, channel):
+        """Takes a channel out of this bus.
+
+        Args:
+          channel: The channel. Can take both a sound_lib.channel or bass handle.
+        """
+        return self.remove_channel(channel)
+
+    def send(self, channel, level=1.0):
+        """Feeds a copy of a decoding channel into this bus at a given level, like an aux send.
+
+        The copy is a splitter stream, so one source can be sent to several buses. A source
+        which is sent anywhere should reach all its buses through sends (eg. a send at level 1
+        to its dry bus), rather than also being routed directly.
+        Sending the same channel again just changes the level.
+
+        Args:
+          channel: The decoding channel to send.
+          level (float): Volume of the send, 0 (silent) to 1 (full). Defaults to 1.
+
+        Returns:
+            BaseStream: The splitter stream feeding this bus.
+        """
+        handle = channel.handle if isinstance(channel, Channel) else channel
+        split = self.sends.get(handle)
+        if split is None:
+            split = BaseStream(
+                bass_call(
+                    pybassmix.BASS_Split_StreamCreate, handle, BASS_STREAM_DECODE, None
+                )
+            )
+            self.add_channel(split, norampin=True)
+            self.sends[handle] = split
+        split.set_attribute(BASS_ATTRIB_VOL, level)
+        return split
+
+    def remove_send(self, channel):
+        """Stops sending a channel to this bus, freeing its splitter stream.
+
+        Args:
+          channel: The channel passed to :meth:`send`.
+        """
+        handle = channel.handle if isinstance(channel, Channel) else channel
+        split = self.sends.pop(handle)
+        return split.free()
+
+    def free(self):
+        """Frees the bus, its effects and sends. Its sources are removed from it but not freed."""
+        for split in list(self.sends.values()):
+            split.free()
+        self.sends.clear()
+        del self.effects[:]
+        return super(Bus, self).free()
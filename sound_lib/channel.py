@@ -1,5 +1,7 @@
 from __future__ import absolute_import
-from typing import Any, Dict, List, Optional, Union
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Union
 from .external.pybass import (
     BASS_ACTIVE_PAUSED,
     BASS_ACTIVE_PAUSED_DEVICE,
@@ -39,6 +41,10 @@ from .external.pybass import (
     BASS_ChannelSetFX,
     BASS_ChannelSetLink,
     BASS_ChannelSetPosition,
+    BASS_ChannelSetSync,
+    BASS_ChannelRemoveSync,
+    BASS_ChannelSetDSP,
+    BASS_ChannelRemoveDSP,
     BASS_ChannelSlideAttribute,
     BASS_ChannelStop,
     BASS_ChannelUpdate,
@@ -51,12 +57,22 @@ from .external.pybass import (
     BASS_POS_BYTE,
     BASS_POS_DECODE,
     BASS_SAMPLE_LOOP,
+    BASS_SYNC_MIXTIME,
+    BASS_SYNC_ONETIME,
     BASS_3DVECTOR,
+    SYNCPROC,
+    DSPPROC,
 )
 from .main import BassError, FlagObject, bass_call, bass_call_0, update_3d_system
+from .registry import registry
 from ctypes import c_buffer, c_float, c_long, c_ulong, pointer, sizeof
 
 
+def _on_bass_thread() -> bool:
+    """Whether this is one of BASS's threads, eg. running a callback, rather than one started by Python."""
+    return isinstance(threading.current_thread(), threading._DummyThread)
+
+
 class Channel(FlagObject):
     """A "channel" represents an audio stream that can be manipulated.
 
@@ -67,13 +83,26 @@ class Channel(FlagObject):
     - A recording (HRECORD)
 
     Most audio playback and manipulation in sound_lib is done through Channel objects.
-    """
 
-    attribute_mapping: Dict[str, int] = {}
+    Every channel is tracked by :data:`sound_lib.registry.registry`. One that is garbage collected
+    without being freed has its handle freed in the background by :data:`sound_lib.finalizer.reaper`.
+    """
 
-    def __init__(self, handle: int) -> None:
-        self.handle = handle
-        self.attribute_mapping = {
+    __slots__ = (
+        "handle",
+        "_syncs",
+        "_fired_syncs",
+        "_dsps",
+        "_registration",
+        "_instance_attributes",
+        "__weakref__",
+    )
+
+    #: The BASS function used to free this kind of channel, or None if it can't be freed.
+    _free_function: Any = BASS_ChannelFree
+
+    attribute_mapping: Mapping[str, int] = MappingProxyType(
+        {
             "eaxmix": BASS_ATTRIB_EAXMIX,
             "frequency": BASS_ATTRIB_FREQ,
             "pan": BASS_ATTRIB_PAN,
@@ -81,9 +110,21 @@ class Channel(FlagObject):
             "byte": BASS_POS_BYTE,
             "decode": BASS_POS_DECODE,
         }
+    )
+
+    def __init__(self, handle: int) -> None:
+        self.handle = handle
+        self._registration = registry.track(self, handle, self._free_function)
 
     def add_attributes_to_mapping(self, **attrs: int) -> None:
-        self.attribute_mapping.update(**attrs)
+        """Extends the attribute mapping of this instance only.
+        Subclasses should define a class-level attribute_mapping instead, which is shared by all their instances.
+        """
+        self._instance_attributes = MappingProxyType(dict(self._attributes(), **attrs))
+
+    def _attributes(self) -> Mapping[str, int]:
+        """The attribute mapping of this instance: the class's, plus any added with :meth:`add_attributes_to_mapping`."""
+        return getattr(self, "_instance_attributes", self.attribute_mapping)
 
     def play(self, restart: bool = False) -> Any:
         """Starts (or resumes) playback of a sample, stream, MOD music, or recording.
@@ -326,8 +367,8 @@ class Channel(FlagObject):
                 Some attributes have additional possible instances where an exception might be raised.
         """
         value = pointer(c_float())
-        if isinstance(attribute, str) and attribute in self.attribute_mapping:
-            attribute = self.attribute_mapping[attribute]
+        if isinstance(attribute, str) and attribute in self._attributes():
+            attribute = self._attributes()[attribute]
         bass_call(BASS_ChannelGetAttribute, self.handle, attribute, value)
         return value.contents.value
 
@@ -344,8 +385,8 @@ class Channel(FlagObject):
         raises:
             sound_lib.main.BassError: If either attribute or value is invalid.
         """
-        if isinstance(attribute, str) and attribute in self.attribute_mapping:
-            attribute = self.attribute_mapping[attribute]
+        if isinstance(attribute, str) and attribute in self._attributes():
+            attribute = self._attributes()[attribute]
         return bass_call(BASS_ChannelSetAttribute, self.handle, attribute, value)
 
     def get_attribute_ex(self, attribute: Union[str, int], size: Optional[int] = None) -> Optional[bytes]:
@@ -361,8 +402,8 @@ class Channel(FlagObject):
         raises:
             sound_lib.main.BassError: If attribute is invalid or not available
         """
-        if isinstance(attribute, str) and attribute in self.attribute_mapping:
-            attribute = self.attribute_mapping[attribute]
+        if isinstance(attribute, str) and attribute in self._attributes():
+            attribute = self._attributes()[attribute]
 
         # If size not provided, query it first
         if size is None:
@@ -395,8 +436,8 @@ class Channel(FlagObject):
         raises:
             sound_lib.main.BassError: If attribute is invalid or data is malformed
         """
-        if isinstance(attribute, str) and attribute in self.attribute_mapping:
-            attribute = self.attribute_mapping[attribute]
+        if isinstance(attribute, str) and attribute in self._attributes():
+            attribute = self._attributes()[attribute]
 
         # Convert data to ctypes buffer if needed
         if isinstance(data, bytes):
@@ -425,8 +466,8 @@ class Channel(FlagObject):
         raises:
             sound_lib.main.BassError: If attribute is invalid, or the attributes value is set to go from positive to negative or vice versa when the BASS_SLIDE_LOG flag is used.
         """
-        if isinstance(attribute, str) and attribute in self.attribute_mapping:
-            attribute = self.attribute_mapping[attribute]
+        if isinstance(attribute, str) and attribute in self._attributes():
+            attribute = self._attributes()[attribute]
         return bass_call(
             BASS_ChannelSlideAttribute, self.handle, attribute, value, time * 1000
         )
@@ -649,6 +690,12 @@ class Channel(FlagObject):
         )
         return answer
 
+    def _get_position(self) -> BASS_3DVECTOR:
+        """Retrieves just the position part of this channel's 3d position."""
+        position = BASS_3DVECTOR()
+        bass_call(BASS_ChannelGet3DPosition, self.handle, pointer(position), None, None)
+        return position
+
     @update_3d_system
     def set_3d_position(self, position: Optional[Any] = None, orientation: Optional[Any] = None, velocity: Optional[Any] = None) -> Any:
         """Sets the 3D position of a sample, stream, or MOD music channel with 3D functionality.
@@ -789,6 +836,141 @@ class Channel(FlagObject):
         bass_call_0(BASS_ChannelGetData, self.handle, pointer(buf), length)
         return buf
 
+    def set_sync(
+        self,
+        type: int,
+        param: int,
+        callback: Any,
+        user: Any = None,
+        mixtime: bool = False,
+        onetime: bool = False,
+    ) -> int:
+        """Sets up a synchronizer on this channel.
+
+        Args:
+          type (int): The type of sync (BASS_SYNC_xxx).
+          param (int): The sync parameter, its meaning depends on the sync type.
+          callback: A function taking (handle, channel, data, user) to call when the sync is triggered.
+          user: User instance data to pass to the callback. Defaults to None.
+          mixtime (bool): Call the callback when the sync occurs in the mix, rather than when it is heard. Defaults to False.
+          onetime (bool): Only call the callback once. Defaults to False.
+
+        Returns:
+            int: The new sync's handle.
+
+        raises:
+            sound_lib.main.BassError: If the sync type or parameter is invalid, or not supported by this channel.
+        """
+        if mixtime:
+            type |= BASS_SYNC_MIXTIME
+        self._release_fired_syncs()
+        syncs = getattr(self, "_syncs", None)
+        if syncs is None:
+            syncs = self._syncs = {}
+        fired_syncs = getattr(self, "_fired_syncs", None)
+        if fired_syncs is None:
+            fired_syncs = self._fired_syncs = []
+        fired = []
+        if onetime:
+            type |= BASS_SYNC_ONETIME
+            sync_callback = callback
+
+            def callback(handle, channel, data, user):
+                # BASS removes a one-time sync once it fires, so stop keeping its callback, but
+                # only once it has surely returned: see _release_fired_syncs
+                try:
+                    return sync_callback(handle, channel, data, user)
+                finally:
+                    fired.append(handle)
+                    proc = syncs.pop(handle, None)
+                    if proc is not None:
+                        fired_syncs.append(proc)
+
+        proc = SYNCPROC(callback)
+        sync = bass_call(
+            BASS_ChannelSetSync, self.handle, type & 0xFFFFFFFF, param, proc, user
+        )
+        # The callback must stay alive for as long as the sync exists
+        syncs[sync] = proc
+        if fired:
+            # A mixtime sync may fire before BASS_ChannelSetSync even returns
+            proc = syncs.pop(sync, None)
+            if proc is not None:
+                fired_syncs.append(proc)
+        return sync
+
+    def _release_fired_syncs(self) -> None:
+        # The callbacks of one-time syncs which have fired are kept until the channel is next
+        # changed from one of Python's threads, as BASS may still have been returning from them.
+        # Never from BASS's own threads, which may be running one of them
+        fired_syncs = getattr(self, "_fired_syncs", None)
+        if fired_syncs and not _on_bass_thread():
+            del fired_syncs[:]
+
+    def remove_sync(self, sync: int) -> Any:
+        """Removes a synchronizer from this channel.
+
+        Args:
+          sync (int): The handle returned by set_sync.
+
+        Returns:
+            bool: True on success, False otherwise.
+
+        raises:
+            sound_lib.main.BassError: If the sync handle is invalid.
+        """
+        syncs = getattr(self, "_syncs", None)
+        if syncs is not None:
+            syncs.pop(sync, None)
+        res = bass_call(BASS_ChannelRemoveSync, self.handle, sync)
+        self._release_fired_syncs()
+        return res
+
+    def set_dsp(self, callback: Any, user: Any = None, priority: int = 0) -> int:
+        """Sets up a user DSP function on this channel.
+
+        The callback is given the channel's sample data just before it is played or returned by a
+        decoding channel, and modifies it in place. It is called from a BASS thread, and should
+        return quickly.
+
+        Args:
+          callback: A function taking (handle, channel, buffer, length, user), where buffer is the address of the sample data and length its size in bytes.
+          user: User instance data to pass to the callback. Defaults to None.
+          priority (int): DSP functions and effects with higher priority are applied first. Defaults to 0.
+
+        Returns:
+            int: The new DSP's handle.
+
+        raises:
+            sound_lib.main.BassError: If this channel's handle is invalid.
+        """
+        proc = DSPPROC(callback)
+        dsp = bass_call(BASS_ChannelSetDSP, self.handle, proc, user, priority)
+        # The callback must stay alive for as long as the DSP is set
+        dsps = getattr(self, "_dsps", None)
+        if dsps is None:
+            dsps = self._dsps = {}
+        dsps[dsp] = proc
+        return dsp
+
+    def remove_dsp(self, dsp: int) -> Any:
+        """Removes a DSP function from this channel.
+
+        Args:
+          dsp (int): The handle returned by set_dsp.
+
+        Returns:
+            bool: True on success, False otherwise.
+
+        raises:
+            sound_lib.main.BassError: If the DSP handle is invalid.
+        """
+        result = bass_call(BASS_ChannelRemoveDSP, self.handle, dsp)
+        dsps = getattr(self, "_dsps", None)
+        if dsps is not None:
+            dsps.pop(dsp, None)
+        return result
+
     def get_looping(self) -> bool:
         """Returns whether this channel is currently setup to loop."""
         return bass_call_0(BASS_ChannelFlags, self.handle, BASS_SAMPLE_LOOP, 0) == 20
@@ -813,13 +995,10 @@ class Channel(FlagObject):
         Returns:
             bool: True on success, False on failure.
         """
-        return bass_call(BASS_ChannelFree, self.handle)
-
-    def __del__(self) -> None:
-        try:
-            self.free()
-        except:
-            pass
+        registry.untrack(getattr(self, "_registration", None))
+        res = bass_call(self._free_function, self.handle)
+        self._release_fired_syncs()
+        return res
 
     def get_x(self) -> float:
         """Retrieves this channel's position on the X-axis, if 3d functionality is available.
@@ -827,7 +1006,7 @@ class Channel(FlagObject):
         raises:
             sound_lib.main.BassError: If this channel was not initialized with support for 3d functionality.
         """
-        return self.get_3d_position()["position"].x
+        return self._get_position().x
 
     def set_x(self, val: float) -> None:
         """Sets positioning of this channel on the X-axis, if 3d functionality is available.
@@ -838,9 +1017,9 @@ class Channel(FlagObject):
         raises:
             sound_lib.main.BassError: If this channel was not initialized with support for 3d functionality.
         """
-        pos = self.get_3d_position()
-        pos["position"].x = val
-        self.set_3d_position(**pos)
+        pos = self._get_position()
+        pos.x = val
+        self.set_3d_position(position=pos)
 
     x = property(fget=get_x, fset=set_x)
 
@@ -850,7 +1029,7 @@ class Channel(FlagObject):
         raises:
             sound_lib.main.BassError: If this channel was not initialized with support for 3d functionality.
         """
-        return self.get_3d_position()["position"].y
+        return self._get_position().y
 
     def set_y(self, val: float) -> None:
         """Sets positioning of this channel on the Y-axis, if 3d functionality is available.
@@ -861,9 +1040,9 @@ class Channel(FlagObject):
         raises:
             sound_lib.main.BassError: If this channel was not initialized with support for 3d functionality.
         """
-        pos = self.get_3d_position()
-        pos["position"].y = val
-        self.set_3d_position(**pos)
+        pos = self._get_position()
+        pos.y = val
+        self.set_3d_position(position=pos)
 
     y = property(fget=get_y, fset=set_y)
 
@@ -873,7 +1052,7 @@ class Channel(FlagObject):
         raises:
             sound_lib.main.BassError: If this channel was not initialized with support for 3d functionality.
         """
-        return self.get_3d_position()["position"].z
+        return self._get_position().z
 
     def set_z(self, val: float) -> None:
         """Sets positioning of this channel on the Z-axis, if 3d functionality is available.
@@ -884,16 +1063,16 @@ class Channel(FlagObject):
         raises:
             sound_lib.main.BassError: If this channel was not initialized with support for 3d functionality.
         """
-        pos = self.get_3d_position()
-        pos["position"].z = val
-        self.set_3d_position(**pos)
+        pos = self._get_position()
+        pos.z = val
+        self.set_3d_position(position=pos)
 
     z = property(fget=get_z, fset=set_z)
 
     def get_attributes(self) -> Dict[str, float]:
         """Retrieves all values of all attributes from this object and displays them in a dictionary whose keys are determined by this object's attribute_mapping"""
         res = {}
-        for k in self.attribute_mapping:
+        for k in self._attributes():
             try:
                 res[k] = self.get_attribute(k)
             except BassError:
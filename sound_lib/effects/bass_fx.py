@@ -1,9 +1,37 @@
 from __future__ import absolute_import
-from ..external import pybass_fx
+
+import ctypes
+
+from ..external import pybass, pybass_fx
+from ..main import bass_call
 from .effect import SoundEffect
 
 """ Effects from bass_fx """
 
+#: Apply an effect to every channel. Most effects take BASS_BFX_CHANxxx flags for their channel parameter.
+ALL_CHANNELS = pybass_fx.BASS_BFX_CHANALL
+
+
+class Rotate(SoundEffect):
+    """Rotates the sound between the left and right channels."""
+
+    effect_type = pybass_fx.BASS_FX_BFX_ROTATE
+    struct = pybass_fx.BASS_BFX_ROTATE
+
+
+class Echo(SoundEffect):
+    """ """
+
+    effect_type = pybass_fx.BASS_FX_BFX_ECHO
+    struct = pybass_fx.BASS_BFX_ECHO
+
+
+class Flanger(SoundEffect):
+    """ """
+
+    effect_type = pybass_fx.BASS_FX_BFX_FLANGER
+    struct = pybass_fx.BASS_BFX_FLANGER
+
 
 class Volume(SoundEffect):
     """ """
@@ -13,14 +41,309 @@ class Volume(SoundEffect):
 
 
 class PeakEq(SoundEffect):
-    """ """
+    """A parametric equalizer with any number of peaking bands in a single effect.
+
+    Each band is set separately, and bass_fx only keeps as many bands as the highest one set.
+    Band 0 is also reachable through the effect's attributes (center, gain, ...).
+
+    Example:
+        eq = PeakEq(stream)
+        low = eq.add_band(center=125, gain=3)
+        high = eq.add_band(center=8000, gain=-2)
+        with eq.batch():
+            eq.set_band(low, gain=4)
+            eq.set_band(high, gain=-4)
+    """
 
     effect_type = pybass_fx.BASS_FX_BFX_PEAKEQ
     struct = pybass_fx.BASS_BFX_PEAKEQ
 
+    def __init__(self, channel, type=None, priority=0):
+        self._bands = {}
+        self._free_bands = []
+        super(PeakEq, self).__init__(channel, type, priority)
+
+    def _band(self, band):
+        params = self._bands.get(band)
+        if params is None:
+            params = self.struct(lBand=band)
+            if not pybass.BASS_FXGetParameters(self.handle, ctypes.pointer(params)):
+                # Not set yet: a flat band
+                params = self.struct(band, 1.0, 0.0, 1000.0, 0.0, ALL_CHANNELS)
+            self._bands[band] = params
+        return params
+
+    def _cached_parameters(self):
+        return self._band(0)
+
+    def _load(self, params):
+        params.lBand = 0
+        self._bands[0] = params
+        self._apply(params)
+
+    def get_parameters(self):
+        """Retrieves the parameters of band 0 from BASS, refreshing the cached copy."""
+        self._bands.pop(0, None)
+        return super(PeakEq, self).get_parameters()
+
+    @property
+    def bands(self):
+        """The bands in use, in order."""
+        return sorted(band for band in self._bands if band not in self._free_bands)
+
+    def add_band(self, center, gain=0.0, bandwidth=1.0, q=0.0, channel=ALL_CHANNELS):
+        """Adds a band, reusing a removed one if there is one.
+
+        Args:
+          center (float): Center frequency in Hz.
+          gain (float): Gain in dB, -15 to +15. Defaults to 0.
+          bandwidth (float): Bandwidth in octaves, 0.1 to 10, or 0 to use q instead. Defaults to 1.
+          q (float): Q, 0 to 1, used when bandwidth is 0. Defaults to 0.
+          channel (int): BASS_BFX_CHANxxx flags. Defaults to all channels.
+
+        Returns:
+            int: The band's index.
+        """
+        if self._free_bands:
+            band = self._free_bands.pop(0)
+        else:
+            band = max(self._bands) + 1 if self._bands else 0
+        self.set_band(
+            band, center=center, gain=gain, bandwidth=bandwidth, q=q, channel=channel
+        )
+        return band
+
+    def set_band(self, band, center=None, gain=None, bandwidth=None, q=None, channel=None):
+        """Changes some of a band's parameters, leaving the rest as they are.
+
+        Args:
+          band (int): The band's index.
+          center (float): Center frequency in Hz.
+          gain (float): Gain in dB, -15 to +15.
+          bandwidth (float): Bandwidth in octaves, or 0 to use q instead.
+          q (float): Q, used when bandwidth is 0.
+          channel (int): BASS_BFX_CHANxxx flags.
+        """
+        params = self._band(band)
+        for field, value in (
+            ("fCenter", center),
+            ("fGain", gain),
+            ("fBandwidth", bandwidth),
+            ("fQ", q),
+            ("lChannel", channel),
+        ):
+            if value is not None:
+                setattr(params, field, value)
+        if band in self._free_bands:
+            self._free_bands.remove(band)
+        self._apply(params)
+
+    def get_band(self, band):
+        """Retrieves a band's parameters.
+
+        Args:
+          band (int): The band's index.
+
+        Returns:
+            dict: The band's center, gain, bandwidth, q and channel.
+        """
+        params = self._band(band)
+        return {
+            "center": params.fCenter,
+            "gain": params.fGain,
+            "bandwidth": params.fBandwidth,
+            "q": params.fQ,
+            "channel": params.lChannel,
+        }
+
+    def remove_band(self, band):
+        """Flattens a band and makes it available to :meth:`add_band` again.
+
+        bass_fx can't drop a band, so it stays in the effect with 0 dB gain.
+
+        Args:
+          band (int): The band's index.
+        """
+        self.set_band(band, gain=0.0)
+        self._free_bands.append(band)
+        self._free_bands.sort()
+
+
+class Reverb(SoundEffect):
+    """ """
+
+    effect_type = pybass_fx.BASS_FX_BFX_REVERB
+    struct = pybass_fx.BASS_BFX_REVERB
+
+
+class LPF(SoundEffect):
+    """ """
+
+    effect_type = pybass_fx.BASS_FX_BFX_LPF
+    struct = pybass_fx.BASS_BFX_LPF
+
+
+class Mix(SoundEffect):
+    """Swaps, remaps and mixes channels.
+
+    Args:
+      channel: The channel to apply the effect to.
+      mapping: For each of the channel's channels, the BASS_BFX_CHANxxx flags of the source channels to mix into it.
+        Defaults to None, to set it later with :meth:`set_mapping`.
+    """
+
+    effect_type = pybass_fx.BASS_FX_BFX_MIX
+    struct = pybass_fx.BASS_BFX_MIX
+
+    def __init__(self, channel, mapping=None, type=None, priority=0):
+        super(Mix, self).__init__(channel, type, priority)
+        self._mapping = None
+        if mapping is not None:
+            self.set_mapping(mapping)
+
+    def set_mapping(self, mapping):
+        """Sets which source channels are mixed into each output channel.
+
+        Args:
+          mapping: A BASS_BFX_CHANxxx flag combination for each channel, eg. (BASS_BFX_CHAN2, BASS_BFX_CHAN1) to swap stereo channels.
+        """
+        self._mapping = tuple(mapping)
+        array = (ctypes.c_int * len(self._mapping))(*self._mapping)
+        # The structure keeps the array alive for as long as it is cached
+        self._params = self.struct(array)
+        self._apply(self._params)
+
+    def get_mapping(self):
+        """Retrieves the mapping last set with :meth:`set_mapping`, or None."""
+        return self._mapping
+
 
 class DAmp(SoundEffect):
     """ """
 
     effect_type = pybass_fx.BASS_FX_BFX_DAMP
     struct = pybass_fx.BASS_BFX_DAMP
+
+
+class AutoWah(SoundEffect):
+    """ """
+
+    effect_type = pybass_fx.BASS_FX_BFX_AUTOWAH
+    struct = pybass_fx.BASS_BFX_AUTOWAH
+
+
+class Echo2(SoundEffect):
+    """ """
+
+    effect_type = pybass_fx.BASS_FX_BFX_ECHO2
+    struct = pybass_fx.BASS_BFX_ECHO2
+
+
+class Phaser(SoundEffect):
+    """ """
+
+    effect_type = pybass_fx.BASS_FX_BFX_PHASER
+    struct = pybass_fx.BASS_BFX_PHASER
+
+
+class Echo3(SoundEffect):
+    """ """
+
+    effect_type = pybass_fx.BASS_FX_BFX_ECHO3
+    struct = pybass_fx.BASS_BFX_ECHO3
+
+
+class Chorus(SoundEffect):
+    """ """
+
+    effect_type = pybass_fx.BASS_FX_BFX_CHORUS
+    struct = pybass_fx.BASS_BFX_CHORUS
+
+
+class APF(SoundEffect):
+    """All pass filter."""
+
+    effect_type = pybass_fx.BASS_FX_BFX_APF
+    struct = pybass_fx.BASS_BFX_APF
+
+
+class Compressor(SoundEffect):
+    """ """
+
+    effect_type = pybass_fx.BASS_FX_BFX_COMPRESSOR
+    struct = pybass_fx.BASS_BFX_COMPRESSOR
+
+
+class Distortion(SoundEffect):
+    """ """
+
+    effect_type = pybass_fx.BASS_FX_BFX_DISTORTION
+    struct = pybass_fx.BASS_BFX_DISTORTION
+
+
+class Compressor2(SoundEffect):
+    """A compressor with threshold and gain in dB, ratio, attack and release."""
+
+    effect_type = pybass_fx.BASS_FX_BFX_COMPRESSOR2
+    struct = pybass_fx.BASS_BFX_COMPRESSOR2
+
+
+class VolumeEnv(SoundEffect):
+    """A volume envelope, changing the volume over time along a series of nodes.
+
+    Example:
+        fade = VolumeEnv(stream)
+        fade.set_nodes([(0, 0.0), (2, 1.0), (10, 1.0), (12, 0.0)])
+    """
+
+    effect_type = pybass_fx.BASS_FX_BFX_VOLUME_ENV
+    struct = pybass_fx.BASS_BFX_VOLUME_ENV
+
+    def __init__(self, channel, type=None, priority=0):
+        super(VolumeEnv, self).__init__(channel, type, priority)
+        self._nodes = ()
+
+    def _cached_parameters(self):
+        # Built here rather than read back, as BASS only hands back a pointer to its own copy of the nodes
+        if self._params is None:
+            self._params = self.struct(ALL_CHANNELS, 0, None, True)
+        return self._params
+
+    def get_parameters(self):
+        """Retrieves the envelope's parameters, as last set."""
+        params = self._cached_parameters()
+        return {f[0]: getattr(params, f[0]) for f in params._fields_}
+
+    def set_nodes(self, nodes, follow=None, channel=None):
+        """Sets the envelope.
+
+        Args:
+          nodes: A sequence of (position, volume) pairs, with positions in seconds. The first must be at position 0.
+          follow (bool): Follow the source's position, so seeking moves along the envelope. Defaults to unchanged (initially True).
+          channel (int): BASS_BFX_CHANxxx flags. Defaults to unchanged (initially all channels).
+        """
+        self._nodes = tuple((float(pos), float(val)) for pos, val in nodes)
+        params = self._cached_parameters()
+        array = (pybass_fx.BASS_BFX_ENV_NODE * len(self._nodes))(*self._nodes)
+        params.lNodeCount = len(self._nodes)
+        params.pNodes = array
+        if follow is not None:
+            params.bFollow = follow
+        if channel is not None:
+            params.lChannel = channel
+        self._apply(params)
+
+    def get_nodes(self):
+        """Retrieves the envelope's nodes.
+
+        Returns:
+            list: (position, volume) pairs.
+        """
+        return list(self._nodes)
+
+
+class BQF(SoundEffect):
+    """A BiQuad filter: lowpass, highpass, bandpass, notch, allpass, peaking EQ or shelving, chosen with a BASS_BFX_BQF_xxx filter type."""
+
+    effect_type = pybass_fx.BASS_FX_BFX_BQF
+    struct = pybass_fx.BASS_BFX_BQF
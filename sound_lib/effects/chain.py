@@ -0,0 +1,352 @@
+from __future__ import absolute_import
+
+import ctypes
+import importlib
+import json
+
+from .effect import SoundEffect
+
+""" Effect presets: ordered lists of effects and their parameters which can be saved and applied to channels. """
+
+
+def _class_name(effect_class):
+    return "%s.%s" % (effect_class.__module__, effect_class.__name__)
+
+
+#: The modules whose effects presets can name without them being registered
+_EFFECT_MODULES = (__package__ + ".bass", __package__ + ".bass_fx")
+
+_registered = {}
+
+
+def register_effect(effect_class):
+    """Lets presets use an effect class from outside sound_lib.
+
+    Presets only name their effects' classes, so loading one never imports a module it names:
+    only sound_lib's own effects, and those registered here, can be loaded. Can be used as a
+    class decorator.
+
+    Args:
+      effect_class: A :class:`sound_lib.effects.effect.SoundEffect` subclass.
+
+    Returns:
+        The class.
+    """
+    if not (isinstance(effect_class, type) and issubclass(effect_class, SoundEffect)):
+        raise ValueError("%r is not an effect" % (effect_class,))
+    _registered[_class_name(effect_class)] = effect_class
+    return effect_class
+
+
+def _load_class(name):
+    effect_class = _registered.get(name)
+    if effect_class is not None:
+        return effect_class
+    module, _, cls = name.rpartition(".")
+    if module not in _EFFECT_MODULES:
+        raise ValueError(
+            "Unknown effect %r, effects from outside sound_lib must be registered" % name
+        )
+    effect_class = getattr(importlib.import_module(module), cls, None)
+    if not (
+        isinstance(effect_class, type)
+        and issubclass(effect_class, SoundEffect)
+        and effect_class.__module__ == module
+    ):
+        raise ValueError("Unknown effect %r" % name)
+    return effect_class
+
+
+class EffectSpec(object):
+    """One effect of an :class:`EffectChain`: its class, priority and parameters.
+
+    The parameter structure is built once, when the spec is created, and a copy of it is sent
+    as is to every effect the spec is applied to. Parameters which aren't given take the
+    effect's defaults, which are read from BASS the first time the spec is applied.
+
+    Args:
+        effect_class: A :class:`sound_lib.effects.effect.SoundEffect` subclass.
+        priority (int): Effects with higher priority are applied first. Defaults to 0.
+        parameters (dict): Parameter values by attribute name (eg. "reverb_time"). Defaults to none.
+    """
+
+    __slots__ = ("effect_class", "priority", "parameters", "_struct", "_complete")
+
+    def __init__(self, effect_class, priority=0, parameters=None):
+        struct = effect_class.struct
+        for field, field_type in struct._fields_:
+            if issubclass(field_type, (ctypes._Pointer, ctypes.c_void_p, ctypes.c_char_p)):
+                raise ValueError(
+                    "%s has variable length parameters and can't be part of a chain"
+                    % effect_class.__name__
+                )
+        names = effect_class._field_names()
+        parameters = dict(parameters or {})
+        self._struct = struct()
+        for name, value in parameters.items():
+            if name not in names:
+                raise ValueError("%s has no parameter %r" % (effect_class.__name__, name))
+            setattr(self._struct, names[name], value)
+        self.effect_class = effect_class
+        self.priority = priority
+        self.parameters = parameters
+        self._complete = len(parameters) == len(names)
+
+    @classmethod
+    def from_effect(cls, effect):
+        """Captures the class, priority and current parameters of an effect.
+
+        Args:
+          effect: A :class:`sound_lib.effects.effect.SoundEffect`.
+
+        Returns:
+            EffectSpec: The spec.
+
+        raises:
+            ValueError: If the effect has several bands (eg. a
+                :class:`sound_lib.effects.bass_fx.PeakEq`), as a spec keeps one set of parameters.
+        """
+        if hasattr(type(effect), "bands") and effect.bands not in ([], [0]):
+            raise ValueError(
+                "%s has bands %r, and only band 0 can be part of a chain"
+                % (type(effect).__name__, effect.bands)
+            )
+        params = effect._cached_parameters()
+        parameters = {
+            name: getattr(params, field)
+            for name, field in type(effect)._field_names().items()
+        }
+        return cls(type(effect), effect.priority, parameters)
+
+    def to_dict(self):
+        """Returns the spec as a dict of JSON compatible values."""
+        return {
+            "effect": _class_name(self.effect_class),
+            "priority": self.priority,
+            "parameters": dict(self.parameters),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Creates a spec from the result of :meth:`to_dict`.
+
+        raises:
+            ValueError: If the effect class isn't one of sound_lib's effects or registered with
+                :func:`register_effect`.
+        """
+        return cls(
+            _load_class(data["effect"]), data.get("priority", 0), data.get("parameters")
+        )
+
+    def matches(self, effect):
+        """Whether an effect is of this spec's class and priority, and so can be reused for it."""
+        return type(effect) is self.effect_class and effect.priority == self.priority
+
+    def _parameters_for(self, effect):
+        """The structure to load into an effect, built on its current parameters if this spec doesn't set them all."""
+        if self._complete:
+            return type(self._struct).from_buffer_copy(self._struct)
+        params = type(self._struct).from_buffer_copy(effect._cached_parameters())
+        names = self.effect_class._field_names()
+        for name in self.parameters:
+            field = names[name]
+            setattr(params, field, getattr(self._struct, field))
+        return params
+
+    def create(self, channel):
+        """Applies a new effect to a channel, with this spec's parameters.
+
+        Args:
+          channel: The channel.
+
+        Returns:
+            SoundEffect: The effect.
+        """
+        effect = self.effect_class(channel, priority=self.priority)
+        if not self._complete:
+            # Fill in the parameters not given with the effect's defaults, once for all channels
+            self._struct = self._parameters_for(effect)
+            self._complete = True
+        effect._load(self._parameters_for(effect))
+        return effect
+
+    def update(self, effect):
+        """Gives an existing effect this spec's parameters, if it doesn't already have them.
+
+        Args:
+          effect: An effect which :meth:`matches` this spec.
+
+        Returns:
+            bool: True if the effect's parameters were changed.
+        """
+        params = self._parameters_for(effect)
+        if bytes(params) == bytes(effect._cached_parameters()):
+            return False
+        effect._load(params)
+        return True
+
+    def __eq__(self, other):
+        if not isinstance(other, EffectSpec):
+            return NotImplemented
+        return (
+            self.effect_class is other.effect_class
+            and self.priority == other.priority
+            and self.parameters == other.parameters
+        )
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "EffectSpec(%s, priority=%r, parameters=%r)" % (
+            self.effect_class.__name__,
+            self.priority,
+            self.parameters,
+        )
+
+
+class EffectChain(object):
+    """An ordered list of effects with their priorities and parameters, eg. an environment preset.
+
+    Applying a chain costs two BASS calls per effect: one to add it, and one to send its
+    prebuilt parameter structure. Switching a channel from one chain to another reuses the
+    effects both have in common (same class and priority), sending new parameters only to those
+    whose parameters differ, so only effects which actually change are removed or added.
+
+    Example:
+        cave = EffectChain().add(Reverb, reverb_time=3000, reverb_mix=-3).add(LPF, cut_off_freq=2000)
+        indoor = EffectChain.from_json(open("indoor.json").read())
+        effects = indoor.apply(stream)
+        # Later, walking into the cave:
+        effects = cave.apply(stream, effects)
+
+    Args:
+        specs: :class:`EffectSpec` objects to start with. Defaults to none.
+    """
+
+    def __init__(self, specs=()):
+        self.specs = list(specs)
+
+    def add(self, effect_class, priority=0, **parameters):
+        """Appends an effect to the chain.
+
+        Args:
+          effect_class: A :class:`sound_lib.effects.effect.SoundEffect` subclass.
+          priority (int): Effects with higher priority are applied first. Defaults to 0.
+          **parameters: Parameter values by attribute name.
+
+        Returns:
+            EffectChain: This chain, so calls can be chained.
+        """
+        self.specs.append(EffectSpec(effect_class, priority, parameters))
+        return self
+
+    @classmethod
+    def from_effects(cls, effects):
+        """Captures the effects currently applied to a channel.
+
+        Args:
+          effects: A sequence of :class:`sound_lib.effects.effect.SoundEffect`.
+
+        Returns:
+            EffectChain: The chain.
+        """
+        return cls([EffectSpec.from_effect(effect) for effect in effects])
+
+    def to_list(self):
+        """Returns the chain as a list of JSON compatible dicts."""
+        return [spec.to_dict() for spec in self.specs]
+
+    @classmethod
+    def from_list(cls, data):
+        """Creates a chain from the result of :meth:`to_list`."""
+        return cls([EffectSpec.from_dict(item) for item in data])
+
+    def to_json(self, **kwargs):
+        """Serializes the chain to JSON.
+
+        Args:
+          **kwargs: Options for :func:`json.dumps`, such as indent.
+
+        Returns:
+            str: The JSON.
+        """
+        return json.dumps(self.to_list(), **kwargs)
+
+    @classmethod
+    def from_json(cls, text):
+        """Creates a chain from JSON written by :meth:`to_json`.
+
+        Only sound_lib's own effects and those registered with :func:`register_effect` are
+        loaded, so untrusted presets can't import other modules.
+
+        raises:
+            ValueError: If the JSON is invalid or names an unknown effect.
+        """
+        return cls.from_list(json.loads(text))
+
+    def diff(self, effects):
+        """Works out how to turn a channel's effects into this chain.
+
+        Each spec is matched with the first unused effect of the same class and priority.
+
+        Args:
+          effects: The effects currently on the channel, eg. as returned by :meth:`apply`.
+
+        Returns:
+            tuple: (matches, removed): a list with, for each spec, the effect reused for it or None
+            if a new one is needed, and a list of the effects which aren't needed any more.
+        """
+        unused = list(effects)
+        matches = []
+        for spec in self.specs:
+            for i, effect in enumerate(unused):
+                if spec.matches(effect):
+                    matches.append(unused.pop(i))
+                    break
+            else:
+                matches.append(None)
+        return matches, unused
+
+    def apply(self, channel, effects=()):
+        """Applies the chain to a channel, replacing the effects it already has from a chain.
+
+        Args:
+          channel: The channel.
+          effects: The effects currently on the channel from a previous :meth:`apply`. Defaults to none.
+
+        Returns:
+            list: The channel's effects, in chain order, to pass to the next apply.
+        """
+        matches, removed = self.diff(effects)
+        for effect in removed:
+            effect.remove()
+        res = []
+        for spec, effect in zip(self.specs, matches):
+            if effect is None:
+                effect = spec.create(channel)
+            else:
+                spec.update(effect)
+            res.append(effect)
+        return res
+
+    def __len__(self):
+        return len(self.specs)
+
+    def __iter__(self):
+        return iter(self.specs)
+
+    def __eq__(self, other):
+        if not isinstance(other, EffectChain):
+            return NotImplemented
+        return self.specs == other.specs
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "EffectChain(%r)" % self.specs
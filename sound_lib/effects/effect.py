@@ -1,14 +1,32 @@
 from __future__ import absolute_import
 
+import contextlib
 import ctypes
 import string  # for the alphabet!
 
 from ..external import pybass
 from ..main import bass_call
+from ..registry import registry
+
+
+def _bass_to_python(func):
+    """Turns a BASS structure field name such as "fInGain" into a Python attribute name such as "in_gain"."""
+    for c in string.ascii_lowercase:
+        func = func.replace(c.upper(), "_%s" % c)
+    if func.startswith("_"):
+        func = func[1:]
+    return func[2:]
 
 
 class SoundEffect(object):
-    """ """
+    """An effect applied to a channel.
+
+    The effect's parameters are exposed as attributes named after the fields of its
+    parameter structure, eg. a reverb's ``fReverbTime`` is ``reverb_time``. The names are
+    translated once per class. Parameters are fetched from BASS on first access and cached;
+    setting one sends the cached structure back, and within :meth:`batch` any number of
+    changes are sent together.
+    """
 
     def __init__(self, channel, type=None, priority=0):
         self.original_channel = channel
@@ -18,46 +36,120 @@ class SoundEffect(object):
             type = self.effect_type
         self.effect_type = type
         self.priority = priority
+        self._params = None
+        self._batch_depth = 0
+        self._pending = None
         self.handle = bass_call(pybass.BASS_ChannelSetFX, channel, type, priority)
+        # Effects go away with their channel, so there is nothing to free if one is collected
+        self._registration = registry.track(self, self.handle)
+
+    @classmethod
+    def _field_names(cls):
+        """Maps Python attribute names to the parameter structure's field names, built once per class."""
+        names = cls.__dict__.get("_names")
+        if names is None:
+            names = {}
+            for field in cls._get_effect_fields():
+                if not field.startswith("_"):
+                    names[_bass_to_python(field)] = field
+            cls._names = names
+        return names
+
+    @classmethod
+    def _check_parameters(cls, names):
+        """Raises ValueError for names which aren't parameters of this effect.
+
+        Setting an unknown name stores a plain attribute, so a misspelled parameter would otherwise do nothing.
+        """
+        known = cls._field_names()
+        for name in names:
+            if name not in known:
+                raise ValueError("%s has no parameter %r" % (cls.__name__, name))
+
+    def _cached_parameters(self):
+        params = self.__dict__.get("_params")
+        if params is None:
+            params = self.struct()
+            bass_call(pybass.BASS_FXGetParameters, self.handle, ctypes.pointer(params))
+            self._params = params
+        return params
+
+    def remove(self):
+        """Removes the effect from its channel."""
+        channel = self.original_channel
+        if hasattr(channel, "handle"):
+            channel = channel.handle
+        registry.untrack(self._registration)
+        return bass_call(pybass.BASS_ChannelRemoveFX, channel, self.handle)
 
     def get_parameters(self):
-        """Retrieves the parameters of an effect."""
+        """Retrieves the parameters of an effect from BASS, refreshing the cached copy."""
+        self._params = None
+        params = self._cached_parameters()
         res = {}
-        params = self.struct()
-        bass_call(pybass.BASS_FXGetParameters, self.handle, ctypes.pointer(params))
         for f in params._fields_:
             res[f[0]] = getattr(params, f[0])
         return res
 
     def set_parameters(self, parameters):
-        """
+        """Sets several parameters of an effect at once.
 
         Args:
-          parameters:
-
-        Returns:
-
+          parameters (dict): Values keyed by structure field name, as returned by :meth:`get_parameters`.
+            Fields not included keep their current values.
         """
-        params = self.struct()
+        params = self._cached_parameters()
         for p, v in parameters.items():
             setattr(params, p, v)
+        self._apply(params)
+
+    def _load(self, params):
+        """Replaces every parameter with a complete structure, sending it and caching it as is."""
+        self._params = params
+        self._apply(params)
+
+    def _apply(self, params=None):
+        """Sends a parameter structure (by default the cached one) to BASS, or queues it until the end of a batch."""
+        if params is None:
+            params = self._params
+        if self._batch_depth:
+            if self._pending is None:
+                self._pending = {}
+            self._pending[id(params)] = params
+            return
         bass_call(pybass.BASS_FXSetParameters, self.handle, ctypes.pointer(params))
 
+    @contextlib.contextmanager
+    def batch(self):
+        """Collects parameter changes made in the block and applies them with a single call on leaving it.
+
+        Example:
+            with reverb.batch():
+                reverb.reverb_time = 2000
+                reverb.reverb_mix = -6
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth and self._pending:
+                pending, self._pending = self._pending, None
+                for params in pending.values():
+                    self._apply(params)
+
     def __dir__(self):
         res = dir(self.__class__)
         return res + self._get_pythonic_effect_fields()
 
-    def _get_effect_fields(self):
+    @classmethod
+    def _get_effect_fields(cls):
         """ """
-        return [i[0] for i in self.struct._fields_]
+        return [i[0] for i in cls.struct._fields_]
 
     def _get_pythonic_effect_fields(self):
         """ """
-        return [
-            self._bass_to_python(i)
-            for i in self._get_effect_fields()
-            if not i.startswith("_")
-        ]
+        return list(self._field_names())
 
     def _bass_to_python(self, func):
         """
@@ -68,11 +160,7 @@ class SoundEffect(object):
         Returns:
 
         """
-        for c in string.ascii_lowercase:
-            func = func.replace(c.upper(), "_%s" % c)
-        if func.startswith("_"):
-            func = func[1:]
-        return func[2:]
+        return _bass_to_python(func)
 
     def _python_to_bass(self, func):
         """
@@ -83,25 +171,21 @@ class SoundEffect(object):
         Returns:
 
         """
-        for c in string.ascii_lowercase:
-            func = func.replace("_%s" % c, c.upper())
-        func = "%s%s" % (func[0].upper(), func[1:])
-        for f in self._get_effect_fields():
-            if f.endswith(func):
-                func = f
-        return func
+        return self._field_names().get(func, func)
 
     def __getattr__(self, attr):
-        return self.get_parameters()[self._python_to_bass(attr)]
+        # Only called for names that aren't regular attributes
+        field = self._field_names().get(attr)
+        if field is None:
+            raise AttributeError(
+                "%r object has no attribute %r" % (type(self).__name__, attr)
+            )
+        return getattr(self._cached_parameters(), field)
 
     def __setattr__(self, attr, val):
-        if attr not in self._get_pythonic_effect_fields():
+        field = self._field_names().get(attr)
+        if field is None:
             return super(SoundEffect, self).__setattr__(attr, val)
-        params = self.get_parameters()
-        key = self._python_to_bass(attr)
-        if key not in params:
-            raise AttributeError(
-                "Unable to set attribute, suspect issue with base name-munging code"
-            )
-        params[key] = val
-        self.set_parameters(params)
+        params = self._cached_parameters()
+        setattr(params, field, val)
+        self._apply(params)
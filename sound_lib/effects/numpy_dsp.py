@@ -0,0 +1,799 @@
+from __future__ import absolute_import
+
+import ctypes
+import math
+from logging import getLogger
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from ..external.pybass import BASS_CONFIG_FLOATDSP, BASS_GetConfig, BASS_SAMPLE_FLOAT
+
+""" Effects written in NumPy, applied through a channel DSP function.
+
+Unlike the DX8 effects in :mod:`sound_lib.effects.bass`, these run on every platform. Each DSP
+call processes the whole block of sample data at once, with all of the channel's speakers
+handled together, and works on the data in place, so there are no per-sample Python loops.
+"""
+
+logger = getLogger("sound_lib.effects.numpy_dsp")
+
+
+def _db_to_gain(db):
+    return math.pow(10.0, db / 20.0)
+
+
+def _pole(milliseconds, freq):
+    """The coefficient of a one-pole smoother with the given time constant."""
+    if milliseconds <= 0:
+        return 0.0
+    return math.exp(-1000.0 / (milliseconds * freq))
+
+
+def _sliding_min(values, width, out=None, work=None):
+    """The minimum of every window of width values, in O(n) (van Herk/Gil-Werman).
+
+    Returns len(values) - width + 1 results, the first being the minimum of values[:width].
+    They are written to out if given, and work can be an array of at least
+    3 * (len(values) + width) values of the same type to use as scratch space, so nothing is
+    allocated.
+    """
+    count = len(values) - width + 1
+    size = -(-len(values) // width) * width
+    if work is None:
+        work = numpy.empty(3 * size, values.dtype)
+    padded, prefix, suffix = work[:size], work[size : 2 * size], work[2 * size : 3 * size]
+    padded[: len(values)] = values
+    padded[len(values) :] = numpy.inf
+    blocks = padded.reshape(-1, width)
+    numpy.minimum.accumulate(blocks, axis=1, out=prefix.reshape(-1, width))
+    numpy.minimum.accumulate(blocks[:, ::-1], axis=1, out=suffix.reshape(-1, width)[:, ::-1])
+    return numpy.minimum(suffix[:count], prefix[width - 1 : width - 1 + count], out=out)
+
+
+def _apply_gains(block, gains, source=None):
+    """Sets block to source (block itself by default) times a float32 gain for each frame.
+
+    One channel at a time, as broadcasting the gains across the channels makes NumPy allocate
+    a buffer.
+    """
+    if source is None:
+        source = block
+    for channel in range(block.shape[1]):
+        numpy.multiply(source[:, channel], gains, out=block[:, channel])
+
+
+class _Parameter(object):
+    """An effect parameter. Setting one recomputes whatever depends on it."""
+
+    def __init__(self, default):
+        self.default = default
+
+    def __set_name__(self, owner, name):
+        self.attribute = "_" + name
+
+    def __get__(self, obj, owner):
+        if obj is None:
+            return self
+        return getattr(obj, self.attribute, self.default)
+
+    def __set__(self, obj, value):
+        setattr(obj, self.attribute, float(value))
+        if obj.freq is not None:
+            obj._update()
+
+
+class NumpyEffect(object):
+    """Base class for effects which process a channel's sample data with NumPy.
+
+    The effect is given each block of sample data as a float32 array of shape (frames, chans)
+    which views the channel's own buffer, and modifies it in place. The channel must produce
+    floating-point data, either by being created with the float flag or by enabling
+    BASS_CONFIG_FLOATDSP.
+
+    An effect can also be used without a channel by calling :meth:`configure` and then
+    :meth:`process` directly.
+
+    Effects allocate their state and scratch arrays in :meth:`reset`, so processing a block on
+    BASS's DSP thread doesn't allocate, unless the block is longer than any before it.
+
+    Requires numpy.
+
+    Args:
+        channel: The channel to apply the effect to. Defaults to None, to attach it later.
+        priority (int): DSP functions and effects with higher priority are applied first. Defaults to 0.
+    """
+
+    def __init__(self, channel=None, priority=0):
+        if numpy is None:
+            raise ImportError("%s requires numpy, install sound_lib[numpy]" % type(self).__name__)
+        self.channel = None
+        self.handle = None
+        self.freq = None
+        self.chans = None
+        self.enabled = True
+        if channel is not None:
+            self.attach(channel, priority)
+
+    def attach(self, channel, priority=0):
+        """Applies the effect to a channel.
+
+        Args:
+          channel: The channel.
+          priority (int): DSP functions and effects with higher priority are applied first. Defaults to 0.
+
+        raises:
+            ValueError: If the channel's sample data isn't floating-point.
+        """
+        if self.channel is not None:
+            raise ValueError("This effect is already attached to a channel")
+        info = channel.get_info()
+        if not info.flags & BASS_SAMPLE_FLOAT and not BASS_GetConfig(BASS_CONFIG_FLOATDSP):
+            raise ValueError(
+                "%s needs floating-point sample data: create the channel with float=True, or enable BASS_CONFIG_FLOATDSP"
+                % type(self).__name__
+            )
+        self.configure(info.freq, info.chans)
+        self.handle = channel.set_dsp(self._dsp, priority=priority)
+        self.channel = channel
+
+    def detach(self):
+        """Removes the effect from its channel."""
+        channel, self.channel = self.channel, None
+        if channel is None:
+            return False
+        return channel.remove_dsp(self.handle)
+
+    def configure(self, freq, chans):
+        """Prepares the effect for a sample rate and number of channels, and clears its state.
+
+        Args:
+          freq (int): The sample rate.
+          chans (int): The number of channels.
+        """
+        self.freq = freq
+        self.chans = chans
+        self._update()
+        self.reset()
+
+    def reset(self):
+        """Clears the effect's state, as though it had only ever been given silence."""
+
+    def _update(self):
+        """Recomputes whatever depends on the effect's parameters and the sample rate."""
+
+    def process(self, block):
+        """Processes a block of sample data in place.
+
+        Args:
+          block: A float32 array of shape (frames, chans).
+        """
+        raise NotImplementedError
+
+    def _dsp(self, handle, channel, buffer, length, user):
+        if not self.enabled or not length:
+            return
+        frames = length // (4 * self.chans)
+        block = numpy.ctypeslib.as_array(
+            ctypes.cast(buffer, ctypes.POINTER(ctypes.c_float)), shape=(frames, self.chans)
+        )
+        try:
+            self.process(block)
+        except Exception:
+            logger.exception("Error in %r", self)
+
+
+class Band(object):
+    """One filter of an :class:`Equalizer`, from the Audio EQ Cookbook.
+
+    Args:
+        kind (str): One of "lowpass", "highpass", "bandpass", "notch", "allpass", "peaking", "lowshelf" or "highshelf".
+        freq (float): The center or cutoff frequency, in Hz.
+        q (float): The quality factor: higher is narrower. Defaults to 0.7071.
+        gain (float): The boost or cut in dB, for peaking and shelf filters. Defaults to 0.
+    """
+
+    kinds = ("lowpass", "highpass", "bandpass", "notch", "allpass", "peaking", "lowshelf", "highshelf")
+
+    __slots__ = ("kind", "freq", "q", "gain")
+
+    def __init__(self, kind, freq, q=0.7071, gain=0.0):
+        if kind not in self.kinds:
+            raise ValueError("Unknown filter kind %r" % kind)
+        self.kind = kind
+        self.freq = float(freq)
+        self.q = float(q)
+        self.gain = float(gain)
+
+    def coefficients(self, rate):
+        """Computes the filter's normalized coefficients for a sample rate.
+
+        Args:
+          rate (int): The sample rate.
+
+        Returns:
+            tuple: (b0, b1, b2, a1, a2).
+        """
+        w0 = 2 * math.pi * min(self.freq, rate * 0.499) / rate
+        cos, alpha = math.cos(w0), math.sin(w0) / (2 * self.q)
+        a = math.pow(10.0, self.gain / 40.0)
+        kind = self.kind
+        if kind == "lowpass":
+            b = ((1 - cos) / 2, 1 - cos, (1 - cos) / 2)
+            den = (1 + alpha, -2 * cos, 1 - alpha)
+        elif kind == "highpass":
+            b = ((1 + cos) / 2, -(1 + cos), (1 + cos) / 2)
+            den = (1 + alpha, -2 * cos, 1 - alpha)
+        elif kind == "bandpass":
+            b = (alpha, 0.0, -alpha)
+            den = (1 + alpha, -2 * cos, 1 - alpha)
+        elif kind == "notch":
+            b = (1.0, -2 * cos, 1.0)
+            den = (1 + alpha, -2 * cos, 1 - alpha)
+        elif kind == "allpass":
+            b = (1 - alpha, -2 * cos, 1 + alpha)
+            den = (1 + alpha, -2 * cos, 1 - alpha)
+        elif kind == "peaking":
+            b = (1 + alpha * a, -2 * cos, 1 - alpha * a)
+            den = (1 + alpha / a, -2 * cos, 1 - alpha / a)
+        else:
+            root = 2 * math.sqrt(a) * alpha
+            sign = 1 if kind == "lowshelf" else -1
+            b = (
+                a * ((a + 1) - sign * (a - 1) * cos + root),
+                sign * 2 * a * ((a - 1) - sign * (a + 1) * cos),
+                a * ((a + 1) - sign * (a - 1) * cos - root),
+            )
+            den = (
+                (a + 1) + sign * (a - 1) * cos + root,
+                -sign * 2 * ((a - 1) + sign * (a + 1) * cos),
+                (a + 1) + sign * (a - 1) * cos - root,
+            )
+        return (b[0] / den[0], b[1] / den[0], b[2] / den[0], den[1] / den[0], den[2] / den[0])
+
+    def __repr__(self):
+        return "Band(%r, %g, q=%g, gain=%g)" % (self.kind, self.freq, self.q, self.gain)
+
+
+class _Cascade(object):
+    """Block matrices for a chain of biquads, so a chunk of frames is filtered with matrix products.
+
+    For a chunk of up to size frames X (frames, chans) and the filters' history H (the last two
+    inputs, and the last two outputs of every stage), stage j's output is
+    transfer[j] @ X + history[j] @ H. The matrices are lower triangular, so the top-left corner of
+    each gives the result for shorter chunks too. Stage 0 is the input itself.
+    """
+
+    def __init__(self, coefficients, size):
+        stages = len(coefficients)
+        width = 2 * (stages + 1)
+        self.transfer = numpy.zeros((stages + 1, size, size))
+        self.history = numpy.zeros((stages + 1, size, width))
+        self.transfer[0] = numpy.eye(size)
+        lags = numpy.subtract.outer(numpy.arange(size), numpy.arange(size))
+        for j, (b0, b1, b2, a1, a2) in enumerate(coefficients, 1):
+            # Run the recursion once on an impulse, and once on each of the four history values
+            x = numpy.zeros((size + 2, 5))
+            y = numpy.zeros((size + 2, 5))
+            x[2, 0] = x[1, 1] = x[0, 2] = y[1, 3] = y[0, 4] = 1
+            for n in range(2, size + 2):
+                y[n] = b0 * x[n] + b1 * x[n - 1] + b2 * x[n - 2] - a1 * y[n - 1] - a2 * y[n - 2]
+            impulse = y[2:, 0]
+            stage = numpy.where(lags >= 0, impulse[numpy.maximum(lags, 0)], 0.0)
+            own = numpy.zeros((size, width))
+            own[:, 2 * j - 2 : 2 * j + 2] = y[2:, 1:]
+            self.transfer[j] = stage @ self.transfer[j - 1]
+            self.history[j] = stage @ self.history[j - 1] + own
+        self.size = size
+
+
+class Equalizer(NumpyEffect):
+    """A chain of biquad filters, eg. a parametric EQ.
+
+    Blocks are filtered exactly, in chunks of a fixed number of frames: each chunk goes through
+    every band with a single matrix product, whatever the number of bands or channels. The
+    arithmetic is done in double precision, so low cutoffs don't drift.
+
+    Example:
+        eq = Equalizer(stream)
+        eq.add_band("highpass", 80)
+        eq.add_band("peaking", 3000, q=1.5, gain=-4)
+
+    Args:
+        channel: The channel to apply the effect to. Defaults to None, to attach it later.
+        bands: :class:`Band` objects to start with. Defaults to none.
+        priority (int): DSP functions and effects with higher priority are applied first. Defaults to 0.
+        chunk (int): Frames filtered per matrix product. Larger chunks mean fewer NumPy calls per
+            block but more arithmetic per frame. Defaults to 128.
+    """
+
+    def __init__(self, channel=None, bands=(), priority=0, chunk=128):
+        self._bands = list(bands)
+        self.chunk = chunk
+        self._cascade = None
+        self._state = None
+        super(Equalizer, self).__init__(channel, priority)
+
+    @property
+    def bands(self):
+        """The bands, in the order they are applied."""
+        return list(self._bands)
+
+    def add_band(self, kind, freq, q=0.7071, gain=0.0):
+        """Adds a filter to the end of the chain.
+
+        Args:
+          kind (str): The kind of filter, see :class:`Band`.
+          freq (float): The center or cutoff frequency, in Hz.
+          q (float): The quality factor. Defaults to 0.7071.
+          gain (float): The boost or cut in dB, for peaking and shelf filters. Defaults to 0.
+
+        Returns:
+            Band: The new band.
+        """
+        band = Band(kind, freq, q, gain)
+        self._bands.append(band)
+        self._changed()
+        return band
+
+    def set_band(self, band, **changes):
+        """Changes a band's settings.
+
+        Args:
+          band: A band of this equalizer.
+          **changes: New values for any of kind, freq, q and gain.
+        """
+        if band not in self._bands:
+            raise ValueError("%r is not a band of this equalizer" % band)
+        if changes.get("kind", band.kind) not in Band.kinds:
+            raise ValueError("Unknown filter kind %r" % changes["kind"])
+        for name, value in changes.items():
+            setattr(band, name, value if name == "kind" else float(value))
+        self._changed()
+
+    def remove_band(self, band):
+        """Removes a band.
+
+        Args:
+          band: A band of this equalizer.
+        """
+        self._bands.remove(band)
+        self._changed()
+
+    def _changed(self):
+        if self.freq is None:
+            return
+        stages = len(self._bands)
+        if self._state is None or len(self._state) != 2 * (stages + 1):
+            # The filters' history only carries over while the number of bands stays the same
+            self._state = None
+        self._update()
+        if self._state is None:
+            self.reset()
+
+    def _update(self):
+        if not self._bands:
+            self._cascade = None
+            return
+        coefficients = [band.coefficients(self.freq) for band in self._bands]
+        self._cascade = _Cascade(coefficients, self.chunk)
+
+    def reset(self):
+        stages = len(self._bands)
+        self._state = numpy.zeros((2 * (stages + 1), self.chans))
+        self._samples = numpy.empty((self.chunk, self.chans))
+        self._output = numpy.empty((self.chunk, self.chans))
+        self._feedback = numpy.empty((self.chunk, self.chans))
+        self._tails = numpy.empty((2, stages + 1, 2, self.chans))
+
+    def process(self, block):
+        cascade, state, output = self._cascade, self._state, self._output
+        feedback = self._feedback
+        if cascade is None or len(state) != len(cascade.history[0][0]):
+            return
+        transfer, history = cascade.transfer, cascade.history
+        last = len(transfer) - 1
+        frames = len(block)
+        for start in range(0, frames, cascade.size):
+            chunk = block[start : start + cascade.size]
+            count = len(chunk)
+            samples = self._samples[:count]
+            samples[...] = chunk
+            out = output[:count]
+            numpy.matmul(transfer[last, :count, :count], samples, out=out)
+            out += numpy.matmul(history[last, :count], state, out=feedback[:count])
+            # The last two frames of every stage become the new history
+            rows = slice(max(count - 2, 0), count)
+            tails, carried = self._tails[:, :, : rows.stop - rows.start]
+            numpy.matmul(transfer[:, rows, :count], samples, out=tails)
+            tails += numpy.matmul(history[:, rows], state, out=carried)
+            state = state.reshape(-1, 2, self.chans)
+            if count >= 2:
+                state[:, 0] = tails[:, 1]
+                state[:, 1] = tails[:, 0]
+            else:
+                state[:, 1] = state[:, 0]
+                state[:, 0] = tails[:, 0]
+            state = state.reshape(-1, self.chans)
+            chunk[...] = out
+
+
+class Limiter(NumpyEffect):
+    """A brickwall lookahead limiter, keeping peaks at or below a ceiling.
+
+    Gain reduction starts ahead of each peak, so it is never exceeded, at the cost of delaying
+    the sound by the lookahead time. The gain is computed for every frame, linked across all
+    channels, with no per-sample loops.
+
+    Args:
+        channel: The channel to apply the effect to. Defaults to None, to attach it later.
+        ceiling (float): The highest peak allowed out, in dBFS. Defaults to -0.3.
+        lookahead (float): Milliseconds of lookahead, and so of delay; also the time gain
+            reduction takes to fade in and out. Defaults to 5.
+        hold (float): Milliseconds gain reduction is held after a peak passes, before it fades
+            out. Defaults to 50.
+        priority (int): DSP functions and effects with higher priority are applied first. Defaults to 0.
+    """
+
+    ceiling = _Parameter(-0.3)
+    lookahead = _Parameter(5.0)
+    hold = _Parameter(50.0)
+
+    def __init__(self, channel=None, ceiling=-0.3, lookahead=5.0, hold=50.0, priority=0):
+        self._ceiling = float(ceiling)
+        self._lookahead = float(lookahead)
+        self._hold = float(hold)
+        super(Limiter, self).__init__(channel, priority)
+
+    @property
+    def latency(self):
+        """The delay the limiter adds, in seconds."""
+        return self._frames / float(self.freq)
+
+    def _update(self):
+        self._threshold = _db_to_gain(self.ceiling)
+        frames = max(1, int(round(self.lookahead * self.freq / 1000.0)))
+        window = frames + int(round(self.hold * self.freq / 1000.0))
+        if getattr(self, "_frames", None) != frames or getattr(self, "_window", None) != window:
+            self._frames, self._window = frames, window
+            if getattr(self, "_delay", None) is not None:
+                self.reset()
+
+    def reset(self):
+        self._capacity = 0
+        # Room for half a second, BASS's default buffer length
+        self._reserve(self.freq // 2)
+
+    def _reserve(self, capacity):
+        """Allocates the arrays for blocks of up to capacity frames, keeping the limiter's state.
+
+        The delay line and the gains needed so far are followed by room for a block, so each
+        block is appended to what came before it without concatenating.
+        """
+        frames, history = self._frames, self._frames + self._window - 1
+        delay = numpy.zeros((frames + capacity, self.chans), numpy.float32)
+        # The gains needed by the frames before this block, far enough back to fill every window
+        needed = numpy.ones(history + capacity)
+        if self._capacity:
+            delay[:frames] = self._delay[:frames]
+            needed[:history] = self._needed[:history]
+        self._delay, self._needed = delay, needed
+        self._magnitudes = numpy.empty((capacity, self.chans), numpy.float32)
+        self._peaks = numpy.empty(capacity, numpy.float32)
+        self._lowest = numpy.empty(frames + capacity)
+        self._work = numpy.empty(3 * (history + capacity + self._window))
+        self._totals = numpy.zeros(frames + capacity + 1)
+        self._averages = numpy.empty(capacity)
+        self._gains = numpy.empty(capacity, numpy.float32)
+        self._capacity = capacity
+
+    def process(self, block):
+        frames, window = self._frames, self._window
+        history = frames + window - 1
+        count = len(block)
+        if count > self._capacity:
+            self._reserve(count)
+        # Every step works in a single dtype, as mixing them makes NumPy allocate buffers to cast
+        # into; the casts are done by copying instead
+        peaks = numpy.max(
+            numpy.abs(block, out=self._magnitudes[:count]), axis=1, out=self._peaks[:count]
+        )
+        needed = self._needed[: history + count]
+        latest = needed[history:]
+        latest[...] = peaks
+        numpy.maximum(latest, 1e-9, out=latest)
+        numpy.divide(self._threshold, latest, out=latest)
+        numpy.minimum(latest, 1.0, out=latest)
+        # The lowest gain needed within the hold window, then faded over the lookahead time
+        lowest = _sliding_min(needed, window, out=self._lowest[: frames + count], work=self._work)
+        totals = self._totals[: frames + count + 1]
+        numpy.cumsum(lowest, out=totals[1:])
+        averages = numpy.subtract(
+            totals[frames : frames + count], totals[:count], out=self._averages[:count]
+        )
+        averages /= frames
+        gains = self._gains[:count]
+        gains[...] = averages
+        delay = self._delay[: frames + count]
+        delay[frames:] = block
+        _apply_gains(block, gains, delay[:count])
+        # The end of the delay line and of the gains needed carry over to the next block
+        delay[:frames] = delay[count:]
+        needed[:history] = needed[count:]
+
+
+class _Dynamics(NumpyEffect):
+    """Shared gain smoothing for the compressor and gate.
+
+    The gain follows its target with a one-pole smoother, using the attack or release time
+    depending on which way it is heading. Within each chunk of frames the smoother is applied
+    with one matrix product, so the choice between attack and release is made once per chunk.
+    """
+
+    def __init__(self, channel=None, priority=0, chunk=64):
+        self.chunk = chunk
+        super(_Dynamics, self).__init__(channel, priority)
+
+    def _smoother(self, milliseconds):
+        """Matrices applying a one-pole smoother to a chunk: out = weights @ target + decay * start."""
+        pole = _pole(milliseconds, self.freq)
+        lags = numpy.subtract.outer(numpy.arange(self.chunk), numpy.arange(self.chunk))
+        weights = numpy.where(lags >= 0, (1 - pole) * pole ** numpy.maximum(lags, 0), 0.0)
+        decay = pole ** numpy.arange(1, self.chunk + 1)
+        return weights, decay
+
+    def _update(self):
+        self._attack_curve = self._smoother(self.attack)
+        self._release_curve = self._smoother(self.release)
+        self._decayed = numpy.empty(self.chunk)
+
+    def _smooth(self, target, attack_downwards, out=None):
+        """Smooths the target gain for every frame of a block, returning the result (in out, if given)."""
+        envelope = self._envelope
+        result = numpy.empty(len(target)) if out is None else out
+        size = self.chunk
+        for start in range(0, len(target), size):
+            chunk = target[start : start + size]
+            count = len(chunk)
+            falling = chunk.mean() < envelope
+            weights, decay = (
+                self._attack_curve if falling == attack_downwards else self._release_curve
+            )
+            out = result[start : start + count]
+            numpy.matmul(weights[:count, :count], chunk, out=out)
+            out += numpy.multiply(decay[:count], envelope, out=self._decayed[:count])
+            envelope = out[-1]
+        self._envelope = envelope
+        return result
+
+
+class Compressor(_Dynamics):
+    """A feed-forward compressor with a soft knee, linked across all channels.
+
+    Args:
+        channel: The channel to apply the effect to. Defaults to None, to attach it later.
+        threshold (float): The level compression starts at, in dBFS. Defaults to -20.
+        ratio (float): How many dB the input must rise above the threshold for the output to rise by 1 dB. Defaults to 4.
+        attack (float): Milliseconds to apply gain reduction. Defaults to 10.
+        release (float): Milliseconds to recover from gain reduction. Defaults to 100.
+        knee (float): Width of the soft knee around the threshold, in dB. Defaults to 6.
+        makeup (float): Gain applied after compression, in dB. Defaults to 0.
+        priority (int): DSP functions and effects with higher priority are applied first. Defaults to 0.
+    """
+
+    threshold = _Parameter(-20.0)
+    ratio = _Parameter(4.0)
+    attack = _Parameter(10.0)
+    release = _Parameter(100.0)
+    knee = _Parameter(6.0)
+    makeup = _Parameter(0.0)
+
+    def __init__(
+        self,
+        channel=None,
+        threshold=-20.0,
+        ratio=4.0,
+        attack=10.0,
+        release=100.0,
+        knee=6.0,
+        makeup=0.0,
+        priority=0,
+    ):
+        self._threshold = float(threshold)
+        self._ratio = float(ratio)
+        self._attack = float(attack)
+        self._release = float(release)
+        self._knee = float(knee)
+        self._makeup = float(makeup)
+        super(Compressor, self).__init__(channel, priority)
+
+    def reset(self):
+        self._capacity = 0
+        # Room for half a second, BASS's default buffer length
+        self._reserve(self.freq // 2)
+        self._envelope = 0.0
+
+    def _reserve(self, capacity):
+        """Allocates the arrays for blocks of up to capacity frames."""
+        self._magnitudes = numpy.empty((capacity, self.chans), numpy.float32)
+        self._peaks = numpy.empty(capacity, numpy.float32)
+        self._levels = numpy.empty(capacity)
+        self._reduction = numpy.empty(capacity)
+        self._knee_work = numpy.empty(capacity)
+        self._smoothed = numpy.empty(capacity)
+        self._gains = numpy.empty(capacity, numpy.float32)
+        self._capacity = capacity
+
+    def gain_reduction(self, levels):
+        """The static gain reduction for input levels, before attack and release.
+
+        Args:
+          levels: An array of levels in dBFS.
+
+        Returns:
+            An array of gain changes in dB, zero or negative.
+        """
+        levels = numpy.asarray(levels, numpy.float64)
+        return self._gain_reduction(levels, numpy.empty(levels.shape), numpy.empty(levels.shape))
+
+    def _gain_reduction(self, levels, out, work):
+        """:meth:`gain_reduction` of float64 levels, written to out, using work as scratch space."""
+        slope = 1.0 / self.ratio - 1.0
+        knee = self.knee
+        if knee <= 0:
+            numpy.subtract(levels, self.threshold, out=out)
+            numpy.maximum(out, 0.0, out=out)
+            out *= slope
+            return out
+        # With t the level above the bottom of the knee, the reduction is slope times the
+        # quadratic part of the knee, c ** 2 / (2 * knee) with c = clip(t, 0, knee), plus the
+        # linear part above it, max(t, 0) - c
+        above = numpy.subtract(levels, self.threshold - knee / 2, out=work)
+        numpy.maximum(above, 0.0, out=above)
+        curve = numpy.minimum(above, knee, out=out)
+        above -= curve
+        numpy.square(curve, out=curve)
+        curve /= 2 * knee
+        curve += above
+        curve *= slope
+        return curve
+
+    def process(self, block):
+        count = len(block)
+        if count > self._capacity:
+            self._reserve(count)
+        peaks = numpy.max(
+            numpy.abs(block, out=self._magnitudes[:count]), axis=1, out=self._peaks[:count]
+        )
+        levels = self._levels[:count]
+        levels[...] = peaks
+        numpy.maximum(levels, 1e-9, out=levels)
+        numpy.log10(levels, out=levels)
+        levels *= 20
+        target = self._gain_reduction(levels, self._reduction[:count], self._knee_work[:count])
+        reduction = self._smooth(target, True, out=self._smoothed[:count])
+        reduction += self.makeup
+        reduction /= 20.0
+        numpy.power(10.0, reduction, out=reduction)
+        gains = self._gains[:count]
+        gains[...] = reduction
+        _apply_gains(block, gains)
+
+
+class Gate(_Dynamics):
+    """A noise gate, silencing the sound while its level stays below a threshold.
+
+    The level is the peak of every channel over the hold time, so the gate doesn't chatter on
+    each cycle of a low note, and stays open for at least the hold time after the sound drops.
+
+    Args:
+        channel: The channel to apply the effect to. Defaults to None, to attach it later.
+        threshold (float): The level the gate opens at, in dBFS. Defaults to -50.
+        hysteresis (float): How many dB below the threshold the level must fall for the gate to close. Defaults to 6.
+        range (float): Gain applied while closed, in dB. Defaults to -80.
+        attack (float): Milliseconds to open. Defaults to 1.
+        release (float): Milliseconds to close. Defaults to 100.
+        hold (float): Milliseconds the level is measured over. Defaults to 20.
+        priority (int): DSP functions and effects with higher priority are applied first. Defaults to 0.
+    """
+
+    threshold = _Parameter(-50.0)
+    hysteresis = _Parameter(6.0)
+    range = _Parameter(-80.0)
+    attack = _Parameter(1.0)
+    release = _Parameter(100.0)
+    hold = _Parameter(20.0)
+
+    def __init__(
+        self,
+        channel=None,
+        threshold=-50.0,
+        hysteresis=6.0,
+        range=-80.0,
+        attack=1.0,
+        release=100.0,
+        hold=20.0,
+        priority=0,
+    ):
+        self._threshold = float(threshold)
+        self._hysteresis = float(hysteresis)
+        self._range = float(range)
+        self._attack = float(attack)
+        self._release = float(release)
+        self._hold = float(hold)
+        super(Gate, self).__init__(channel, priority)
+
+    def _update(self):
+        super(Gate, self)._update()
+        self._open_level = _db_to_gain(self.threshold)
+        self._close_level = _db_to_gain(self.threshold - self.hysteresis)
+        self._floor = _db_to_gain(self.range)
+        window = max(1, int(round(self.hold * self.freq / 1000.0)))
+        if getattr(self, "_window", None) != window:
+            self._window = window
+            if getattr(self, "_peaks", None) is not None:
+                self.reset()
+
+    def reset(self):
+        self._capacity = 0
+        # Room for half a second, BASS's default buffer length
+        self._reserve(self.freq // 2)
+        self._open = False
+        self._envelope = self._floor
+
+    def _reserve(self, capacity):
+        """Allocates the arrays for blocks of up to capacity frames, keeping the gate's state."""
+        history = self._window - 1
+        # Negated, so the sliding minimum finds the loudest peak in each window
+        peaks = numpy.zeros(history + capacity, numpy.float32)
+        if self._capacity:
+            peaks[:history] = self._peaks[:history]
+        self._peaks = peaks
+        self._magnitudes = numpy.empty((capacity, self.chans), numpy.float32)
+        self._levels = numpy.empty(capacity, numpy.float32)
+        self._work = numpy.empty(3 * (history + capacity + self._window), numpy.float32)
+        self._opening = numpy.empty(capacity + 1, bool)
+        self._decided = numpy.empty(capacity, bool)
+        self._indices = numpy.arange(1, capacity + 1)
+        self._latest = numpy.empty(capacity, self._indices.dtype)
+        self._is_open = numpy.empty(capacity, bool)
+        self._target = numpy.empty(capacity)
+        self._smoothed = numpy.empty(capacity)
+        self._gains = numpy.empty(capacity, numpy.float32)
+        self._capacity = capacity
+
+    def process(self, block):
+        history = self._window - 1
+        count = len(block)
+        if count > self._capacity:
+            self._reserve(count)
+        peaks = self._peaks[: history + count]
+        latest_peaks = peaks[history:]
+        numpy.max(numpy.abs(block, out=self._magnitudes[:count]), axis=1, out=latest_peaks)
+        numpy.negative(latest_peaks, out=latest_peaks)
+        levels = _sliding_min(peaks, self._window, out=self._levels[:count], work=self._work)
+        numpy.negative(levels, out=levels)
+        peaks[:history] = peaks[count:]
+        # Levels above the open level open the gate and those below the close level close it; in
+        # between it stays as it was. opening[0] is the state before this block, and latest the
+        # index into opening of each frame's most recent decision, or 0 if there was none
+        opening = self._opening[: count + 1]
+        opening[0] = self._open
+        numpy.greater_equal(levels, self._open_level, out=opening[1:])
+        decided = numpy.less(levels, self._close_level, out=self._decided[:count])
+        decided |= opening[1:]
+        latest = self._latest[:count]
+        latest[...] = decided
+        latest *= self._indices[:count]
+        numpy.maximum.accumulate(latest, out=latest)
+        is_open = numpy.take(opening, latest, out=self._is_open[:count], mode="clip")
+        self._open = bool(is_open[-1])
+        target = self._target[:count]
+        target[...] = is_open
+        target *= 1.0 - self._floor
+        target += self._floor
+        gains = self._gains[:count]
+        gains[...] = self._smooth(target, False, out=self._smoothed[:count])
+        _apply_gains(block, gains)
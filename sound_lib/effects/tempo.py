@@ -1,5 +1,6 @@
 from __future__ import absolute_import
 
+from types import MappingProxyType
 
 from ..channel import Channel
 from ..external import pybass_fx
@@ -10,6 +11,20 @@ from ..stream import BaseStream
 class Tempo(BaseStream):
     """ """
 
+    __slots__ = ("channel",)
+
+    flag_mapping = MappingProxyType(
+        dict(BaseStream.flag_mapping, free_source=pybass_fx.BASS_FX_FREESOURCE)
+    )
+    attribute_mapping = MappingProxyType(
+        dict(
+            BaseStream.attribute_mapping,
+            tempo=pybass_fx.BASS_ATTRIB_TEMPO,
+            tempo_pitch=pybass_fx.BASS_ATTRIB_TEMPO_PITCH,
+            tempo_freq=pybass_fx.BASS_ATTRIB_TEMPO_FREQ,
+        )
+    )
+
     def __init__(
         self,
         channel,
@@ -36,11 +51,6 @@ class Tempo(BaseStream):
             channel = channel.handle
         handle = bass_call(pybass_fx.BASS_FX_TempoCreate, channel, flags)
         super(Tempo, self).__init__(handle)
-        self.add_attributes_to_mapping(
-            tempo=pybass_fx.BASS_ATTRIB_TEMPO,
-            tempo_pitch=pybass_fx.BASS_ATTRIB_TEMPO_PITCH,
-            tempo_freq=pybass_fx.BASS_ATTRIB_TEMPO_FREQ,
-        )
 
     @property
     def tempo(self):
@@ -93,11 +103,6 @@ class Tempo(BaseStream):
         """
         self.set_attribute("tempo_freq", val)
 
-    def setup_flag_mapping(self):
-        """ """
-        super(Tempo, self).setup_flag_mapping()
-        self.flag_mapping.update({"free_source": pybass_fx.BASS_FX_FREESOURCE})
-
     def get_source(self):
         """ """
         source = pybass_fx.BASS_FX_TempoGetSource(self.handle)
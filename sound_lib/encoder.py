@@ -1,16 +1,135 @@
 from __future__ import absolute_import
 
+import asyncio
+import collections
+import ctypes
+import ipaddress
+import os
+import queue
+import threading
+import time
+from logging import getLogger
+from types import MappingProxyType
+
 from .external import pybass, pybassenc
-from .main import FlagObject, bass_call, bass_call_0
+from .main import BassError, FlagObject, bass_call, bass_call_0
+from .registry import registry
+from .ringbuffer import RingBuffer
+from .stream import BaseStream
+
+logger = getLogger("sound_lib.encoder")
+
+#: Sample formats of PCM data, as buffer format characters, and the stream flags for each
+_PCM_FORMATS = {
+    "f": pybass.BASS_SAMPLE_FLOAT,
+    "h": 0,
+    "B": pybass.BASS_SAMPLE_8BITS,
+}
+
+
+#: The counts reported by :meth:`Encoder.stats`, by name
+_COUNTS = (
+    ("in", pybassenc.BASS_ENCODE_COUNT_IN),
+    ("out", pybassenc.BASS_ENCODE_COUNT_OUT),
+    ("cast", pybassenc.BASS_ENCODE_COUNT_CAST),
+    ("queue", pybassenc.BASS_ENCODE_COUNT_QUEUE),
+    ("queue_limit", pybassenc.BASS_ENCODE_COUNT_QUEUE_LIMIT),
+    ("queue_fail", pybassenc.BASS_ENCODE_COUNT_QUEUE_FAIL),
+)
+
+#: BASS_Encode_GetCount's error result, a QWORD of -1 (signed, as pybass declares QWORD)
+_NO_COUNT = -1
+
+_STATES = {
+    pybass.BASS_ACTIVE_STOPPED: "stopped",
+    pybass.BASS_ACTIVE_PLAYING: "active",
+    pybass.BASS_ACTIVE_PAUSED: "paused",
+}
+
+
+def _quote(argument):
+    if " " in argument:
+        return '"%s"' % argument
+    return argument
+
+
+def command_line(format, output="-", bitrate=None, quality=None):
+    """Builds the command-line for a common command-line encoder, which must be installed.
+
+    Supported formats are "mp3" (lame), "ogg" (oggenc), "opus" (opusenc) and "flac" (flac).
+
+    Args:
+      format (str): The format to encode to.
+      output (str): The file to write, or "-" for the encoder's standard output, which is
+        delivered to the Encoder's callback or chunk queue. Defaults to "-".
+      bitrate (int): Target bitrate in kbps, for the lossy formats. Defaults to the encoder's default.
+      quality (int): VBR quality for mp3 (0 best to 9) and ogg (-1 to 10), complexity for opus
+        (0 to 10), or compression level for flac (0 to 8). Defaults to the encoder's default.
+
+    Returns:
+        tuple: (command_line, flags), where flags is a dict of :class:`Encoder` keyword
+        arguments which convert the sample data to a format the encoder accepts.
+
+    raises:
+        ValueError: If the format is unknown, or doesn't take a bitrate.
+    """
+    output = _quote(output)
+    if format == "mp3":
+        args = ["lame", "--silent"]
+        if bitrate:
+            args += ["-b", str(bitrate)]
+        if quality is not None:
+            args += ["-V", str(quality)]
+        args += ["-", output]
+        flags = {"fp_16bit": True}
+    elif format == "ogg":
+        args = ["oggenc", "--quiet"]
+        if bitrate:
+            args += ["-b", str(bitrate)]
+        if quality is not None:
+            args += ["-q", str(quality)]
+        args += ["-o", output, "-"]
+        flags = {}
+    elif format == "opus":
+        args = ["opusenc", "--quiet"]
+        if bitrate:
+            args += ["--bitrate", str(bitrate)]
+        if quality is not None:
+            args += ["--comp", str(quality)]
+        args += ["-", output]
+        flags = {}
+    elif format == "flac":
+        if bitrate:
+            raise ValueError("flac is lossless and has no bitrate")
+        args = ["flac", "--silent", "--force"]
+        if quality is not None:
+            args.append("-%d" % quality)
+        args += ["-o", output, "-"]
+        flags = {"fp_24bit": True}
+    else:
+        raise ValueError("Unknown format %r" % format)
+    return " ".join(args).encode("utf-8"), flags
 
 
 class Encoder(FlagObject):
-    """ """
+    """Encodes the sound of a channel, with an external encoder or as PCM.
 
-    def setup_flag_mapping(self):
-        """ """
-        # super(Encoder, self).setup_flag_mapping()
-        self.flag_mapping = {
+    Args:
+        source: The channel to encode.
+        command_line: The encoder command-line, or a filename for pcm encoding.
+        callback: A function taking (handle, channel, buffer, length, user), called with the encoded
+            data. It runs on a BASS thread. Defaults to None.
+        user: User instance data to pass to the callback. Defaults to None.
+        max_queue_bytes (int): Instead of a callback, collect the encoded data in a ring buffer of
+            this size, to be read with :meth:`iter_chunks` or :meth:`aiter_chunks`. Data which
+            arrives while the buffer is full is dropped and counted in :attr:`dropped_bytes`.
+            Defaults to None.
+
+    The remaining arguments set the BASS_ENCODE_xxx flag of the same name.
+    """
+
+    flag_mapping = MappingProxyType(
+        {
             "pcm": pybassenc.BASS_ENCODE_PCM,
             "no_header": pybassenc.BASS_ENCODE_NOHEAD,
             "rf64": pybassenc.BASS_ENCODE_RF64,
@@ -26,6 +145,7 @@ class Encoder(FlagObject):
             "autofree": pybassenc.BASS_ENCODE_AUTOFREE,
             "unicode": pybass.BASS_UNICODE,
         }
+    )
 
     def __init__(
         self,
@@ -46,8 +166,8 @@ class Encoder(FlagObject):
         autofree=False,
         callback=None,
         user=None,
+        max_queue_bytes=None,
     ):
-        self.setup_flag_mapping()
         flags = self.flags_for(
             pcm=pcm,
             no_header=no_header,
@@ -65,6 +185,12 @@ class Encoder(FlagObject):
         )  # fwiw!
         self.source = source
         source_handle = source.handle
+        self.chunks = None
+        if max_queue_bytes:
+            if callback is not None:
+                raise ValueError("An encoder can't have both a callback and a chunk queue")
+            self.chunks = RingBuffer(max_queue_bytes)
+            callback = self._queue_chunk
         if callback is not None:
             callback = pybassenc.ENCODEPROC(callback)
         self.callback = callback
@@ -76,6 +202,127 @@ class Encoder(FlagObject):
             callback,
             user,
         )
+        self._registration = registry.track(self, self.handle)
+        if self.chunks is not None:
+            # Let readers know when the encoder dies
+            self._notify = pybassenc.ENCODENOTIFYPROC(self._encoder_notify)
+            bass_call(pybassenc.BASS_Encode_SetNotify, self.handle, self._notify, None)
+
+    @classmethod
+    def from_pcm(cls, freq, chans, command_line, sample_format="f", **kwargs):
+        """Creates an encoder fed by :meth:`write` rather than a channel, eg. for audio synthesized in NumPy.
+
+        The encoder reads from a dummy decoding stream of the given format, which it frees when stopped.
+        Unlike encoders of channels, it starts unpaused.
+
+        Example:
+            cmd, flags = command_line("mp3", "out.mp3", bitrate=192)
+            encoder = Encoder.from_pcm(44100, 2, cmd, **flags)
+            encoder.write(samples)  # a float32 array of shape (frames, 2)
+            encoder.stop()
+
+        Args:
+          freq (int): The sample rate.
+          chans (int): The number of channels.
+          command_line: The encoder command-line, or a filename for pcm encoding.
+          sample_format (str): The format of the data to be written: "f" for 32-bit float, "h"
+            for 16-bit or "B" for 8-bit, as in the struct and array modules. Defaults to "f".
+          **kwargs: Other arguments for :class:`Encoder`, such as fp_16bit to have float data
+            converted to 16-bit for the encoder.
+
+        Returns:
+            Encoder: The encoder.
+        """
+        if sample_format not in _PCM_FORMATS:
+            raise ValueError("Unknown sample format %r" % sample_format)
+        source = BaseStream(
+            bass_call(
+                pybass.BASS_StreamCreate,
+                freq,
+                chans,
+                pybass.BASS_STREAM_DECODE | _PCM_FORMATS[sample_format],
+                pybass.STREAMPROC_DUMMY,
+                None,
+            )
+        )
+        kwargs.setdefault("pause", False)
+        try:
+            encoder = cls(source, command_line, **kwargs)
+        except Exception:
+            source.free()
+            raise
+        encoder.sample_format = sample_format
+        return encoder
+
+    def write(self, data):
+        """Sends sample data to the encoder.
+
+        Data is sent without copying when it supports the buffer protocol and is contiguous
+        and writable (eg. a NumPy array, bytearray or memoryview of one) or is bytes; anything
+        else is copied first.
+
+        Args:
+          data: The sample data, in the source channel's format. For encoders created with
+            :meth:`from_pcm`, its item type must match the sample format.
+
+        Returns:
+            bool: True on success.
+
+        raises:
+            ValueError: If the data's item type doesn't match the encoder's sample format.
+        """
+        view = memoryview(data)
+        expected = getattr(self, "sample_format", None)
+        if expected is not None and view.format.lstrip("<=@") not in (expected, "B"):
+            raise ValueError(
+                "Expected %r sample data, got %r" % (expected, view.format)
+            )
+        if not view.c_contiguous:
+            view = memoryview(view.tobytes())
+        length = view.nbytes
+        if isinstance(data, bytes):
+            buffer = data
+        elif view.readonly:
+            buffer = view.tobytes()
+        else:
+            buffer = (ctypes.c_char * length).from_buffer(view)
+        return bass_call(pybassenc.BASS_Encode_Write, self.handle, buffer, length)
+
+    def _queue_chunk(self, handle, channel, buffer, length, user):
+        self.chunks.write(buffer, length)
+
+    def _encoder_notify(self, handle, status, user):
+        if status == pybassenc.BASS_ENCODE_NOTIFY_ENCODER:
+            self.chunks.close()
+
+    def iter_chunks(self):
+        """Yields the encoded data as it arrives, until the encoder is stopped.
+
+        Needs the encoder to have been created with max_queue_bytes. Each chunk is a memoryview
+        into the ring buffer, valid until the next one is requested; copy it with bytes() to keep it.
+
+        Returns:
+            An iterator of memoryviews.
+        """
+        if getattr(self, "chunks", None) is None:
+            raise ValueError("This encoder was created without max_queue_bytes")
+        return iter(self.chunks)
+
+    def aiter_chunks(self):
+        """Like :meth:`iter_chunks`, for ``async for``: waits for data without blocking the event loop.
+
+        Returns:
+            An asynchronous iterator of memoryviews.
+        """
+        if getattr(self, "chunks", None) is None:
+            raise ValueError("This encoder was created without max_queue_bytes")
+        return self.chunks.__aiter__()
+
+    @property
+    def dropped_bytes(self):
+        """How many bytes of encoded data have been dropped because the chunk queue was full."""
+        chunks = getattr(self, "chunks", None)
+        return chunks.dropped_bytes if chunks is not None else 0
 
     def set_title(self, title=None, url=None):
         """
@@ -116,13 +363,61 @@ class Encoder(FlagObject):
             == pybass.BASS_ACTIVE_STOPPED
         )
 
+    def get_channel(self):
+        """Retrieves the handle of the channel the encoder is encoding.
+
+        Returns:
+            int: The channel's handle.
+        """
+        return bass_call_0(pybassenc.BASS_Encode_GetChannel, self.handle)
+
+    def set_channel(self, channel):
+        """Moves the encoder to another channel, which must have the same sample format.
+
+        Args:
+          channel: The new channel.
+        """
+        bass_call(pybassenc.BASS_Encode_SetChannel, self.handle, channel.handle)
+        self.source = channel
+
+    def stats(self):
+        """Retrieves the encoder's state and byte counts.
+
+        Counts which don't apply to this encoder (eg. "cast" when it isn't casting, or the
+        queue counts without the queue flag) are None.
+
+        Returns:
+            dict: "state" ("active", "paused" or "stopped"), and the bytes "in" (sent to the
+            encoder), "out" (received from it), "cast" (sent to a server), "queue" (waiting in
+            the queue), "queue_limit" and "queue_fail" (dropped because the queue was full).
+        """
+        handle = self.handle
+        res = {"state": _STATES.get(pybassenc.BASS_Encode_IsActive(handle), "stopped")}
+        for name, count in _COUNTS:
+            value = pybassenc.BASS_Encode_GetCount(handle, count)
+            res[name] = None if value == _NO_COUNT else value
+        return res
+
     def stop(self):
-        """ """
-        return bass_call(pybassenc.BASS_Encode_Stop, self.handle)
+        """Stops encoding. Data already in the chunk queue can still be read."""
+        registry.untrack(getattr(self, "_registration", None))
+        try:
+            return bass_call(pybassenc.BASS_Encode_Stop, self.handle)
+        finally:
+            if getattr(self, "chunks", None) is not None:
+                self.chunks.close()
+            if getattr(self, "sample_format", None) is not None:
+                # The dummy stream made by from_pcm
+                self.source.free()
 
 
 class BroadcastEncoder(Encoder):
-    """ """
+    """Casts the output of an encoder to a Shoutcast or Icecast server.
+
+    Stats requests go to the server, so results are cached for stats_ttl seconds and concurrent
+    requests for the same stats wait for a single request. For title updates which mustn't
+    block, see :class:`MetadataUpdater`.
+    """
 
     def __init__(
         self,
@@ -137,6 +432,7 @@ class BroadcastEncoder(Encoder):
         headers=None,
         bitrate=0,
         public=False,
+        stats_ttl=0.0,
     ):
         contents = {
             "mp3": pybassenc.BASS_ENCODE_TYPE_MP3,
@@ -146,9 +442,14 @@ class BroadcastEncoder(Encoder):
         if content in contents:
             content = contents[content]
         self.source_encoder = source_encoder
-        handle = source_encoder.handle
+        # Casting is set up on the source encoder, so this shares its handle
+        self.handle = handle = source_encoder.handle
         self.server = server
         self.password = password
+        self.stats_ttl = stats_ttl
+        # (type, password) -> (time fetched, stats)
+        self._stats_cache = {}
+        self._stats_lock = threading.Lock()
         self.status = bass_call(
             pybassenc.BASS_Encode_CastInit,
             handle,
@@ -164,15 +465,17 @@ class BroadcastEncoder(Encoder):
             public,
         )
 
-    def get_stats(self, type, password=None):
-        """
+    def get_stats(self, type, password=None, max_age=None):
+        """Retrieves stats from the server, or from the cache if they are recent enough.
 
         Args:
-          type:
-          password:  (Default value = None)
+          type: "shoutcast", "icecast", "icecast_server" or a BASS_ENCODE_STATS_xxx value.
+          password: The admin password, if different from the source password. Defaults to None.
+          max_age (float): The age in seconds of cached stats which may be returned. Defaults to
+            :attr:`stats_ttl`.
 
         Returns:
-
+            bytes: The stats, as sent by the server.
         """
         types = {
             "shoutcast": pybassenc.BASS_ENCODE_STATS_SHOUT,
@@ -183,13 +486,543 @@ class BroadcastEncoder(Encoder):
             type = types[type]
         if password is None:
             password = self.password
-        return bass_call(
-            pybassenc.BASS_Encode_CastGetStats, self.handle, type, password
+        if max_age is None:
+            max_age = self.stats_ttl
+        key = (type, password)
+        # Held during the request, so concurrent callers wait for its result instead of repeating it
+        with self._stats_lock:
+            cached = self._stats_cache.get(key)
+            if cached is not None and time.monotonic() - cached[0] <= max_age:
+                return cached[1]
+            stats = bass_call(
+                pybassenc.BASS_Encode_CastGetStats, self.handle, type, password
+            )
+            self._stats_cache[key] = (time.monotonic(), stats)
+            return stats
+
+    async def aget_stats(self, type, password=None, max_age=None):
+        """Like :meth:`get_stats`, without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.get_stats, type, password, max_age)
+
+
+class MetadataUpdater(object):
+    """Sends title updates to a cast server from a background thread, so they never block the caller.
+
+    A title update is an HTTP request to the server, which can take hundreds of milliseconds.
+    :meth:`set_title` only records the new title and returns. Titles set while an update is
+    waiting replace it, so only the latest is sent, and updates are sent at most once every
+    min_interval seconds, as servers and listeners don't cope well with rapid title changes.
+
+    Example:
+        updater = MetadataUpdater(broadcast)
+        updater.set_title(b"Artist - Title")  # on track change, returns immediately
+        updater.stop()
+
+    Args:
+        encoder: The :class:`BroadcastEncoder` (or any encoder casting to a server).
+        min_interval (float): The fewest seconds between two updates. Defaults to 5.
+    """
+
+    def __init__(self, encoder, min_interval=5.0):
+        self.encoder = encoder
+        self.min_interval = min_interval
+        self._condition = threading.Condition()
+        self._pending = None
+        self._sending = False
+        self._last_sent = None
+        self._running = False
+        self._thread = None
+        #: The number of updates sent, failed, and replaced by a newer title before being sent
+        self.sent = 0
+        self.failed = 0
+        self.coalesced = 0
+        #: The last (title, url) sent successfully
+        self.current = None
+
+    def set_title(self, title, url=None):
+        """Queues a title update, replacing any update not yet sent, and returns immediately.
+
+        Args:
+          title (bytes): The title.
+          url (bytes): The URL to go with it. Defaults to None.
+        """
+        with self._condition:
+            if self._pending is not None:
+                self.coalesced += 1
+            self._pending = (title, url)
+            self._condition.notify_all()
+        self.start()
+
+    def flush(self, timeout=None):
+        """Waits for the queued update to be sent.
+
+        Args:
+          timeout (float): The most seconds to wait. Defaults to None, for no limit.
+
+        Returns:
+            bool: True if nothing is left to send.
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._pending is None and not self._sending, timeout
+            )
+
+    def start(self):
+        """Starts the worker thread. Called by :meth:`set_title`, so needn't be called directly."""
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="MetadataUpdater")
+            self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, flush=True):
+        """Stops the worker thread.
+
+        Args:
+          flush (bool): Send the queued update first, if any, waiting for the rate limit if
+            needed. Defaults to True.
+        """
+        with self._condition:
+            thread = self._thread
+            if thread is None:
+                return
+            if not flush:
+                self._pending = None
+            self._running = False
+            self._condition.notify_all()
+        thread.join()
+        self._thread = None
+
+    def _run(self):
+        condition = self._condition
+        while True:
+            with condition:
+                condition.wait_for(lambda: self._pending is not None or not self._running)
+                if self._pending is None:
+                    return
+                if self._last_sent is not None:
+                    delay = self._last_sent + self.min_interval - time.monotonic()
+                    if delay > 0:
+                        condition.wait(delay)
+                        continue
+                title, url = self._pending
+                self._pending = None
+                self._sending = True
+            try:
+                self.encoder.set_title(title, url)
+            except Exception:
+                logger.exception("Unable to update the title to %r", title)
+                self.failed += 1
+            else:
+                self.sent += 1
+                self.current = (title, url)
+            with condition:
+                self._sending = False
+                self._last_sent = time.monotonic()
+                condition.notify_all()
+
+
+class EncoderGroup(object):
+    """Several encoders of one channel, eg. the same broadcast in different formats and bitrates.
+
+    BASS feeds every encoder of a channel from the same data, so the source is decoded and its
+    effects and DSPs are applied once however many encoders there are. The group creates its
+    encoders paused and starts, pauses and stops them together, with the source locked so none
+    of them gets data the others don't.
+
+    Example:
+        mp3 = command_line("mp3", "live.mp3", bitrate=128)
+        opus = command_line("opus", "live.opus", bitrate=64)
+        group = EncoderGroup(stream, [mp3, opus, {"name": "archive", "command_line": b"flac ..."}])
+        group.start()
+
+    Args:
+        source: The channel to encode, eg. a splitter stream.
+        specs: One per encoder: either a (command_line, flags) pair as returned by
+            :func:`command_line`, or a dict of :class:`Encoder` arguments including
+            "command_line", with an optional "name".
+
+    raises:
+        ValueError: If two encoders have the same name.
+    """
+
+    def __init__(self, source, specs):
+        self.source = source
+        self.encoders = collections.OrderedDict()
+        try:
+            for i, spec in enumerate(specs):
+                if isinstance(spec, dict):
+                    kwargs = dict(spec)
+                else:
+                    cmd, flags = spec
+                    kwargs = dict(flags, command_line=cmd)
+                name = kwargs.pop("name", i)
+                if name in self.encoders:
+                    raise ValueError("Duplicate encoder name %r" % (name,))
+                kwargs["pause"] = True
+                self.encoders[name] = Encoder(source, **kwargs)
+        except Exception:
+            self.stop()
+            raise
+
+    def _set_paused(self, paused):
+        bass_call(pybass.BASS_ChannelLock, self.source.handle, True)
+        try:
+            for encoder in self.encoders.values():
+                encoder.paused = paused
+        finally:
+            bass_call(pybass.BASS_ChannelLock, self.source.handle, False)
+
+    def start(self):
+        """Starts (or resumes) all the encoders at the same point of the source."""
+        self._set_paused(False)
+
+    def pause(self):
+        """Pauses all the encoders at the same point of the source."""
+        self._set_paused(True)
+
+    def stop(self):
+        """Stops all the encoders, even if stopping one of them fails.
+
+        raises:
+            BassError: The first error, once every encoder has been stopped.
+        """
+        error = None
+        for encoder in self.encoders.values():
+            try:
+                encoder.stop()
+            except BassError as e:
+                error = error or e
+        if error is not None:
+            raise error
+
+    def get_channel(self):
+        """Retrieves the handle of the channel the encoders are encoding."""
+        for encoder in self.encoders.values():
+            return encoder.get_channel()
+        return self.source.handle
+
+    def set_channel(self, channel):
+        """Moves all the encoders to another channel, which must have the same sample format.
+
+        Args:
+          channel: The new channel.
+        """
+        bass_call(pybass.BASS_ChannelLock, self.source.handle, True)
+        try:
+            for encoder in self.encoders.values():
+                encoder.set_channel(channel)
+        finally:
+            bass_call(pybass.BASS_ChannelLock, self.source.handle, False)
+        self.source = channel
+
+    def stats(self):
+        """Retrieves every encoder's stats, and their totals.
+
+        Returns:
+            dict: "encoders", the :meth:`Encoder.stats` of each encoder by name; "state", the
+            encoders' state if they all share it or else "mixed"; and the sum of each byte count
+            over the encoders it applies to (None if it applies to none).
+        """
+        encoders = collections.OrderedDict(
+            (name, encoder.stats()) for name, encoder in self.encoders.items()
         )
+        states = set(stats["state"] for stats in encoders.values())
+        res = {"state": states.pop() if len(states) == 1 else "mixed", "encoders": encoders}
+        for name, count in _COUNTS:
+            values = [stats[name] for stats in encoders.values() if stats[name] is not None]
+            res[name] = sum(values) if values else None
+        return res
+
+    def __getitem__(self, name):
+        return self.encoders[name]
+
+    def __iter__(self):
+        return iter(self.encoders.values())
+
+    def __len__(self):
+        return len(self.encoders)
+
+
+class RotatingEncoder(object):
+    """Encodes a channel to a series of files, starting a new one when the current file reaches a size or duration.
+
+    Each file is written by its own :class:`Encoder` of the channel. To rotate, the channel is
+    locked while the next encoder is started and the current one paused, so every sample goes to
+    exactly one file, and the old encoder is then stopped (letting its encoder process finish)
+    with the channel unlocked again. Sizes and durations are checked by a thread every
+    check_interval seconds, so files may run over by that much.
+
+    Args:
+        source: The channel to encode.
+        path (str): The file to write. When rotating, it may contain "{index}" (the file's
+            number, from 0) and "{time}" (when it was started, as YYYYmmdd-HHMMSS) fields, eg.
+            "capture-{time}.flac"; if it contains neither, "-{index:03d}" is added before the
+            extension.
+        format (str): "wav", or a format of :func:`command_line`. Defaults to the path's extension.
+        bitrate (int): Target bitrate in kbps, for the lossy formats. Defaults to None.
+        quality (int): Encoder quality, as for :func:`command_line`. Defaults to None.
+        max_bytes (int): Start a new file once the current one reaches this size. Defaults to None.
+        max_seconds (float): Start a new file once the current one holds this much audio. Defaults to None.
+        check_interval (float): Seconds between size and duration checks. Defaults to 1.
+        **flags: Other :class:`Encoder` flags, eg. queue.
+    """
+
+    def __init__(
+        self,
+        source,
+        path,
+        format=None,
+        bitrate=None,
+        quality=None,
+        max_bytes=None,
+        max_seconds=None,
+        check_interval=1.0,
+        **flags
+    ):
+        if format is None:
+            format = os.path.splitext(path)[1].lstrip(".").lower()
+        if format != "wav":
+            # Fails early on unknown formats
+            command_line(format, path, bitrate, quality)
+        self.rotating = bool(max_bytes or max_seconds)
+        if self.rotating and "{index" not in path and "{time" not in path:
+            base, ext = os.path.splitext(path)
+            path = base.replace("{", "{{").replace("}", "}}") + "-{index:03d}" + ext
+        self.source = source
+        self.path = path
+        self.format = format
+        self.bitrate = bitrate
+        self.quality = quality
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.check_interval = check_interval
+        self.flags = flags
+        #: Every file written, in order; the last is being written
+        self.files = []
+        info = pybass.BASS_CHANNELINFO()
+        bass_call(pybass.BASS_ChannelGetInfo, source.handle, ctypes.byref(info))
+        if info.flags & pybass.BASS_SAMPLE_FLOAT:
+            width = 4
+        elif info.flags & pybass.BASS_SAMPLE_8BITS:
+            width = 1
+        else:
+            width = 2
+        self.bytes_per_second = info.freq * info.chans * width
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.stopped = False
+        self.encoder = self._start()
+        if self.rotating:
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="RotatingEncoder")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _next_path(self):
+        if not self.rotating:
+            return self.path
+        return self.path.format(index=len(self.files), time=time.strftime("%Y%m%d-%H%M%S"))
+
+    def _start(self):
+        path = self._next_path()
+        if self.format == "wav":
+            encoder = Encoder(self.source, os.fsencode(path), pcm=True, pause=False, **self.flags)
+        else:
+            cmd, flags = command_line(self.format, path, self.bitrate, self.quality)
+            flags.update(self.flags)
+            encoder = Encoder(self.source, cmd, pause=False, **flags)
+        self.files.append(path)
+        return encoder
+
+    @property
+    def seconds(self):
+        """The seconds of audio sent to the current file."""
+        count = pybassenc.BASS_Encode_GetCount(self.encoder.handle, pybassenc.BASS_ENCODE_COUNT_IN)
+        if count == _NO_COUNT:
+            return 0.0
+        return count / float(self.bytes_per_second)
+
+    @property
+    def size(self):
+        """The size of the current file in bytes, so far."""
+        try:
+            return os.path.getsize(self.files[-1])
+        except OSError:
+            return 0
+
+    def check(self):
+        """Starts a new file if the current one is full.
+
+        Returns:
+            bool: True if a new file was started.
+        """
+        if (self.max_bytes and self.size >= self.max_bytes) or (
+            self.max_seconds and self.seconds >= self.max_seconds
+        ):
+            self.rotate()
+            return True
+        return False
+
+    def rotate(self):
+        """Finishes the current file and starts the next, without losing or repeating audio.
+
+        Returns:
+            str: The path of the file finished.
+        """
+        with self._lock:
+            handle = self.source.handle
+            bass_call(pybass.BASS_ChannelLock, handle, True)
+            try:
+                new = self._start()
+                old, self.encoder = self.encoder, new
+                old.paused = True
+            finally:
+                bass_call(pybass.BASS_ChannelLock, handle, False)
+        old.stop()
+        return self.files[-2]
+
+    def _run(self):
+        while self._running:
+            self._wakeup.wait(self.check_interval)
+            self._wakeup.clear()
+            if not self._running:
+                break
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Unable to rotate %s", self.files[-1])
+
+    def stop(self):
+        """Stops encoding, finishing the current file. Does nothing if already stopped, or if the channel has been freed."""
+        if self.stopped:
+            return
+        self.stopped = True
+        thread = self._thread
+        if thread is not None:
+            self._running = False
+            self._wakeup.set()
+            if thread is not threading.current_thread():
+                thread.join()
+            self._thread = None
+        with self._lock:
+            try:
+                self.encoder.stop()
+            except BassError as e:
+                # The encoder went with its channel, eg. a recording which was stopped
+                if e.code != pybass.BASS_ERROR_HANDLE:
+                    raise
+
+
+ClientEvent = collections.namedtuple(
+    "ClientEvent",
+    ("kind", "client", "time", "headers", "bytes_sent", "duration"),
+)
+ClientEvent.__doc__ = """A client connecting to, being rejected by, or disconnecting from a :class:`Server`.
+
+kind is "connect", "reject" or "disconnect"; client is the client's "address:port"; time is when
+it happened on :func:`time.monotonic`'s clock; headers are the request headers as a dict, with
+lowercased names. bytes_sent and duration are the approximate bytes sent to the client and the
+seconds it was connected, for disconnects, and None otherwise.
+"""
+
+
+def _parse_headers(headers):
+    """Parses HTTP request headers into a dict with lowercased names."""
+    res = {}
+    if not headers:
+        return res
+    for line in headers.decode("latin-1").split("\r\n")[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            res[name.strip().lower()] = value.strip()
+    return res
+
+
+class AdmissionPolicy(object):
+    """Decides which clients a :class:`Server` accepts.
+
+    Everything is decided from what is known when the client connects (its address and request
+    headers), with no I/O, as this runs on BASS's server thread.
+
+    Args:
+        max_clients (int): The most clients connected at once. Defaults to None, for no limit.
+        allow: Addresses or networks (eg. "10.0.0.0/8") clients must be in. Defaults to None, for any.
+        deny: Addresses or networks clients must not be in. Defaults to none.
+        headers (dict): Request headers clients must send, by name, with the required value or
+            None for any value. Defaults to none.
+        check: A function taking (address, headers) and returning whether to accept the client,
+            applied after the other rules. It must not block. Defaults to None.
+    """
+
+    def __init__(self, max_clients=None, allow=None, deny=(), headers=None, check=None):
+        self.max_clients = max_clients
+        self.allow = None if allow is None else [ipaddress.ip_network(a) for a in allow]
+        self.deny = [ipaddress.ip_network(d) for d in deny]
+        self.headers = {name.lower(): value for name, value in (headers or {}).items()}
+        self.check = check
+
+    def admit(self, address, headers, connected):
+        """Decides whether to accept a client.
+
+        Args:
+          address (str): The client's IP address.
+          headers (dict): The request headers, with lowercased names.
+          connected (int): The number of clients already connected.
+
+        Returns:
+            bool: True to accept the client.
+        """
+        if self.max_clients is not None and connected >= self.max_clients:
+            return False
+        if self.allow is not None or self.deny:
+            try:
+                ip = ipaddress.ip_address(address)
+            except ValueError:
+                return False
+            if self.allow is not None and not any(ip in net for net in self.allow):
+                return False
+            if any(ip in net for net in self.deny):
+                return False
+        for name, value in self.headers.items():
+            if name not in headers or (value is not None and headers[name] != value):
+                return False
+        if self.check is not None and not self.check(address, headers):
+            return False
+        return True
+
+
+class _Client(object):
+    __slots__ = ("client", "headers", "connected_at", "out_at_connect")
+
+    def __init__(self, client, headers, connected_at, out_at_connect):
+        self.client = client
+        self.headers = headers
+        self.connected_at = connected_at
+        self.out_at_connect = out_at_connect
 
 
 class Server:
-    """Local Audio Server"""
+    """Local Audio Server
+
+    Clients are accepted or rejected by an :class:`AdmissionPolicy`, and every connection,
+    rejection and disconnection is put on :attr:`events` as a :class:`ClientEvent` (and on any
+    queues from :meth:`subscribe`), so nothing is printed or waited on in BASS's server thread.
+    When the event queue is full, new events are dropped and counted in :attr:`dropped_events`.
+
+    Args:
+        encoder: The :class:`Encoder` whose output is served.
+        port: The port to listen on, optionally with an address to bind to ("address:port").
+        buffer (int): Bytes of encoded data kept for clients. Defaults to 64000.
+        burst (int): Bytes sent to a client straight away when it connects. Defaults to 64000.
+        user: User instance data to pass to the callback. Defaults to None.
+        policy: The :class:`AdmissionPolicy`. Defaults to accepting everyone.
+        max_events (int): Size of the event queue. Defaults to 1000.
+    """
 
     # DWORD BASSENCDEF(BASS_Encode_ServerInit)(HENCODE handle, const char *port, DWORD buffer, DWORD burst, DWORD flags, ENCODECLIENTPROC *proc, void *user);
     def __init__(
@@ -199,12 +1032,20 @@ class Server:
         buffer=64000,
         burst=64000,
         user=None,
+        policy=None,
+        max_events=1000,
     ):
         self.encoder = encoder
         self.port = port
         self.buffer = buffer
         self.burst = burst
         self.user = user
+        self.policy = policy if policy is not None else AdmissionPolicy()
+        self.events = queue.Queue(max_events)
+        self.dropped_events = 0
+        self._subscribers = []
+        self._clients = {}
+        self._lock = threading.Lock()
         self._callback = pybassenc.ENCODECLIENTPROC(self.client_callback)
         self.handle = bass_call(
             pybassenc.BASS_Encode_ServerInit,
@@ -217,21 +1058,318 @@ class Server:
             user,
         )
 
+    def _encoded(self):
+        count = pybassenc.BASS_Encode_GetCount(self.encoder.handle, pybassenc.BASS_ENCODE_COUNT_OUT)
+        return 0 if count == _NO_COUNT else count
+
     def client_callback(self, handle, connect, client, headers, user):
-        """
+        """Called by BASS on its server thread when a client connects or disconnects.
 
         Args:
-            handle:
-            client:
-            connect:
-            user:
+            handle: The encoder's handle.
+            connect: True for a connection, False for a disconnection.
+            client: The client's address and port, as bytes.
+            headers: The request headers, as bytes.
+            user: The user instance data given to the server.
 
         Returns:
             An integer 0 or 1 if the connection should be accepted
         """
+        client = client.decode("latin-1") if client else ""
+        now = time.monotonic()
         if connect:
-            print("client connected")
-        else:
-            print("client disconnected")
-        print(headers)
+            parsed = _parse_headers(headers)
+            address = client.rpartition(":")[0].strip("[]")
+            with self._lock:
+                try:
+                    accepted = bool(self.policy.admit(address, parsed, len(self._clients)))
+                except Exception:
+                    logger.exception("Error in admission policy, rejecting %s", client)
+                    accepted = False
+                if accepted:
+                    self._clients[client] = _Client(client, parsed, now, self._encoded())
+            kind = "connect" if accepted else "reject"
+            self._publish(ClientEvent(kind, client, now, parsed, None, None))
+            return accepted
+        with self._lock:
+            info = self._clients.pop(client, None)
+        if info is not None:
+            self._publish(
+                ClientEvent(
+                    "disconnect",
+                    client,
+                    now,
+                    info.headers,
+                    self._sent(info),
+                    now - info.connected_at,
+                )
+            )
         return True
+
+    def _sent(self, info):
+        # BASS doesn't count per client: everything encoded since it connected, plus its burst
+        return self._encoded() - info.out_at_connect + self.burst
+
+    def _publish(self, event):
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            self.dropped_events += 1
+        for loop, subscriber in list(self._subscribers):
+            try:
+                loop.call_soon_threadsafe(subscriber.put_nowait, event)
+            except Exception:
+                if not loop.is_closed():
+                    logger.exception("Unable to send %r to a subscriber", event)
+                    continue
+                # Nothing will read its queue again
+                logger.warning("Dropping a subscriber whose event loop is closed")
+                self.unsubscribe(subscriber)
+
+    def subscribe(self, loop=None):
+        """Creates an asyncio queue which receives every :class:`ClientEvent` from now on.
+
+        Args:
+          loop: The event loop the queue belongs to. Defaults to the running loop.
+
+        Returns:
+            asyncio.Queue: The queue.
+        """
+        if loop is None:
+            loop = asyncio.get_running_loop()
+        subscriber = asyncio.Queue()
+        self._subscribers.append((loop, subscriber))
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Stops sending events to a queue from :meth:`subscribe`."""
+        self._subscribers = [s for s in self._subscribers if s[1] is not subscriber]
+
+    @property
+    def clients(self):
+        """The connected clients.
+
+        Returns:
+            dict: For each client's "address:port", its "headers", "duration" (seconds connected)
+            and "bytes_sent" (approximate).
+        """
+        now = time.monotonic()
+        with self._lock:
+            clients = list(self._clients.values())
+        return {
+            info.client: {
+                "headers": info.headers,
+                "duration": now - info.connected_at,
+                "bytes_sent": self._sent(info),
+            }
+            for info in clients
+        }
+
+    def kick(self, client=None):
+        """Disconnects a client, eg. to shed load.
+
+        Args:
+          client (str): The client's "address:port", or just an address to disconnect every
+            client from it. Defaults to None, for every client.
+
+        Returns:
+            bool: True if any client was disconnected.
+        """
+        if client is not None:
+            client = client.encode("latin-1")
+        return bool(pybassenc.BASS_Encode_ServerKick(self.encoder.handle, client))
+
+
+class _Watch(object):
+    """The state an :class:`EncoderMonitor` keeps for one encoder."""
+
+    def __init__(self, encoder, name, history):
+        self.encoder = encoder
+        self.name = name
+        self.history = collections.deque(maxlen=history)
+        self.last = None
+        self.progress_at = None
+        self.queue_high = False
+        self.stalled = False
+        self.stopped = False
+
+
+class EncoderMonitor(object):
+    """Samples the throughput and queue depth of many encoders, and reports ones falling behind.
+
+    Every sample records, for each encoder, its state, the bytes per second going in and
+    coming out, and for encoders with a queue (the queue and limit flags) how full it is.
+    Listeners are called, on the sampling thread, with (event, name, encoder, record) when:
+
+    - "queue_high": the queue fills to the high threshold.
+    - "queue_low": the queue drains back to the low threshold.
+    - "queue_fail": data was dropped because the queue was full.
+    - "stall": an active encoder has produced nothing for stall_after seconds.
+    - "recovered": a stalled encoder is producing again.
+    - "stopped": the encoder has stopped, or been freed.
+
+    Args:
+        interval (float): Seconds between samples. Defaults to 1.
+        stall_after (float): Seconds without output before an encoder is considered stalled. Defaults to 5.
+        high (float): Queue fill, from 0 to 1, which raises "queue_high". Defaults to 0.8.
+        low (float): Queue fill which raises "queue_low" after a "queue_high". Defaults to 0.5.
+        history (int): Records kept per encoder. Defaults to 60.
+        clock: A callable returning the current time in seconds. Defaults to :func:`time.monotonic`.
+    """
+
+    def __init__(
+        self,
+        interval=1.0,
+        stall_after=5.0,
+        high=0.8,
+        low=0.5,
+        history=60,
+        clock=time.monotonic,
+    ):
+        self.interval = interval
+        self.stall_after = stall_after
+        self.high = high
+        self.low = low
+        self.history = history
+        self.clock = clock
+        self._watches = []
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._running = False
+
+    def add(self, encoder, name=None):
+        """Starts monitoring an encoder.
+
+        Args:
+          encoder: The :class:`Encoder`.
+          name (str): A name for it in records and events. Defaults to its handle.
+        """
+        if name is None:
+            name = str(encoder.handle)
+        with self._lock:
+            self._watches.append(_Watch(encoder, name, self.history))
+
+    def remove(self, encoder):
+        """Stops monitoring an encoder."""
+        with self._lock:
+            self._watches = [w for w in self._watches if w.encoder is not encoder]
+
+    def add_listener(self, listener):
+        """Registers a function called with (event, name, encoder, record) for every event."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Unregisters a function added with :meth:`add_listener`."""
+        self._listeners.remove(listener)
+
+    def history_of(self, name):
+        """Retrieves the records kept for an encoder, oldest first.
+
+        Args:
+          name (str): The encoder's name.
+
+        Returns:
+            list: The records, as returned by :meth:`sample`.
+        """
+        for watch in self._watches:
+            if watch.name == name:
+                return list(watch.history)
+        raise KeyError(name)
+
+    def sample(self, now=None):
+        """Samples every encoder once, and raises any events. Called by the sampling thread, or directly.
+
+        Args:
+          now (float): The time on this monitor's clock. Defaults to now.
+
+        Returns:
+            dict: The new record of each encoder by name: its :meth:`Encoder.stats`, plus
+            "time", "in_rate" and "out_rate" (bytes per second since the previous sample, or
+            None on the first) and "queue_fill" (0 to 1, or None without a queue limit).
+        """
+        if now is None:
+            now = self.clock()
+        res = {}
+        for watch in self._watches:
+            record = watch.encoder.stats()
+            record["time"] = now
+            last = watch.last
+            for name in ("in", "out"):
+                rate = None
+                if last is not None and now > last["time"]:
+                    if record[name] is not None and last[name] is not None:
+                        rate = (record[name] - last[name]) / (now - last["time"])
+                record[name + "_rate"] = rate
+            limit = record["queue_limit"]
+            record["queue_fill"] = (
+                float(record["queue"] or 0) / limit if limit else None
+            )
+            self._check(watch, record, now)
+            watch.last = record
+            watch.history.append(record)
+            res[watch.name] = record
+        return res
+
+    def _check(self, watch, record, now):
+        last = watch.last
+        if record["state"] == "stopped":
+            if not watch.stopped:
+                watch.stopped = True
+                self._emit("stopped", watch, record)
+            return
+        watch.stopped = False
+        fill = record["queue_fill"]
+        if fill is not None:
+            if not watch.queue_high and fill >= self.high:
+                watch.queue_high = True
+                self._emit("queue_high", watch, record)
+            elif watch.queue_high and fill <= self.low:
+                watch.queue_high = False
+                self._emit("queue_low", watch, record)
+        if last is not None and (record["queue_fail"] or 0) > (last["queue_fail"] or 0):
+            self._emit("queue_fail", watch, record)
+        if last is None or record["out"] != last["out"] or record["state"] != "active":
+            watch.progress_at = now
+            if watch.stalled and last is not None and record["out"] != last["out"]:
+                watch.stalled = False
+                self._emit("recovered", watch, record)
+        elif not watch.stalled and now - watch.progress_at >= self.stall_after:
+            watch.stalled = True
+            self._emit("stall", watch, record)
+
+    def _emit(self, event, watch, record):
+        for listener in list(self._listeners):
+            try:
+                listener(event, watch.name, watch.encoder, record)
+            except Exception:
+                logger.exception("Error in encoder monitor listener %r", listener)
+
+    def start(self):
+        """Starts the sampling thread."""
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="EncoderMonitor")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stops the sampling thread."""
+        thread = self._thread
+        if thread is None:
+            return
+        self._running = False
+        self._wakeup.set()
+        thread.join()
+        self._thread = None
+
+    def _run(self):
+        while self._running:
+            try:
+                self.sample()
+            except Exception:
+                logger.exception("Unable to sample encoders")
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
@@ -383,13 +383,13 @@ BASS_VAM_TERM_PRIO = 16
 
 # Channel info structure
 class BASS_CHANNELINFO(ctypes.Structure):
-	_fields_ = [('freq', ctypes.c_ulong),#DWORD freq;// default playback rate
-				('chans', ctypes.c_ulong),#DWORD chans;// channels
-				('flags', ctypes.c_ulong),#DWORD flags;// BASS_SAMPLE/STREAM/MUSIC/SPEAKER flags
-				('ctype', ctypes.c_ulong),#DWORD ctype;// type of channel
-				('origres', ctypes.c_ulong),#DWORD origres;// original resolution
-				('plugin', HPLUGIN),#HPLUGIN plugin;// plugin
-				('sample', HSAMPLE),#HSAMPLE sample;// sample
+	_fields_ = [('freq', ctypes.c_uint32),#DWORD freq;// default playback rate
+				('chans', ctypes.c_uint32),#DWORD chans;// channels
+				('flags', ctypes.c_uint32),#DWORD flags;// BASS_SAMPLE/STREAM/MUSIC/SPEAKER flags
+				('ctype', ctypes.c_uint32),#DWORD ctype;// type of channel
+				('origres', ctypes.c_uint32),#DWORD origres;// original resolution
+				('plugin', ctypes.c_uint32),#HPLUGIN plugin;// plugin
+				('sample', ctypes.c_uint32),#HSAMPLE sample;// sample
 				('filename', ctypes.c_char_p)#const char *filename;// filename
 				]
 
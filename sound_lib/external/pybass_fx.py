@@ -81,6 +81,13 @@ BASS_BFX_CHAN8 = 128
  BASS_BFX_BQF_HIGHSHELF,
 ) = range(9)
 
+#Rotate
+class BASS_BFX_ROTATE(ctypes.Structure):
+ _fields_ = [
+  ('fRate', ctypes.c_float), #rotation rate/speed in Hz (A negative rate can be used for reverse direction)
+  ('lChannel', ctypes.c_int), #BASS_BFX_CHANxxx flag/s (supported only even number of channels)
+ ]
+
 #Echo
 class BASS_BFX_ECHO(ctypes.Structure):
  _fields_ = [
@@ -111,7 +118,7 @@ class BASS_BFX_PEAKEQ(ctypes.Structure):
   ('fQ', ctypes.c_float), #[0...............1] the EE kinda definition (linear) (if Bandwidth is not in use)
   ('fCenter', ctypes.c_float), #[1Hz..<info.freq/2] in Hz
   ('fGain', ctypes.c_float), #[-15dB...0...+15dB] in dB
-  ('lChannel', ctypes.c_float), #BASS_BFX_CHANxxx flag/s
+  ('lChannel', ctypes.c_int), #BASS_BFX_CHANxxx flag/s
  ]
 
 #Reverb
@@ -132,7 +139,7 @@ class BASS_BFX_LPF(ctypes.Structure):
 #Swap, remap and mix
 class BASS_BFX_MIX(ctypes.Structure):
  _fields_ = [
-  ('lChannel', ctypes.c_int), #an array of channels to mix using BASS_BFX_CHANxxx flag/s (lChannel[0] is left channel...)
+  ('lChannel', ctypes.POINTER(ctypes.c_int)), #an array of channels to mix using BASS_BFX_CHANxxx flag/s (lChannel[0] is left channel...)
  ]
 
 #Dynamic Amplification
@@ -242,7 +249,7 @@ class BASS_BFX_COMPRESSOR2(ctypes.Structure):
 
 class BASS_BFX_ENV_NODE(ctypes.Structure):
  _fields_ = [
-  ('pos', ctypes.c_long), #node position in seconds (1st envelope node must be at position 0)
+  ('pos', ctypes.c_double), #node position in seconds (1st envelope node must be at position 0)
   ('val', ctypes.c_float), #node value
  ]
 
@@ -251,8 +258,8 @@ class BASS_BFX_VOLUME_ENV(ctypes.Structure):
  _fields_ = [
   ('lChannel', ctypes.c_int), #BASS_BFX_CHANxxx flag/s
   ('lNodeCount', ctypes.c_int), #number of nodes
-  ('pNodes', BASS_BFX_ENV_NODE), #the nodes
-  ('bFollow', ctypes.c_bool), #follow source position
+  ('pNodes', ctypes.POINTER(BASS_BFX_ENV_NODE)), #the nodes
+  ('bFollow', ctypes.c_int), #BOOL: follow source position
  ]
 
 #BiQuad Filters
@@ -127,7 +127,7 @@ BASS_Encode_SetNotify = func_type(ctypes.c_byte, ctypes.c_ulong, ENCODENOTIFYPRO
 BASS_Encode_GetCount = func_type(pybass.QWORD, ctypes.c_ulong, ctypes.c_ulong)(('BASS_Encode_GetCount', bassenc_module))
 
 #BOOL BASSENCDEF(BASS_Encode_SetChannel)(DWORD handle, DWORD channel);
-BASS_Encode_SetChannel = func_type(ctypes.c_byte, ctypes.c_ulong, ctypes.c_ulong)
+BASS_Encode_SetChannel = func_type(ctypes.c_byte, ctypes.c_ulong, ctypes.c_ulong)(('BASS_Encode_SetChannel', bassenc_module))
 
 #DWORD BASSENCDEF(BASS_Encode_GetChannel)(HENCODE handle);
 BASS_Encode_GetChannel = func_type(ctypes.c_ulong, HENCODE)(('BASS_Encode_GetChannel', bassenc_module))
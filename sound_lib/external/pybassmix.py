@@ -14,7 +14,8 @@ features. It also provides the ability to go the other way and split a
 BASS channel into multiple channels.
 '''
 
-import os, sys, ctypes, platform, pybass
+import os, sys, ctypes, platform
+from . import pybass
 
 QWORD = pybass.QWORD
 HSYNC = pybass.HSYNC
@@ -50,7 +51,7 @@ BASS_MIXER_NORAMPIN = 0x800000# don't ramp-in the start
 
 # envelope node
 class BASS_MIXER_NODE(ctypes.Structure):
-	_fields_ = [('pos', ctypes.c_ulong),#QWORD pos;
+	_fields_ = [('pos', QWORD),#QWORD pos;
 				('value', ctypes.c_float)#float value;
 				]
 
@@ -108,7 +109,7 @@ BASS_Mixer_ChannelSetEnvelopePos = func_type(ctypes.c_byte, ctypes.c_ulong, ctyp
 BASS_Mixer_ChannelGetEnvelopePos = func_type(QWORD, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_float)(('BASS_Mixer_ChannelGetEnvelopePos', bassmix_module))
 
 #HSTREAM BASSMIXDEF(BASS_Split_StreamCreate)(DWORD channel, DWORD flags, int *chanmap);
-BASS_Split_StreamCreate = func_type(HSTREAM, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_int)(('BASS_Split_StreamCreate', bassmix_module))
+BASS_Split_StreamCreate = func_type(HSTREAM, ctypes.c_ulong, ctypes.c_ulong, ctypes.POINTER(ctypes.c_int))(('BASS_Split_StreamCreate', bassmix_module))
 #DWORD BASSMIXDEF(BASS_Split_StreamGetSource)(HSTREAM handle);
 BASS_Split_StreamGetSource = func_type(ctypes.c_ulong, HSTREAM)(('BASS_Split_StreamGetSource', bassmix_module))
 #BOOL BASSMIXDEF(BASS_Split_StreamReset)(DWORD handle);
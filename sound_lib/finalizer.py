@@ -0,0 +1,115 @@
+from __future__ import absolute_import
+
+import atexit
+import collections
+import sys
+import threading
+
+from .external.pybass import BASS_ErrorGetCode, BASS_ERROR_HANDLE
+
+
+class HandleReaper(object):
+    """Frees BASS handles on a background thread once the objects owning them are garbage collected.
+
+    :data:`sound_lib.registry.registry` hands the reaper the handle of every object that is collected
+    without having been freed. Handing over only queues the handle; a single background thread frees
+    queued handles in batches, so no BASS call is made from whichever thread happened to trigger
+    garbage collection.
+
+    Args:
+        batch_size (int): Maximum number of handles freed per batch. Defaults to 256.
+        interval (float): Seconds to wait after being woken before freeing, so that handles released
+            by one collection are freed together. Defaults to 0.01.
+    """
+
+    def __init__(self, batch_size=256, interval=0.01):
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = collections.deque()
+        self._wakeup = threading.Event()
+        self._drain_lock = threading.Lock()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self.leaked = 0
+        self.freed = 0
+        self.double_frees = 0
+        self.errors = 0
+        self.closed = False
+
+    def enqueue(self, free_function, handle):
+        """Queues a leaked handle to be freed on the background thread. Safe to call during garbage collection.
+
+        Args:
+          free_function: The BASS function to free the handle with.
+          handle (int): The handle.
+        """
+        if self.closed or sys.is_finalizing():
+            # BASS frees everything itself when the process exits, and no thread can be started now
+            return
+        self._queue.append((free_function, handle))
+        if self._thread is None:
+            self._start()
+        self._wakeup.set()
+
+    def _start(self):
+        with self._thread_lock:
+            if self._thread is None:
+                thread = threading.Thread(target=self._run, name="HandleReaper")
+                thread.daemon = True
+                thread.start()
+                self._thread = thread
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            if self.interval:
+                self._wakeup.wait(self.interval)
+            self.flush()
+
+    def flush(self):
+        """Frees every queued handle now, in the calling thread.
+
+        Returns:
+            int: The number of handles processed.
+        """
+        processed = 0
+        with self._drain_lock:
+            while self._queue:
+                batch = []
+                while self._queue and len(batch) < self.batch_size:
+                    batch.append(self._queue.popleft())
+                for free_function, handle in batch:
+                    self.leaked += 1
+                    if free_function(handle):
+                        self.freed += 1
+                    elif BASS_ErrorGetCode() == BASS_ERROR_HANDLE:
+                        self.double_frees += 1
+                    else:
+                        self.errors += 1
+                processed += len(batch)
+        return processed
+
+    def close(self):
+        """Stops accepting handles. Called automatically at interpreter exit, before objects are torn down."""
+        self.closed = True
+
+    def stats(self):
+        """Retrieves counters describing the handles this reaper has seen.
+
+        Returns:
+            dict: The number of handles waiting to be freed, and how many were leaked (collected
+                without being freed), then freed, found already freed, or failed to free.
+        """
+        return {
+            "pending": len(self._queue),
+            "leaked": self.leaked,
+            "freed": self.freed,
+            "double_frees": self.double_frees,
+            "errors": self.errors,
+        }
+
+
+#: The reaper leaked handles are freed by.
+reaper = HandleReaper()
+atexit.register(reaper.close)
@@ -1,9 +1,32 @@
 from __future__ import absolute_import
+import threading
+import time
 from ctypes import pointer
 from functools import partial
-from .main import bass_call, update_3d_system
+from .main import apply_3d, bass_call
 from .external.pybass import BASS_3DVECTOR, BASS_Get3DPosition, BASS_Set3DPosition
 
+_FIELDS = ("position", "velocity", "front", "top")
+
+
+class _ListenerState(object):
+    """The listener's last known position, velocity and orientation, shared by every Listener."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = None
+        self.moved_at = None
+
+
+_state = _ListenerState()
+
+
+def _as_tuple(vector):
+    if isinstance(vector, BASS_3DVECTOR):
+        return (vector.x, vector.y, vector.z)
+    x, y, z = vector
+    return (float(x), float(y), float(z))
+
 
 def _getter(base_prop, attr, obj):
     """
@@ -37,16 +60,23 @@ def _setter(base_prop, subattr, obj, val):
 
 
 class Listener(object):
-    """ """
+    """The listener (ie. the player) in the 3d world.
 
-    def get_3d_position(self):
-        """ """
-        res = {
-            "position": BASS_3DVECTOR(),
-            "velocity": BASS_3DVECTOR(),
-            "front": BASS_3DVECTOR(),
-            "top": BASS_3DVECTOR(),
-        }
+    The listener's state is cached Python-side, and shared by every Listener, so reading it makes no
+    BASS calls, and setting it only sends BASS the vectors that actually changed, with nothing
+    sent at all if none did. Changes made with BASS directly aren't seen until :meth:`refresh` is called.
+
+    Args:
+        auto_velocity (bool): Derive the velocity from successive positions whenever the position
+            is set without a velocity. Defaults to False.
+    """
+
+    def __init__(self, auto_velocity=False):
+        self.auto_velocity = auto_velocity
+
+    def refresh(self):
+        """Reloads the cached state from BASS, eg. after reinitializing the output."""
+        res = {field: BASS_3DVECTOR() for field in _FIELDS}
         bass_call(
             BASS_Get3DPosition,
             pointer(res["position"]),
@@ -54,39 +84,73 @@ class Listener(object):
             pointer(res["front"]),
             pointer(res["top"]),
         )
-        return res
+        with _state.lock:
+            _state.values = {field: _as_tuple(res[field]) for field in _FIELDS}
+            _state.moved_at = None
+
+    def _values(self):
+        if _state.values is None:
+            self.refresh()
+        return _state.values
+
+    def get_3d_position(self):
+        """Retrieves the position, velocity, and orientation of the listener.
+
+        Returns:
+            dict: A :class:`BASS_3DVECTOR` for each of "position", "velocity", "front" and "top".
+        """
+        values = self._values()
+        return {field: BASS_3DVECTOR(*values[field]) for field in _FIELDS}
 
-    @update_3d_system
     def set_3d_position(self, position=None, velocity=None, front=None, top=None):
         """Sets the position, velocity, and orientation of the listener (ie. the player).
 
+        Any combination can be set in one call. Only the vectors that differ from the
+        current state are sent to BASS, and nothing is applied if none do.
+
         Args:
-          position:  (Default value = None)
-          velocity:  (Default value = None)
-          front:  (Default value = None)
-          top:  (Default value = None)
+          position: A :class:`BASS_3DVECTOR` or (x, y, z) sequence, or None to leave unchanged. (Default value = None)
+          velocity: Likewise, in distance units per second. (Default value = None)
+          front: Likewise, the direction the listener faces. (Default value = None)
+          top: Likewise, the listener's up direction. (Default value = None)
 
         Returns:
-
+            bool: True if anything changed.
         """
-        old = self.get_3d_position()
-        if position is None:
-            position = old["position"]
-        if velocity is None:
-            velocity = old["velocity"]
-        if front is None:
-            front = old["front"]
-        if top is None:
-            top = old["top"]
-        position = pointer(position)
-        velocity = pointer(velocity)
-        front = pointer(front)
-        top = pointer(top)
-        bass_call(BASS_Set3DPosition, position, velocity, front, top)
+        values = self._values()
+        now = time.monotonic()
+        with _state.lock:
+            new = dict(position=position, velocity=velocity, front=front, top=top)
+            changed = {}
+            for field in _FIELDS:
+                if new[field] is None:
+                    continue
+                value = _as_tuple(new[field])
+                if value != values[field]:
+                    changed[field] = value
+            if self.auto_velocity and position is not None and velocity is None:
+                if _state.moved_at is not None and now > _state.moved_at:
+                    elapsed = now - _state.moved_at
+                    old = values["position"]
+                    moved = changed.get("position", old)
+                    derived = tuple((moved[i] - old[i]) / elapsed for i in range(3))
+                    if derived != values["velocity"]:
+                        changed["velocity"] = derived
+                _state.moved_at = now
+            if not changed:
+                return False
+            vectors = [
+                pointer(BASS_3DVECTOR(*changed[field])) if field in changed else None
+                for field in _FIELDS
+            ]
+            bass_call(BASS_Set3DPosition, *vectors)
+            _state.values = dict(values, **changed)
+        apply_3d()
+        return True
 
     def get_position(self):
         """ """
-        return self.get_3d_position()["position"]
+        return BASS_3DVECTOR(*self._values()["position"])
 
     def set_position(self, position):
         """
@@ -115,7 +179,7 @@ class Listener(object):
 
     def get_velocity(self):
         """ """
-        return self.get_3d_position()["velocity"]
+        return BASS_3DVECTOR(*self._values()["velocity"])
 
     def set_velocity(self, velocity):
         """
@@ -144,7 +208,7 @@ class Listener(object):
 
     def get_front(self):
         """ """
-        return self.get_3d_position()["front"]
+        return BASS_3DVECTOR(*self._values()["front"])
 
     def set_front(self, front):
         """
@@ -173,7 +237,7 @@ class Listener(object):
 
     def get_top(self):
         """ """
-        return self.get_3d_position()["top"]
+        return BASS_3DVECTOR(*self._values()["top"])
 
     def set_top(self, top):
         """
@@ -189,13 +253,13 @@ class Listener(object):
     top = property(fget=get_top, fset=set_top)
 
     top_x = property(
-        fget=partial(_getter, "front", "x"), fset=partial(_setter, "front", "x")
+        fget=partial(_getter, "top", "x"), fset=partial(_setter, "top", "x")
     )
 
     top_y = property(
-        fget=partial(_getter, "front", "y"), fset=partial(_setter, "front", "y")
+        fget=partial(_getter, "top", "y"), fset=partial(_setter, "top", "y")
     )
 
     top_z = property(
-        fget=partial(_getter, "front", "z"), fset=partial(_setter, "front", "z")
+        fget=partial(_getter, "top", "z"), fset=partial(_setter, "top", "z")
     )
@@ -1,5 +1,8 @@
 from __future__ import absolute_import
-from typing import Any, Callable, Dict, TypeVar
+import threading
+from contextlib import contextmanager
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterator, Mapping, TypeVar
 from .external.pybass import (
     BASS_Apply3D,
     BASS_ErrorGetCode,
@@ -120,8 +123,47 @@ def bass_call_0(function: Callable[..., Any], *args: Any) -> Any:
     return res
 
 
+_batch_3d_state = threading.local()
+
+
+@contextmanager
+def batch_3d() -> Iterator[None]:
+    """Defers applying 3d changes made by this thread until the end of the block.
+
+    Inside the block, setting the 3d position or attributes of channels or the listener
+    only records the change with BASS; a single ``BASS_Apply3D`` is made on leaving the
+    outermost block, and only if something changed. Blocks may be nested.
+
+    Example:
+        with batch_3d():
+            for source, position in moves:
+                source.set_3d_position(position=position)
+    """
+    state = _batch_3d_state
+    state.depth = getattr(state, "depth", 0) + 1
+    try:
+        yield
+    finally:
+        state.depth -= 1
+        if not state.depth and getattr(state, "dirty", False):
+            state.dirty = False
+            bass_call(BASS_Apply3D)
+
+
+def apply_3d() -> None:
+    """Applies changes made to the 3d system, or defers them to the end of the current :func:`batch_3d` block."""
+    state = _batch_3d_state
+    if getattr(state, "depth", 0):
+        state.dirty = True
+    else:
+        bass_call(BASS_Apply3D)
+
+
 def update_3d_system(func: F) -> F:
-    """Decorator to automatically update the 3d system after a function call."""
+    """Decorator to automatically update the 3d system after a function call.
+
+    Within :func:`batch_3d`, the update is deferred until the end of the batch.
+    """
 
     def update_3d_system_wrapper(*args: Any, **kwargs: Any) -> Any:
         """
@@ -134,7 +176,7 @@ def update_3d_system(func: F) -> F:
 
         """
         val = func(*args, **kwargs)
-        bass_call(BASS_Apply3D)
+        apply_3d()
         return val
 
     update_wrapper(update_3d_system_wrapper, func)
@@ -142,9 +184,26 @@ def update_3d_system(func: F) -> F:
 
 
 class FlagObject(object):
-    """An object which translates bass flags into human-readable/usable items"""
+    """An object which translates bass flags into human-readable/usable items.
+
+    The mapping of human-readable names to flag values lives in the class-level, read-only
+    ``flag_mapping``; subclasses extend it by defining their own. Subclasses which still extend
+    it per instance, by overriding :meth:`setup_flag_mapping`, keep working.
+    """
+
+    __slots__ = ()
 
-    flag_mapping: Dict[str, int] = {}
+    flag_mapping: Mapping[str, int] = MappingProxyType(
+        {
+            "loop": BASS_SAMPLE_LOOP,
+            "autofree": BASS_STREAM_AUTOFREE,
+            "mono": BASS_SAMPLE_MONO,
+            "software": BASS_SAMPLE_SOFTWARE,
+            "three_d": BASS_SAMPLE_3D,
+            "fx": BASS_SAMPLE_FX,
+            "decode": BASS_STREAM_DECODE,
+        }
+    )
 
     def flags_for(self, **flags: bool) -> int:
         """Retrieves flags for given attributes.
@@ -155,22 +214,27 @@ class FlagObject(object):
         Returns:
             int: A bitmask containing the specified flags, or 0 if nothing was provided.
         """
+        mapping = self._flag_mapping()
         res = 0
         for k, v in flags.items():
             if v:
-                res |= self.flag_mapping[k]
+                res |= mapping[k]
         return res
 
+    def _flag_mapping(self) -> Mapping[str, int]:
+        # Subclasses written for older versions extend the mapping in setup_flag_mapping, which
+        # was called for every instance
+        overridden = type(self).setup_flag_mapping is not FlagObject.setup_flag_mapping
+        if overridden and "flag_mapping" not in getattr(self, "__dict__", ()):
+            self.setup_flag_mapping()
+        return self.flag_mapping
+
     def setup_flag_mapping(self) -> None:
-        """Sets up a class-level mapping of common flags, in the format human-readable name:value.
-        Tipically expanded upon in a subclass.
+        """Gives this object its own, mutable copy of its class's flag mapping.
+
+        Only kept for backwards compatibility, for subclasses which override this to call it and
+        then update ``self.flag_mapping``: flag mappings are now defined once per class rather
+        than built for every instance.
         """
-        self.flag_mapping = {
-            "loop": BASS_SAMPLE_LOOP,
-            "autofree": BASS_STREAM_AUTOFREE,
-            "mono": BASS_SAMPLE_MONO,
-            "software": BASS_SAMPLE_SOFTWARE,
-            "three_d": BASS_SAMPLE_3D,
-            "fx": BASS_SAMPLE_FX,
-            "decode": BASS_STREAM_DECODE,
-        }
+        if hasattr(self, "__dict__"):
+            self.flag_mapping = dict(type(self).flag_mapping)
@@ -0,0 +1,328 @@
+from __future__ import absolute_import
+
+import ctypes
+import os
+import struct
+import time
+from types import MappingProxyType
+
+from .channel import Channel
+from .external import pybassmix
+from .external.pybass import (
+    BASS_ChannelGetData,
+    BASS_ErrorGetCode,
+    BASS_ERROR_ENDED,
+    BASS_SAMPLE_8BITS,
+    BASS_SAMPLE_FLOAT,
+    BASS_STREAM_DECODE,
+    get_error_description,
+)
+from .main import BassError, bass_call
+from .stream import BaseStream
+
+# BASS_ChannelGetData returns (DWORD)-1 on failure
+_DATA_ERROR = 0xFFFFFFFF
+
+
+class _WaveWriter(object):
+    """Minimal WAV writer for raw BASS sample data.
+
+    Unlike the :mod:`wave` module this writes 32-bit floating-point data as well as PCM,
+    and accepts any buffer-protocol object without copying it first.
+    The header is written up front and its sizes patched in on close.
+    """
+
+    def __init__(self, filename, frequency, channels, sample_size, is_float):
+        self.file = open(filename, "wb")
+        self.length = 0
+        format_tag = 3 if is_float else 1
+        block_align = channels * sample_size
+        self.file.write(
+            struct.pack(
+                "<4sI4s4sIHHIIHH4sI",
+                b"RIFF",
+                0,
+                b"WAVE",
+                b"fmt ",
+                16,
+                format_tag,
+                channels,
+                frequency,
+                frequency * block_align,
+                block_align,
+                sample_size * 8,
+                b"data",
+                0,
+            )
+        )
+
+    def write(self, data):
+        self.length += self.file.write(data)
+
+    def close(self):
+        self.file.seek(4)
+        self.file.write(struct.pack("<I", 36 + self.length))
+        self.file.seek(40)
+        self.file.write(struct.pack("<I", self.length))
+        self.file.close()
+
+
+class Mixer(BaseStream):
+    """A stream that mixes together any number of source channels, resampling as needed.
+
+    Sources must be decoding channels (created with ``decode=True``).
+    A mixer created with ``decode=True`` can itself be rendered offline with :meth:`render`,
+    or be added as a source to another mixer.
+
+    Args:
+        freq (int): Sample rate of the mix.
+        chans (int): Number of channels in the mix.
+        flags (int): BASS_MIXER_xxx / BASS_STREAM_xxx flags.
+        end (bool): End the stream when there are no active sources.
+        nonstop (bool): Keep outputting silence rather than stalling when there are no active sources.
+        resume (bool): When stalled, resume as soon as a source becomes available.
+        float (bool): Mix in 32-bit floating-point.
+        three_d (bool): Enable 3D functionality.
+        autofree (bool): Automatically free the mixer when playback ends.
+        decode (bool): Create a decoding channel.
+    """
+
+    __slots__ = ()
+
+    flag_mapping = MappingProxyType(
+        dict(
+            BaseStream.flag_mapping,
+            end=pybassmix.BASS_MIXER_END,
+            nonstop=pybassmix.BASS_MIXER_NONSTOP,
+            resume=pybassmix.BASS_MIXER_RESUME,
+            float=BASS_SAMPLE_FLOAT,
+            filter=pybassmix.BASS_MIXER_FILTER,
+            buffer=pybassmix.BASS_MIXER_BUFFER,
+            limit=pybassmix.BASS_MIXER_LIMIT,
+            matrix=pybassmix.BASS_MIXER_MATRIX,
+            pause=pybassmix.BASS_MIXER_PAUSE,
+            downmix=pybassmix.BASS_MIXER_DOWNMIX,
+            norampin=pybassmix.BASS_MIXER_NORAMPIN,
+        )
+    )
+
+    def __init__(
+        self,
+        freq=44100,
+        chans=2,
+        flags=0,
+        end=False,
+        nonstop=False,
+        resume=False,
+        float=False,
+        three_d=False,
+        autofree=False,
+        decode=False,
+    ):
+        flags = flags | self.flags_for(
+            end=end,
+            nonstop=nonstop,
+            resume=resume,
+            float=float,
+            three_d=three_d,
+            autofree=autofree,
+            decode=decode,
+        )
+        handle = bass_call(pybassmix.BASS_Mixer_StreamCreate, freq, chans, flags)
+        super(Mixer, self).__init__(handle)
+
+    def add_channel(
+        self,
+        channel,
+        flags=0,
+        start=0,
+        length=0,
+        filter=False,
+        buffer=False,
+        limit=False,
+        matrix=False,
+        pause=False,
+        downmix=False,
+        norampin=False,
+        autofree=False,
+    ):
+        """Plugs a decoding channel into this mixer.
+
+        Args:
+          channel: The channel to add. Can take both a sound_lib.channel or bass handle.
+          flags (int): BASS_MIXER_xxx flags.
+          start (int): Delay in bytes (in the mixer's format) before the channel starts playing.
+          length (int): Maximum amount of data in bytes (in the mixer's format) to play, 0 = no limit.
+          filter (bool): Apply a low-pass filter when resampling.
+          buffer (bool): Buffer the source's data, so that level and data of it can be retrieved.
+          limit (bool): Limit the mixer's processing to the amount available from this source.
+          matrix (bool): Enable matrix mixing for this source.
+          pause (bool): Add the source paused.
+          downmix (bool): Downmix the source to the mixer's channel count.
+          norampin (bool): Don't ramp in the start of the source.
+          autofree (bool): Free the source when it ends.
+
+        Returns:
+            bool: True on success, False otherwise.
+
+        raises:
+            sound_lib.main.BassError: If the channel is not a decoding channel, is already plugged into a mixer, or its format isn't supported.
+        """
+        if isinstance(channel, Channel):
+            channel = channel.handle
+        flags = flags | self.flags_for(
+            filter=filter,
+            buffer=buffer,
+            limit=limit,
+            matrix=matrix,
+            pause=pause,
+            downmix=downmix,
+            norampin=norampin,
+            autofree=autofree,
+        )
+        if start or length:
+            return bass_call(
+                pybassmix.BASS_Mixer_StreamAddChannelEx,
+                self.handle,
+                channel,
+                flags,
+                start,
+                length,
+            )
+        return bass_call(
+            pybassmix.BASS_Mixer_StreamAddChannel, self.handle, channel, flags
+        )
+
+    def remove_channel(self, channel):
+        """Unplugs a channel from this mixer.
+
+        Args:
+          channel: The channel to remove. Can take both a sound_lib.channel or bass handle.
+
+        Returns:
+            bool: True on success, False otherwise.
+
+        raises:
+            sound_lib.main.BassError: If the channel is not plugged into a mixer.
+        """
+        if isinstance(channel, Channel):
+            channel = channel.handle
+        return bass_call(pybassmix.BASS_Mixer_ChannelRemove, channel)
+
+    def set_envelope(self, channel, nodes, type="volume", loop=False):
+        """Sets an envelope to modify the volume, pan or sample rate of a source channel over time.
+
+        The envelope's position starts at 0 when it is set, and advances as the source is mixed,
+        so changes take effect with sample accuracy even on decoding mixers.
+
+        Args:
+          channel: The source channel. Can take both a sound_lib.channel or bass handle.
+          nodes: A sequence of (position, value) pairs, with positions in bytes in the mixer's sample format.
+            An empty sequence or None removes the envelope.
+          type: "volume", "pan", "frequency", or a BASS_MIXER_ENV_xxx value. Defaults to "volume".
+          loop (bool): Loop the envelope. Defaults to False.
+
+        Returns:
+            bool: True on success, False otherwise.
+
+        raises:
+            sound_lib.main.BassError: If the channel is not plugged into a mixer, or the type is invalid.
+        """
+        types = {
+            "frequency": pybassmix.BASS_MIXER_ENV_FREQ,
+            "volume": pybassmix.BASS_MIXER_ENV_VOL,
+            "pan": pybassmix.BASS_MIXER_ENV_PAN,
+        }
+        if type in types:
+            type = types[type]
+        if loop:
+            type |= pybassmix.BASS_MIXER_ENV_LOOP
+        if isinstance(channel, Channel):
+            channel = channel.handle
+        if not nodes:
+            return bass_call(
+                pybassmix.BASS_Mixer_ChannelSetEnvelope, channel, type, None, 0
+            )
+        array = (pybassmix.BASS_MIXER_NODE * len(nodes))(*nodes)
+        return bass_call(
+            pybassmix.BASS_Mixer_ChannelSetEnvelope, channel, type, array, len(nodes)
+        )
+
+    def render(self, target, duration=None, block=65536):
+        """Renders this mixer as fast as possible, rather than in realtime.
+
+        The mixer must be a decoding channel. No sound device is needed, so this works with
+        device 0 ("no sound") initialized. Data is pulled into a single reused buffer of
+        ``block`` bytes, and written either to a WAV file or to an encoder.
+
+        Args:
+          target: A filename to write a WAV file to, or a :class:`sound_lib.encoder.Encoder`.
+            If the encoder was started on this mixer, it is fed by the render itself;
+            otherwise the data is passed to it with BASS_Encode_Write.
+          duration (float): Number of seconds to render, None = until the mixer ends. Defaults to None.
+          block (int): Number of bytes to retrieve per call. Defaults to 65536.
+
+        Returns:
+            dict: The number of bytes and seconds rendered, the elapsed wall-clock time and the realtime factor.
+
+        raises:
+            ValueError: If this mixer is not a decoding channel.
+            sound_lib.main.BassError: If retrieving the data or writing it to the encoder fails.
+        """
+        info = self.get_info()
+        if not info.flags & BASS_STREAM_DECODE:
+            raise ValueError("Only decoding mixers can be rendered")
+        if info.flags & BASS_SAMPLE_FLOAT:
+            sample_size = 4
+        elif info.flags & BASS_SAMPLE_8BITS:
+            sample_size = 1
+        else:
+            sample_size = 2
+        frame_size = sample_size * info.chans
+        block -= block % frame_size
+        remaining = None
+        if duration is not None:
+            remaining = int(duration * info.freq) * frame_size
+        buf = ctypes.create_string_buffer(block)
+        view = memoryview(buf).cast("B")
+        writer = None
+        encode_write = None
+        if isinstance(target, (str, bytes, os.PathLike)):
+            writer = _WaveWriter(
+                target, info.freq, info.chans, sample_size, info.flags & BASS_SAMPLE_FLOAT
+            )
+        elif getattr(target, "source", None) is not self:
+            from .external.pybassenc import BASS_Encode_Write
+
+            encode_write = BASS_Encode_Write
+        total = 0
+        start = time.perf_counter()
+        try:
+            while remaining is None or remaining > 0:
+                wanted = block if remaining is None else min(block, remaining)
+                got = BASS_ChannelGetData(self.handle, buf, wanted)
+                if got == _DATA_ERROR:
+                    code = BASS_ErrorGetCode()
+                    if code == BASS_ERROR_ENDED:
+                        break
+                    raise BassError(code, get_error_description(code))
+                if not got:
+                    break
+                if writer is not None:
+                    writer.write(view[:got])
+                elif encode_write is not None:
+                    bass_call(encode_write, target.handle, buf, got)
+                total += got
+                if remaining is not None:
+                    remaining -= got
+        finally:
+            if writer is not None:
+                writer.close()
+        elapsed = time.perf_counter() - start
+        seconds = total / float(info.freq * frame_size)
+        return {
+            "bytes": total,
+            "seconds": seconds,
+            "elapsed": elapsed,
+            "realtime_factor": seconds / elapsed if elapsed else float("inf"),
+        }
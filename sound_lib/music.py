@@ -1,3 +1,5 @@
+from types import MappingProxyType
+
 from .channel import Channel
 from .external.pybass import (
     BASS_ATTRIB_MUSIC_AMPLIFY,
@@ -14,10 +16,11 @@ from .external.pybass import (
 class Music(Channel):
     """ """
 
-    def __init__(self, mem=False, file=None, offset=0, length=0, flags=0, freq=0):
-        handle = BASS_MusicLoad(mem, file, offset, length, flags, freq)
-        super(Music, self).__init__(handle)
-        self.add_attributes_to_mapping(
+    __slots__ = ()
+
+    attribute_mapping = MappingProxyType(
+        dict(
+            Channel.attribute_mapping,
             music_amplify=BASS_ATTRIB_MUSIC_AMPLIFY,
             music_bpm=BASS_ATTRIB_MUSIC_BPM,
             music_pansep=BASS_ATTRIB_MUSIC_PANSEP,
@@ -26,3 +29,8 @@ class Music(Channel):
             music_vol_global=BASS_ATTRIB_MUSIC_VOL_GLOBAL,
             music_vol_inst=BASS_ATTRIB_MUSIC_VOL_INST,
         )
+    )
+
+    def __init__(self, mem=False, file=None, offset=0, length=0, flags=0, freq=0):
+        handle = BASS_MusicLoad(mem, file, offset, length, flags, freq)
+        super(Music, self).__init__(handle)
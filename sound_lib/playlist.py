@@ -0,0 +1,238 @@
+from __future__ import absolute_import
+
+import collections
+import contextlib
+import threading
+from logging import getLogger
+
+from .external.pybass import BASS_SYNC_END, BASS_SYNC_POS
+from .main import BassError
+from .mixer import Mixer
+from .stream import FileStream
+
+logger = getLogger("sound_lib.playlist")
+
+
+def _open_file(item):
+    """Opens a queued filename as a decoding stream."""
+    return FileStream(file=item, decode=True)
+
+
+class QueuePlayer(object):
+    """Plays a queue of audio files back to back through a :class:`sound_lib.mixer.Mixer`.
+
+    Upcoming items are opened as decoding streams on a background thread ahead of time,
+    and joined onto the mixer from a mixtime sync on the current item, so moving from one
+    item to the next involves no gap and no file opening on the playback path.
+    With a crossfade set, the next item starts that many seconds before the current one ends,
+    and the two are faded out and in with volume envelopes.
+
+    Args:
+        items: Items to queue initially. Defaults to None.
+        crossfade (float): Seconds of overlap between consecutive items, 0 = gapless. Defaults to 0.
+        prefetch (int): How many upcoming items to keep open. Defaults to 1.
+        mixer: The mixer to play through. Defaults to a new stereo floating-point mixer.
+        stream_factory: A callable taking an item and returning a decoding channel for it.
+            Defaults to opening the item as a :class:`sound_lib.stream.FileStream`.
+        on_advance: A callable taking the item that just started, called from the background thread. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        items=None,
+        crossfade=0.0,
+        prefetch=1,
+        mixer=None,
+        stream_factory=None,
+        on_advance=None,
+    ):
+        self._owns_mixer = mixer is None
+        if mixer is None:
+            mixer = Mixer(float=True, nonstop=True)
+        self.mixer = mixer
+        self.crossfade = crossfade
+        self.prefetch = max(1, prefetch)
+        self.stream_factory = stream_factory or _open_file
+        self.on_advance = on_advance
+        self._fade_bytes = mixer.seconds_to_bytes(crossfade) if crossfade else 0
+        self._pending = collections.deque(items or ())
+        self._ready = collections.deque()
+        self._mixing = {}
+        self._retired = []
+        self._advanced = []
+        self._current = None
+        self._started = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="QueuePlayer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def current(self):
+        """The item currently playing, or None."""
+        current = self._current
+        return current[0] if current is not None else None
+
+    def add(self, item):
+        """Adds an item to the end of the queue.
+
+        Args:
+          item: The item to queue, typically a filename.
+        """
+        with self._cond:
+            self._pending.append(item)
+            self._cond.notify()
+
+    def extend(self, items):
+        """Adds several items to the end of the queue.
+
+        Args:
+          items: The items to queue.
+        """
+        with self._cond:
+            self._pending.extend(items)
+            self._cond.notify()
+
+    def play(self):
+        """Starts (or resumes) playback of the queue."""
+        with self._locked():
+            self._started = True
+            if self._current is None:
+                self._start_next(False)
+        return self.mixer.play()
+
+    def pause(self):
+        """Pauses playback."""
+        return self.mixer.pause()
+
+    def skip(self):
+        """Moves on to the next item immediately, without a crossfade."""
+        with self._locked():
+            if self._current is not None:
+                self._retire(self._current[1].handle)
+            self._start_next(False)
+
+    def close(self):
+        """Stops playback, stops the prefetch thread and frees every stream opened by this player."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        with self._locked():
+            streams = list(self._mixing.values()) + [s for i, s in self._ready]
+            streams.extend(self._retired)
+            self._mixing.clear()
+            self._ready.clear()
+            self._retired = []
+            self._current = None
+        for stream in streams:
+            self._free(stream)
+        if self._owns_mixer:
+            self._free(self.mixer)
+
+    def _run(self):
+        """Prefetch thread: opens upcoming items, frees finished ones and reports advances."""
+        while True:
+            with self._cond:
+                while not self._closed and not self._has_work():
+                    self._cond.wait()
+                if self._closed:
+                    return
+                item = None
+                if self._pending and len(self._ready) < self.prefetch:
+                    item = self._pending.popleft()
+                retired, self._retired = self._retired, []
+                advanced, self._advanced = self._advanced, []
+            for stream in retired:
+                self._free(stream)
+            if self.on_advance is not None:
+                for started in advanced:
+                    self.on_advance(started)
+            if item is None:
+                continue
+            try:
+                stream = self.stream_factory(item)
+            except BassError:
+                logger.exception("Unable to open %r, skipping", item)
+                continue
+            with self._locked():
+                self._ready.append((item, stream))
+                if self._started and self._current is None:
+                    self._start_next(False)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Holds the mixer's lock and then our own.
+
+        Sync callbacks run with the mixer already locked, so taking the locks in the same
+        order everywhere else keeps BASS calls made under our lock from deadlocking.
+        """
+        self.mixer.lock()
+        try:
+            with self._cond:
+                yield
+        finally:
+            self.mixer.unlock()
+
+    def _has_work(self):
+        return bool(
+            self._retired
+            or self._advanced
+            or (self._pending and len(self._ready) < self.prefetch)
+        )
+
+    def _start_next(self, fade):
+        """Plugs the next opened item into the mixer. Must be called with the lock held."""
+        if not self._ready:
+            self._current = None
+            return
+        item, stream = self._ready.popleft()
+        self.mixer.add_channel(stream, norampin=not fade)
+        if fade:
+            self.mixer.set_envelope(stream, [(0, 0.0), (self._fade_bytes, 1.0)])
+        if self.crossfade:
+            position = max(0, stream.get_length() - stream.seconds_to_bytes(self.crossfade))
+            stream.set_sync(
+                BASS_SYNC_POS, position, self._on_transition, mixtime=True, onetime=True
+            )
+        stream.set_sync(BASS_SYNC_END, 0, self._on_end, mixtime=True, onetime=True)
+        self._mixing[stream.handle] = stream
+        self._current = (item, stream)
+        self._advanced.append(item)
+        self._cond.notify()
+
+    def _retire(self, handle):
+        """Unplugs a stream and hands it to the prefetch thread to be freed. Must be called with the lock held."""
+        stream = self._mixing.pop(handle, None)
+        if stream is not None:
+            try:
+                self.mixer.remove_channel(stream)
+            except BassError:
+                pass
+            self._retired.append(stream)
+            self._cond.notify()
+
+    def _on_transition(self, handle, channel, data, user):
+        """Mixtime sync: the current item is about to end, so start fading in the next one."""
+        with self._cond:
+            current = self._current
+            if current is None or current[1].handle != channel or not self._ready:
+                return
+            self.mixer.set_envelope(current[1], [(0, 1.0), (self._fade_bytes, 0.0)])
+            self._start_next(True)
+
+    def _on_end(self, handle, channel, data, user):
+        """Mixtime sync: an item has ended."""
+        with self._cond:
+            self._retire(channel)
+            current = self._current
+            if current is not None and current[1].handle == channel:
+                self._start_next(False)
+
+    @staticmethod
+    def _free(stream):
+        try:
+            stream.free()
+        except BassError:
+            pass
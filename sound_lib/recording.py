@@ -1,30 +1,312 @@
 from __future__ import absolute_import
 from .channel import Channel
-from .external.pybass import BASS_RecordStart, BASS_RECORD_PAUSE, RECORDPROC
-from ctypes import string_at
+from .external.pybass import (
+    BASS_RecordStart,
+    BASS_RECORD_PAUSE,
+    BASS_SAMPLE_8BITS,
+    BASS_SAMPLE_FLOAT,
+    RECORDPROC,
+)
+import ctypes
+import threading
 import wave
+from .encoder import RotatingEncoder
 from .main import bass_call
+from .ringbuffer import RingBuffer
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Preroll(object):
+    """Keeps the last few seconds of a recording, as float samples, eg. to save audio from before a voice trigger.
+
+    The samples are kept in a preallocated circular NumPy array, which each recorded buffer is
+    converted into in place, so nothing is allocated for the audio as it arrives. Saving with
+    :meth:`start_saving` writes the kept audio followed by the live audio to a wave file, with
+    no gap between them. Like :class:`WaveRecording`, the live audio is written to disk by a
+    writer thread, not the recording thread.
+
+    Usually created with :meth:`Recording.enable_preroll`.
+
+    Args:
+        seconds (float): How much audio to keep.
+        frequency (int): The recording's sample rate.
+        channels (int): The recording's number of channels.
+        flags (int): The recording's flags, for its sample format. Defaults to 16-bit.
+    """
+
+    def __init__(self, seconds, frequency, channels, flags=0):
+        if numpy is None:
+            raise ImportError("%s requires numpy, install sound_lib[numpy]" % type(self).__name__)
+        if flags & BASS_SAMPLE_FLOAT:
+            self._source_type = numpy.float32
+            self._scale, self._offset = 1.0, 0.0
+            self.sample_width = 2
+        elif flags & BASS_SAMPLE_8BITS:
+            self._source_type = numpy.uint8
+            self._scale, self._offset = 1 / 128.0, -1.0
+            self.sample_width = 1
+        else:
+            self._source_type = numpy.int16
+            self._scale, self._offset = 1 / 32768.0, 0.0
+            self.sample_width = 2
+        self.frequency = frequency
+        self.channels = channels
+        self.frames = max(int(seconds * frequency), 1)
+        self._samples = numpy.zeros((self.frames, channels), numpy.float32)
+        self._position = 0
+        self._filled = 0
+        self._lock = threading.Lock()
+        self._ring = None
+        self._file = None
+        self._writer = None
+
+    def write(self, address, length):
+        """Adds recorded data, as given to a recording callback."""
+        if not length:
+            return
+        count = length // numpy.dtype(self._source_type).itemsize
+        raw = (ctypes.c_char * length).from_address(address)
+        source = numpy.frombuffer(raw, self._source_type, count).reshape(-1, self.channels)
+        with self._lock:
+            if self._ring is not None:
+                self._ring.write(address, length)
+            if len(source) > self.frames:
+                source = source[-self.frames :]
+            position = self._position
+            first = min(len(source), self.frames - position)
+            self._convert(source[:first], self._samples[position : position + first])
+            self._convert(source[first:], self._samples[: len(source) - first])
+            self._position = (position + len(source)) % self.frames
+            self._filled = min(self._filled + len(source), self.frames)
+
+    def _convert(self, source, out):
+        if not len(source):
+            return
+        if self._scale == 1.0:
+            out[...] = source
+            return
+        numpy.multiply(source, self._scale, out=out, casting="unsafe")
+        if self._offset:
+            out += self._offset
+
+    def snapshot(self):
+        """Returns the audio kept, oldest first.
+
+        Returns:
+            numpy.ndarray: A float32 array of shape (frames, channels), with samples from -1 to 1.
+        """
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self):
+        if self._filled < self.frames:
+            return self._samples[: self._filled].copy()
+        return numpy.concatenate(
+            (self._samples[self._position :], self._samples[: self._position])
+        )
+
+    def _to_file_format(self, samples):
+        samples = numpy.clip(samples, -1.0, 1.0)
+        if self.sample_width == 1:
+            return ((samples + 1.0) * 127.5).astype(numpy.uint8).tobytes()
+        return (samples * 32767.0).astype("<i2").tobytes()
+
+    def start_saving(self, filename, buffer_seconds=2.0):
+        """Starts writing the audio kept, and then the live audio, to a wave file.
+
+        Args:
+          filename (str): The file to write.
+          buffer_seconds (float): Seconds of live audio to buffer while the disk is busy. Defaults to 2.
+
+        raises:
+            RuntimeError: If already saving.
+        """
+        if self._writer is not None:
+            raise RuntimeError("Already saving")
+        file = wave.open(filename, "wb")
+        file.setnchannels(self.channels)
+        file.setsampwidth(self.sample_width)
+        file.setframerate(self.frequency)
+        bytes_per_second = self.frequency * self.channels * numpy.dtype(self._source_type).itemsize
+        ring = RingBuffer(int(bytes_per_second * buffer_seconds))
+        # The snapshot and the first live buffer must meet exactly
+        with self._lock:
+            kept = self._snapshot()
+            self._ring = ring
+        file.writeframes(self._to_file_format(kept))
+        self._file = file
+        self._writer = threading.Thread(target=self._write_loop, name="Preroll")
+        self._writer.daemon = True
+        self._writer.start()
+
+    def _write_loop(self):
+        ring = self._ring
+        for chunk in ring:
+            if self._source_type is numpy.float32:
+                self._file.writeframes(self._to_file_format(numpy.frombuffer(chunk, numpy.float32)))
+            else:
+                self._file.writeframes(chunk)
+
+    @property
+    def saving(self):
+        """Whether audio is being saved."""
+        return self._writer is not None
+
+    @property
+    def dropped_bytes(self):
+        """Bytes of live audio dropped while saving because the disk fell behind."""
+        ring = self._ring
+        return ring.dropped_bytes if ring is not None else 0
+
+    def stop_saving(self):
+        """Stops saving, finishing the file. Does nothing if not saving."""
+        writer = self._writer
+        if writer is None:
+            return
+        with self._lock:
+            ring = self._ring
+            self._ring = None
+        ring.close()
+        writer.join()
+        self._file.close()
+        self._file = None
+        self._writer = None
 
 
 class Recording(Channel):
     """Base class for implementing audio recording functionality.
     Inherits from :class:`sound_lib.channel.Channel`. Everything works based on those functions.
     For example, calling play starts, stop stops, etc etc.
+
+    With encode_to, the recording is encoded as it is captured, by an
+    :class:`sound_lib.encoder.Encoder` attached to the recording channel, so the audio goes
+    straight from BASS to the encoder without Python handling it. The encoder is stopped with
+    the recording.
+
+    Args:
+        frequency (int): The sample rate. Defaults to 44100.
+        channels (int): The number of channels. Defaults to 2.
+        flags (int): BASS_RECORD_xxx and BASS_SAMPLE_xxx flags. Defaults to BASS_RECORD_PAUSE.
+        proc: A function taking (handle, buffer, length, user), called with the recorded data,
+            and returning whether to carry on recording. Defaults to None.
+        user: User instance data to pass to proc. Defaults to None.
+        encode_to (str): A file to encode the recording to. Defaults to None.
+        format (str): The format to encode to: "flac", "opus", "mp3", "ogg" or "wav". Defaults to
+            encode_to's extension.
+        bitrate (int): Target bitrate in kbps, for the lossy formats. Defaults to the encoder's default.
+        quality (int): Encoder quality, as for :func:`sound_lib.encoder.command_line`. Defaults to None.
+        rotate_bytes (int): Start a new file once the current one reaches this size. Defaults to None.
+        rotate_seconds (float): Start a new file once the current one holds this much audio.
+            Defaults to None. See :class:`sound_lib.encoder.RotatingEncoder` for how files are named.
     """
 
+    __slots__ = ("callback", "encoder", "preroll", "_proc", "_frequency", "_channels", "_flags")
+
+    _free_function = None
+
     def __init__(
-        self, frequency=44100, channels=2, flags=BASS_RECORD_PAUSE, proc=None, user=None
+        self,
+        frequency=44100,
+        channels=2,
+        flags=BASS_RECORD_PAUSE,
+        proc=None,
+        user=None,
+        encode_to=None,
+        format=None,
+        bitrate=None,
+        quality=None,
+        rotate_bytes=None,
+        rotate_seconds=None,
     ):
-        if not proc:
-            proc = lambda: True
-        self.callback = RECORDPROC(proc)
+        self._proc = proc
+        self.callback = RECORDPROC(self._record)
         self._frequency = frequency
         self._channels = channels
         self._flags = flags
+        self.encoder = None
+        self.preroll = None
         handle = bass_call(
             BASS_RecordStart, frequency, channels, flags, self.callback, user
         )
         super(Recording, self).__init__(handle)
+        if encode_to is not None:
+            try:
+                self.encoder = RotatingEncoder(
+                    self,
+                    encode_to,
+                    format=format,
+                    bitrate=bitrate,
+                    quality=quality,
+                    max_bytes=rotate_bytes,
+                    max_seconds=rotate_seconds,
+                )
+            except Exception:
+                # Stopping a recording frees it
+                super(Recording, self).stop()
+                raise
+
+    def _record(self, handle, buffer, length, user):
+        preroll = self.preroll
+        if preroll is not None:
+            preroll.write(buffer, length)
+        if self._proc is not None:
+            return self._proc(handle, buffer, length, user)
+        return True
+
+    def enable_preroll(self, seconds):
+        """Starts keeping the last few seconds of audio recorded, to be read with :meth:`snapshot` or saved with :meth:`start_saving`.
+
+        Args:
+          seconds (float): How much audio to keep.
+
+        Returns:
+            Preroll: The buffer.
+        """
+        self.disable_preroll()
+        self.preroll = Preroll(seconds, self._frequency, self._channels, self._flags)
+        return self.preroll
+
+    def disable_preroll(self):
+        """Stops keeping audio, and saving it."""
+        preroll = self.preroll
+        if preroll is not None:
+            self.preroll = None
+            preroll.stop_saving()
+
+    def snapshot(self):
+        """Returns the audio kept by the pre-roll buffer. See :meth:`Preroll.snapshot`."""
+        return self._require_preroll().snapshot()
+
+    def start_saving(self, filename, **kwargs):
+        """Saves the audio kept by the pre-roll buffer, followed by the live audio, to a wave file. See :meth:`Preroll.start_saving`."""
+        self._require_preroll().start_saving(filename, **kwargs)
+
+    def stop_saving(self):
+        """Stops saving, finishing the file."""
+        self._require_preroll().stop_saving()
+
+    def _require_preroll(self):
+        if self.preroll is None:
+            raise ValueError("enable_preroll hasn't been called")
+        return self.preroll
+
+    def stop(self, *args, **kwargs):
+        """Stops recording, and encoding if encode_to was given, and saving."""
+        # Stopping a recording frees it, and the encoders attached to it, so they go first
+        try:
+            if self.encoder is not None:
+                self.encoder.stop()
+        finally:
+            try:
+                if self.preroll is not None:
+                    self.preroll.stop_saving()
+            finally:
+                res = super(Recording, self).stop(*args, **kwargs)
+        return res
 
     def free(self):
         """
@@ -35,18 +317,71 @@ class Recording(Channel):
 
 
 class WaveRecording(Recording):
-    """Allows for making wave audio recordings to the filesystem."""
+    """Allows for making wave audio recordings to the filesystem.
+
+    The recording callback runs on BASS's recording thread, which must never wait for the disk,
+    or the recording gets gaps. So the callback only copies each buffer into a preallocated
+    :class:`sound_lib.ringbuffer.RingBuffer`, and a writer thread drains it to the file in large
+    writes. If the disk falls behind for longer than the ring buffer holds, the buffers which
+    don't fit are dropped and counted in :attr:`overruns` and :attr:`dropped_bytes`.
+
+    Args:
+        filename (str): The file to write.
+        proc: A recording callback to use instead of writing the file. Defaults to None.
+        buffer_seconds (float): Seconds of audio the ring buffer holds. Defaults to 2.
+        write_size (int): Bytes gathered before writing to the file, unless the recording is
+            quiet for a moment. Defaults to 256 KB.
+    """
 
-    def __init__(self, filename="", proc=None, *args, **kwargs):
+    __slots__ = ("filename", "file", "buffer_seconds", "write_size", "_ring", "_writer")
+
+    def __init__(
+        self, filename="", proc=None, *args, buffer_seconds=2.0, write_size=1 << 18, **kwargs
+    ):
+        self.buffer_seconds = buffer_seconds
+        self.write_size = write_size
+        self._ring = None
+        self._writer = None
         callback = proc or self._recording_callback
         super(WaveRecording, self).__init__(proc=callback, *args, **kwargs)
         self.filename = filename
 
     def _recording_callback(self, handle, buffer, length, user):
-        buf = string_at(buffer, length)
-        self.file.writeframes(buf)
+        ring = self._ring
+        if ring is not None:
+            ring.write(buffer, length)
         return True
 
+    def _write_loop(self):
+        ring = self._ring
+        batch = bytearray()
+        while True:
+            # Wait for the first chunk of a batch, then only briefly for the rest
+            chunk = ring.get(timeout=0.1 if batch else None)
+            if chunk is None:
+                if not batch:
+                    # Closed, and everything written
+                    return
+                self.file.writeframes(batch)
+                del batch[:]
+                continue
+            batch += chunk
+            chunk.release()
+            ring.release()
+            if len(batch) >= self.write_size:
+                self.file.writeframes(batch)
+                del batch[:]
+
+    @property
+    def overruns(self):
+        """The number of recorded buffers dropped because the writer thread fell behind."""
+        return self._ring.dropped_chunks if self._ring is not None else 0
+
+    @property
+    def dropped_bytes(self):
+        """The number of bytes dropped because the writer thread fell behind."""
+        return self._ring.dropped_bytes if self._ring is not None else 0
+
     def _setup_file(self):
         if not self.filename:
             raise ValueError("filename cannot be blank")
@@ -56,10 +391,25 @@ class WaveRecording(Recording):
         self.file.setframerate(self._frequency)
 
     def play(self, *args, **kwargs):
-        if not self.is_playing:
+        # Resuming after a pause carries on with the same file
+        if self._writer is None:
             self._setup_file()
+            self._ring = RingBuffer(
+                int(self._frequency * self._channels * 2 * self.buffer_seconds)
+            )
+            self._writer = threading.Thread(target=self._write_loop, name="WaveRecording")
+            self._writer.daemon = True
+            self._writer.start()
         super(WaveRecording, self).play(*args, **kwargs)
 
     def stop(self, *args, **kwargs):
-        super(WaveRecording, self).stop(*args, **kwargs)
-        self.file.close()
+        """Stops recording, and finishes writing the file."""
+        try:
+            super(WaveRecording, self).stop(*args, **kwargs)
+        finally:
+            writer = self._writer
+            if writer is not None:
+                self._ring.close()
+                writer.join()
+                self._writer = None
+                self.file.close()
@@ -0,0 +1,208 @@
+from __future__ import absolute_import
+
+import time
+import traceback
+import weakref
+
+from .external.pybass import (
+    BASS_ATTRIB_VOL,
+    BASS_CONFIG_HANDLES,
+    BASS_ChannelPause,
+    BASS_ChannelSlideAttribute,
+    BASS_ChannelStop,
+    BASS_GetConfig,
+)
+from .finalizer import reaper
+from .main import BassError
+
+
+class _Entry(weakref.ref):
+    """A weak reference to a live object owning a BASS handle, with what the registry knows about it."""
+
+    __slots__ = ("handle", "free_function", "created", "site")
+
+
+class HandleRegistry(object):
+    """Keeps track of every live :class:`sound_lib.channel.Channel`, :class:`sound_lib.encoder.Encoder`
+    and :class:`sound_lib.effects.effect.SoundEffect` in the process.
+
+    Objects are held weakly, and each one's type, handle and creation time is remembered,
+    along with where it was created if :attr:`record_sites` is enabled.
+    Objects which are collected without having been freed are handed to the reaper.
+
+    Args:
+        reaper: The :class:`sound_lib.finalizer.HandleReaper` to free leaked handles with.
+    """
+
+    def __init__(self, reaper=None):
+        self.reaper = reaper
+        #: Record a stack trace for every new handle, for tracking down leaks. Defaults to False.
+        self.record_sites = False
+        self._entries = set()
+
+    def track(self, obj, handle, free_function=None):
+        """Registers a live object.
+
+        Args:
+          obj: The object owning the handle.
+          handle (int): The BASS handle.
+          free_function: The BASS function to free the handle with if the object is collected first,
+            or None if it doesn't need freeing. Defaults to None.
+
+        Returns:
+            A token to pass to :meth:`untrack` once the handle has been freed.
+        """
+        entry = _Entry(obj, self._collected)
+        entry.handle = handle
+        entry.free_function = free_function
+        entry.created = time.monotonic()
+        entry.site = None
+        if self.record_sites:
+            entry.site = "".join(traceback.format_stack()[:-1])
+        self._entries.add(entry)
+        return entry
+
+    def untrack(self, token):
+        """Forgets an object, typically because its handle has been freed.
+
+        Args:
+          token: The value returned by :meth:`track`. None is ignored.
+        """
+        self._entries.discard(token)
+
+    def _collected(self, entry):
+        # Runs inside garbage collection, so only hand the handle over
+        if entry not in self._entries:
+            return
+        self._entries.discard(entry)
+        if entry.free_function is not None and self.reaper is not None:
+            self.reaper.enqueue(entry.free_function, entry.handle)
+
+    def _snapshot(self):
+        # Garbage collection on another thread can shrink the set while it is copied
+        while True:
+            try:
+                return self._entries.copy()
+            except RuntimeError:
+                pass
+
+    def _live(self, kind):
+        for entry in self._snapshot():
+            obj = entry()
+            if obj is not None and (kind is None or isinstance(obj, kind)):
+                yield entry, obj
+
+    def live(self, kind=None):
+        """Retrieves the live objects being tracked.
+
+        Args:
+          kind: Only return instances of this class (or tuple of classes). Defaults to None, for everything.
+
+        Returns:
+            list: The objects.
+        """
+        return [obj for entry, obj in self._live(kind)]
+
+    def describe(self, kind=None):
+        """Describes the live objects being tracked, oldest first, for diagnosing leaks.
+
+        Args:
+          kind: Only describe instances of this class (or tuple of classes). Defaults to None, for everything.
+
+        Returns:
+            list: A dict per object, with its type, handle, age in seconds and creation site (None unless :attr:`record_sites` was enabled).
+        """
+        now = time.monotonic()
+        res = [
+            {
+                "type": type(obj).__name__,
+                "handle": entry.handle,
+                "age": now - entry.created,
+                "site": entry.site,
+            }
+            for entry, obj in self._live(kind)
+        ]
+        res.sort(key=lambda item: item["age"], reverse=True)
+        return res
+
+    def counts(self):
+        """Counts the live objects being tracked by type.
+
+        Returns:
+            dict: The number of live objects per type name, plus "total", and "bass_handles",
+                the number of stream/music/sample/recording handles BASS itself reports as existing.
+        """
+        res = {}
+        total = 0
+        for entry, obj in self._live(None):
+            name = type(obj).__name__
+            res[name] = res.get(name, 0) + 1
+            total += 1
+        res["total"] = total
+        res["bass_handles"] = BASS_GetConfig(BASS_CONFIG_HANDLES)
+        return res
+
+    def _channel_handles(self):
+        from .channel import Channel
+
+        return [entry.handle for entry, obj in self._live(Channel)]
+
+    def stop_all(self):
+        """Stops every live channel.
+
+        Returns:
+            int: The number of channels stopped.
+        """
+        return sum(1 for handle in self._channel_handles() if BASS_ChannelStop(handle))
+
+    def pause_all(self):
+        """Pauses every live channel which is playing.
+
+        Returns:
+            int: The number of channels paused.
+        """
+        return sum(1 for handle in self._channel_handles() if BASS_ChannelPause(handle))
+
+    def fade_all(self, seconds, stop=True):
+        """Fades out every live channel.
+
+        Args:
+          seconds (float): How long the fade should take.
+          stop (bool): Stop each channel once it has faded out. Defaults to True.
+
+        Returns:
+            int: The number of channels faded.
+        """
+        value = -1.0 if stop else 0.0
+        duration = int(seconds * 1000)
+        return sum(
+            1
+            for handle in self._channel_handles()
+            if BASS_ChannelSlideAttribute(handle, BASS_ATTRIB_VOL, value, duration)
+        )
+
+    def free_where(self, predicate, kind=None):
+        """Frees every live object matching a predicate.
+
+        Args:
+          predicate: A callable taking an object and returning True if it should be freed.
+          kind: Only consider instances of this class (or tuple of classes). Defaults to None, for everything.
+
+        Returns:
+            int: The number of objects freed.
+        """
+        freed = 0
+        for entry, obj in self._live(kind):
+            free = getattr(obj, "free", None)
+            if free is None or not predicate(obj):
+                continue
+            try:
+                free()
+            except BassError:
+                continue
+            freed += 1
+        return freed
+
+
+#: The registry every sound_lib object owning a handle registers with.
+registry = HandleRegistry(reaper)
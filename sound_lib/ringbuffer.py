@@ -0,0 +1,191 @@
+from __future__ import absolute_import
+
+import asyncio
+import collections
+import ctypes
+import threading
+from logging import getLogger
+
+logger = getLogger("sound_lib.ringbuffer")
+
+
+class RingBuffer(object):
+    """A fixed-size buffer passing chunks of bytes from a BASS callback thread to a consumer.
+
+    The producer copies each chunk straight from the address BASS gives it into preallocated
+    memory, with no Python bytes object created and the GIL released during the copy. The
+    consumer is handed memoryviews of that memory, so nothing is copied on the way out either.
+    Every chunk is stored contiguously; a chunk which doesn't fit in the free space is dropped
+    rather than blocking the producer, and counted in :attr:`dropped_bytes` and :attr:`dropped_chunks`.
+
+    Args:
+        capacity (int): Size of the buffer in bytes.
+    """
+
+    def __init__(self, capacity):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._address = ctypes.addressof((ctypes.c_char * capacity).from_buffer(self._buffer))
+        # (start, length) of every chunk not yet released, oldest first
+        self._chunks = collections.deque()
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._listeners = []
+        self._reported = 0
+        self.dropped_bytes = 0
+        self.dropped_chunks = 0
+        self.closed = False
+
+    def _reserve(self, length):
+        """Finds room for a chunk, returning its start or None. Called with the lock held."""
+        chunks = self._chunks
+        if length > self.capacity:
+            return None
+        if not chunks:
+            return 0
+        tail = chunks[0][0]
+        newest_start, newest_length = chunks[-1]
+        head = newest_start + newest_length
+        if newest_start >= tail:
+            # The chunks run from tail to head: there is room after head, and before tail
+            if head + length <= self.capacity:
+                return head
+            if length <= tail:
+                return 0
+        elif head + length <= tail:
+            # The chunks have wrapped around: the only room is between head and tail
+            return head
+        return None
+
+    def write(self, address, length):
+        """Copies a chunk into the buffer, or drops it if there is no room.
+
+        Args:
+          address (int): The address of the data, as given to a BASS callback.
+          length (int): The length of the data in bytes.
+
+        Returns:
+            bool: True if the chunk was stored.
+        """
+        if not length:
+            return True
+        with self._lock:
+            if self.closed:
+                return False
+            start = self._reserve(length)
+            if start is None:
+                self.dropped_bytes += length
+                self.dropped_chunks += 1
+                return False
+            ctypes.memmove(self._address + start, address, length)
+            self._chunks.append((start, length))
+            self._ready.notify()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener()
+        return True
+
+    def get(self, timeout=None):
+        """Waits for the oldest chunk.
+
+        The chunk keeps its space in the buffer until :meth:`release` is called, and the
+        memoryview must not be used after that: copy it with bytes() to keep it.
+
+        Args:
+          timeout (float): Seconds to wait, 0 to not wait, or None to wait until a chunk arrives or the buffer is closed. Defaults to None.
+
+        Returns:
+            memoryview: The chunk, or None if the wait timed out or the buffer is closed and empty.
+        """
+        with self._ready:
+            if not self._chunks and not self.closed and timeout != 0:
+                self._ready.wait_for(lambda: self._chunks or self.closed, timeout)
+            if not self._chunks:
+                return None
+            start, length = self._chunks[0]
+            self._report()
+            return self._view[start : start + length]
+
+    def release(self):
+        """Frees the space of the chunk returned by :meth:`get`."""
+        with self._lock:
+            self._chunks.popleft()
+
+    def _report(self):
+        if self.dropped_bytes != self._reported:
+            logger.warning(
+                "Ring buffer overflowed: %d bytes dropped in total, in %d chunks",
+                self.dropped_bytes,
+                self.dropped_chunks,
+            )
+            self._reported = self.dropped_bytes
+
+    def close(self):
+        """Stops accepting chunks. Consumers still get the chunks already stored, then None."""
+        with self._lock:
+            self.closed = True
+            self._ready.notify_all()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener()
+
+    def add_listener(self, listener):
+        """Registers a function called (on the producer's thread) after every write, and on close."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Unregisters a function added with :meth:`add_listener`."""
+        with self._lock:
+            self._listeners.remove(listener)
+
+    @property
+    def used(self):
+        """The number of bytes in stored chunks."""
+        with self._lock:
+            return sum(length for start, length in self._chunks)
+
+    def __len__(self):
+        """The number of chunks stored."""
+        return len(self._chunks)
+
+    def __iter__(self):
+        """Yields chunks until the buffer is closed and empty, releasing each when the next is requested."""
+        while True:
+            chunk = self.get()
+            if chunk is None:
+                return
+            try:
+                yield chunk
+            finally:
+                chunk.release()
+                self.release()
+
+    async def __aiter__(self):
+        """Like iteration, but waits for chunks without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+
+        def wake():
+            loop.call_soon_threadsafe(event.set)
+
+        self.add_listener(wake)
+        try:
+            while True:
+                event.clear()
+                chunk = self.get(timeout=0)
+                if chunk is None:
+                    if self.closed:
+                        return
+                    await event.wait()
+                    continue
+                try:
+                    yield chunk
+                finally:
+                    chunk.release()
+                    self.release()
+        finally:
+            self.remove_listener(wake)
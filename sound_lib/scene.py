@@ -0,0 +1,244 @@
+from __future__ import absolute_import
+
+from ctypes import pointer
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .external.pybass import (
+    BASS_3DVECTOR,
+    BASS_ChannelPause,
+    BASS_ChannelPlay,
+    BASS_ChannelSet3DPosition,
+)
+from .listener import Listener
+from .main import apply_3d
+
+
+class Scene(object):
+    """Manages the 3d positions of many channels at once.
+
+    Positions, velocities and orientations are kept in contiguous NumPy arrays rather than
+    per-channel structures, and every :meth:`update` measures the distance from the listener
+    to all sources in one vectorized step. Sources further away than their maximum distance are
+    paused so they cost no decoding or mixing, and resumed once they come back into range.
+    BASS is only asked to pause a source as it leaves range, so one which wasn't playing then
+    isn't paused again on every update.
+    Only sources which are in range and have moved since the last update are sent to BASS,
+    and those are applied together with a single ``BASS_Apply3D``.
+
+    Requires numpy.
+
+    Args:
+        listener: The :class:`sound_lib.listener.Listener` distances are measured from. Defaults to a new one.
+        max_distance (float): Default distance beyond which sources are culled. Defaults to 100.
+        capacity (int): Number of sources to allocate room for up front. Defaults to 64.
+    """
+
+    def __init__(self, listener=None, max_distance=100.0, capacity=64):
+        if numpy is None:
+            raise ImportError("Scene requires numpy, install sound_lib[numpy]")
+        if listener is None:
+            listener = Listener()
+        self.listener = listener
+        self.max_distance = max_distance
+        self.channels = []
+        self._index = {}
+        self._allocate(max(1, capacity))
+        self._vectors = (BASS_3DVECTOR(), BASS_3DVECTOR(), BASS_3DVECTOR())
+        self._pointers = tuple(pointer(vector) for vector in self._vectors)
+
+    #: Per-source arrays, as name: (shape of one row, dtype)
+    _array_layout = {
+        "positions": ((3,), "float32"),
+        "velocities": ((3,), "float32"),
+        "orientations": ((3,), "float32"),
+        "max_distances": ((), "float32"),
+        "distances": ((), "float32"),
+        "dirty": ((), "bool"),
+        # Paused by the scene, to be resumed when back in range
+        "culled": ((), "bool"),
+        # Seen out of range by the last update, so already paused if it was playing
+        "out_of_range": ((), "bool"),
+    }
+
+    def _allocate(self, capacity):
+        count = len(self.channels)
+        grow = hasattr(self, "positions")
+        for name, (shape, dtype) in self._array_layout.items():
+            array = numpy.zeros((capacity,) + shape, dtype)
+            if grow:
+                array[:count] = getattr(self, name)[:count]
+            setattr(self, name, array)
+
+    def _arrays(self):
+        return [getattr(self, name) for name in self._array_layout]
+
+    def __len__(self):
+        return len(self.channels)
+
+    def __contains__(self, channel):
+        return channel.handle in self._index
+
+    def add(
+        self,
+        channel,
+        position=(0, 0, 0),
+        velocity=(0, 0, 0),
+        orientation=(0, 0, 0),
+        max_distance=None,
+    ):
+        """Adds a 3d channel to the scene. Its position is sent on the next :meth:`update`.
+
+        Args:
+          channel: A channel created with 3d functionality.
+          position: (x, y, z) position. Defaults to the origin.
+          velocity: (x, y, z) velocity. Defaults to stationary.
+          orientation: (x, y, z) direction the source faces. Defaults to (0, 0, 0), omnidirectional.
+          max_distance (float): Distance beyond which this source is culled. Defaults to the scene's max_distance.
+        """
+        if channel.handle in self._index:
+            raise ValueError("Channel is already in this scene")
+        index = len(self.channels)
+        if index == len(self.positions):
+            self._allocate(index * 2)
+        self.channels.append(channel)
+        self._index[channel.handle] = index
+        self.positions[index] = position
+        self.velocities[index] = velocity
+        self.orientations[index] = orientation
+        if max_distance is None:
+            max_distance = self.max_distance
+        self.max_distances[index] = max_distance
+        self.distances[index] = 0
+        self.dirty[index] = True
+        self.culled[index] = False
+        self.out_of_range[index] = False
+
+    def remove(self, channel):
+        """Removes a channel from the scene, resuming it if the scene had culled it.
+
+        Args:
+          channel: The channel to remove.
+        """
+        index = self._index.pop(channel.handle)
+        if self.culled[index]:
+            self._resume(channel.handle)
+        last = len(self.channels) - 1
+        if index != last:
+            moved = self.channels[last]
+            self.channels[index] = moved
+            self._index[moved.handle] = index
+            for array in self._arrays():
+                array[index] = array[last]
+        self.channels.pop()
+
+    def set_position(self, channel, position=None, velocity=None, orientation=None):
+        """Moves a source. The change is sent on the next :meth:`update`.
+
+        Args:
+          channel: A channel in this scene.
+          position: New (x, y, z) position, or None to leave unchanged. Defaults to None.
+          velocity: New (x, y, z) velocity, or None to leave unchanged. Defaults to None.
+          orientation: New (x, y, z) orientation, or None to leave unchanged. Defaults to None.
+        """
+        index = self._index[channel.handle]
+        if position is not None:
+            self.positions[index] = position
+        if velocity is not None:
+            self.velocities[index] = velocity
+        if orientation is not None:
+            self.orientations[index] = orientation
+        self.dirty[index] = True
+
+    def move(self, offsets):
+        """Moves every source at once.
+
+        Args:
+          offsets: An array of shape (len(scene), 3) added to the current positions.
+        """
+        count = len(self.channels)
+        self.positions[:count] += offsets
+        self.dirty[:count] = True
+
+    def update(self, listener_position=None):
+        """Culls and resumes sources by distance and sends moved sources to BASS.
+
+        Args:
+          listener_position: (x, y, z) position to measure from. Defaults to asking the listener.
+
+        Returns:
+            dict: How many sources were "culled", "resumed" and "updated" by this call.
+        """
+        count = len(self.channels)
+        res = {"culled": 0, "resumed": 0, "updated": 0}
+        if not count:
+            return res
+        if listener_position is None:
+            vector = self.listener.get_position()
+            listener_position = (vector.x, vector.y, vector.z)
+        offsets = self.positions[:count] - numpy.asarray(listener_position, numpy.float32)
+        distances = numpy.sqrt(
+            numpy.einsum("ij,ij->i", offsets, offsets), out=self.distances[:count]
+        )
+        in_range = distances <= self.max_distances[:count]
+        culled = self.culled[:count]
+        out_of_range = self.out_of_range[:count]
+        channels = self.channels
+        for index in numpy.flatnonzero(~in_range & ~out_of_range).tolist():
+            # Only sources which were actually playing get paused, and so later resumed
+            if self._pause(channels[index].handle):
+                culled[index] = True
+                res["culled"] += 1
+        numpy.logical_not(in_range, out=out_of_range)
+        resume = numpy.flatnonzero(in_range & culled)
+        dirty = self.dirty[:count]
+        push = self._changed(offsets, in_range)
+        if len(push):
+            self._push(push)
+            dirty[push] = False
+            res["updated"] = len(push)
+        for index in resume.tolist():
+            self._resume(channels[index].handle)
+            culled[index] = False
+            res["resumed"] += 1
+        return res
+
+    def _pause(self, handle):
+        """Culls a source, returning True if it should be resumed when back in range."""
+        return BASS_ChannelPause(handle)
+
+    def _resume(self, handle):
+        BASS_ChannelPlay(handle, False)
+
+    def _changed(self, offsets, in_range):
+        """Picks the sources to send to BASS, given their offsets from the listener and which are in range."""
+        return numpy.flatnonzero(in_range & self.dirty[: len(self.channels)])
+
+    def _push(self, indices):
+        """Sends the given sources' state to BASS."""
+        channels = self.channels
+        position, velocity, orientation = self._vectors
+        position_ptr, velocity_ptr, orientation_ptr = self._pointers
+        positions = self.positions[indices].tolist()
+        velocities = self.velocities[indices].tolist()
+        orientations = self.orientations[indices].tolist()
+        for i, index in enumerate(indices.tolist()):
+            position.x, position.y, position.z = positions[i]
+            velocity.x, velocity.y, velocity.z = velocities[i]
+            orientation.x, orientation.y, orientation.z = orientations[i]
+            BASS_ChannelSet3DPosition(
+                channels[index].handle, position_ptr, orientation_ptr, velocity_ptr
+            )
+        apply_3d()
+
+    def audible(self):
+        """Retrieves the sources currently in range.
+
+        Returns:
+            list: The channels which are not culled.
+        """
+        culled = self.culled.tolist()
+        return [channel for i, channel in enumerate(self.channels) if not culled[i]]
@@ -0,0 +1,180 @@
+from __future__ import absolute_import
+
+import ctypes
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .external import pybassmix
+from .scene import Scene
+
+
+class Spatializer(Scene):
+    """Positions many mono or stereo sources around the listener in software, through a :class:`sound_lib.mixer.Mixer`.
+
+    Instead of BASS's per-channel 3d processing, each source is plugged into the mixer with matrix
+    mixing, and every :meth:`update` computes all the sources' left/right gains in one NumPy pass:
+    inverse-distance rolloff clamped between each source's minimum and maximum distance, equal-power
+    panning by the source's direction relative to the listener's front and top vectors, and optionally
+    extra attenuation of the ear facing away from the source (a head-shadow level difference).
+    Only sources whose gains moved by more than ``threshold`` get a new matrix.
+    Sources beyond their maximum distance are paused within the mixer, as in :class:`sound_lib.scene.Scene`.
+
+    A mixing matrix can only scale, so interaural time differences and head-shadow filtering are
+    not modelled; use effects on the sources for those.
+
+    Requires numpy.
+
+    Args:
+        mixer: The :class:`sound_lib.mixer.Mixer` to mix the sources in. It should have 2 or more channels;
+            gains go to the first two, and a mono mixer only gets distance rolloff.
+        listener: The :class:`sound_lib.listener.Listener` giving the position and orientation. Defaults to a new one.
+        max_distance (float): Default distance beyond which sources are silent and paused. Defaults to 100.
+        min_distance (float): Default distance within which sources are at full volume. Defaults to 1.
+        rolloff (float): How quickly sources get quieter beyond their minimum distance, 1 = real world. Defaults to 1.
+        head_shadow (float): How much to attenuate the far ear for sources at the side, 0 to 1. Defaults to 0.
+        threshold (float): Smallest change in gain worth sending to BASS. Defaults to 0.001.
+        capacity (int): Number of sources to allocate room for up front. Defaults to 64.
+    """
+
+    _array_layout = dict(
+        Scene._array_layout,
+        min_distances=((), "float32"),
+        gains=((2,), "float32"),
+        sent=((2,), "float32"),
+        inputs=((), "int32"),
+    )
+
+    def __init__(
+        self,
+        mixer,
+        listener=None,
+        max_distance=100.0,
+        min_distance=1.0,
+        rolloff=1.0,
+        head_shadow=0.0,
+        threshold=0.001,
+        capacity=64,
+    ):
+        super(Spatializer, self).__init__(listener, max_distance, capacity)
+        self.mixer = mixer
+        self.min_distance = min_distance
+        self.rolloff = rolloff
+        self.head_shadow = head_shadow
+        self.threshold = threshold
+        self.outputs = mixer.get_info().chans
+        # Each source's mixing matrix and a pointer to it for BASS, in the same order as channels
+        self._matrices = []
+
+    def add(
+        self,
+        channel,
+        position=(0, 0, 0),
+        velocity=(0, 0, 0),
+        orientation=(0, 0, 0),
+        max_distance=None,
+        min_distance=None,
+    ):
+        """Plugs a decoding channel into the mixer and positions it. Its gains are set on the next :meth:`update`.
+
+        Velocity and orientation are stored but not used, as sources are omnidirectional and there is no doppler effect.
+
+        Args:
+          channel: A decoding channel, not already plugged into a mixer.
+          position: (x, y, z) position. Defaults to the origin.
+          velocity: (x, y, z) velocity. Defaults to stationary.
+          orientation: (x, y, z) direction the source faces. Defaults to (0, 0, 0).
+          max_distance (float): Distance beyond which this source is silent and paused. Defaults to the spatializer's max_distance.
+          min_distance (float): Distance within which this source is at full volume. Defaults to the spatializer's min_distance.
+        """
+        inputs = channel.get_info().chans
+        # Start paused and silent, so nothing is heard before the first update
+        self.mixer.add_channel(channel, matrix=True, pause=True)
+        super(Spatializer, self).add(
+            channel, position, velocity, orientation, max_distance
+        )
+        index = self._index[channel.handle]
+        if min_distance is None:
+            min_distance = self.min_distance
+        self.min_distances[index] = min_distance
+        self.inputs[index] = inputs
+        self.sent[index] = -1
+        self.culled[index] = True
+        self.out_of_range[index] = True
+        matrix = numpy.zeros((self.outputs, inputs), numpy.float32)
+        self._matrices.append((matrix, matrix.ctypes.data_as(ctypes.POINTER(ctypes.c_float))))
+
+    def remove(self, channel):
+        """Removes a source from the spatializer and unplugs it from the mixer.
+
+        Args:
+          channel: The channel to remove.
+        """
+        index = self._index[channel.handle]
+        # Moved the way the scene moves the last source's arrays into the removed one's place
+        self._matrices[index] = self._matrices[-1]
+        self._matrices.pop()
+        super(Spatializer, self).remove(channel)
+        self.mixer.remove_channel(channel)
+
+    def _pause(self, handle):
+        pybassmix.BASS_Mixer_ChannelFlags(
+            handle, pybassmix.BASS_MIXER_PAUSE, pybassmix.BASS_MIXER_PAUSE
+        )
+        return True
+
+    def _resume(self, handle):
+        pybassmix.BASS_Mixer_ChannelFlags(handle, 0, pybassmix.BASS_MIXER_PAUSE)
+
+    def _orientation(self):
+        state = self.listener.get_3d_position()
+        front = numpy.array(
+            (state["front"].x, state["front"].y, state["front"].z), numpy.float32
+        )
+        top = numpy.array((state["top"].x, state["top"].y, state["top"].z), numpy.float32)
+        # BASS's coordinate system is left-handed, so right is top x front
+        right = numpy.cross(top, front)
+        length = numpy.linalg.norm(right)
+        if not length:
+            right = numpy.array((1, 0, 0), numpy.float32)
+        else:
+            right /= length
+        return right
+
+    def _changed(self, offsets, in_range):
+        count = len(self.channels)
+        distances = self.distances[:count]
+        min_distances = self.min_distances[:count]
+        clamped = numpy.clip(distances, min_distances, self.max_distances[:count])
+        gain = min_distances / (min_distances + self.rolloff * (clamped - min_distances))
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            pan = numpy.where(distances > 0, offsets.dot(self._orientation()) / distances, 0)
+        pan = numpy.clip(pan, -1, 1)
+        angle = (pan + 1) * (math.pi / 4)
+        gains = self.gains[:count]
+        gains[:, 0] = numpy.cos(angle) * gain
+        gains[:, 1] = numpy.sin(angle) * gain
+        if self.head_shadow:
+            gains[:, 0] *= 1 - self.head_shadow * numpy.maximum(pan, 0)
+            gains[:, 1] *= 1 + self.head_shadow * numpy.minimum(pan, 0)
+        moved = numpy.abs(gains - self.sent[:count]).max(axis=1) > self.threshold
+        return numpy.flatnonzero(in_range & moved)
+
+    def _push(self, indices):
+        channels = self.channels
+        gains = self.gains[indices]
+        inputs = self.inputs[indices].tolist()
+        outputs = self.outputs
+        matrices = self._matrices
+        for i, index in enumerate(indices.tolist()):
+            matrix, matrix_pointer = matrices[index]
+            if outputs == 1:
+                matrix[0] = numpy.hypot(*gains[i]) / inputs[i]
+            else:
+                # Downmix the source's channels, then pan the result
+                numpy.divide(gains[i, :, None], inputs[i], out=matrix[:2])
+            pybassmix.BASS_Mixer_ChannelSetMatrix(channels[index].handle, matrix_pointer)
+        self.sent[indices] = gains
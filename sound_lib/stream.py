@@ -4,6 +4,7 @@ import ctypes
 import os
 import platform
 import sys
+from types import MappingProxyType
 
 from .channel import Channel
 from .external.pybass import (
@@ -41,6 +42,12 @@ except NameError:
 class BaseStream(Channel):
     """ """
 
+    __slots__ = ()
+
+    flag_mapping = MappingProxyType(dict(Channel.flag_mapping, unicode=BASS_UNICODE))
+
+    _free_function = BASS_StreamFree
+
     def _callback(*args):
         """
 
@@ -55,7 +62,7 @@ class BaseStream(Channel):
 
     def free(self):
         """Frees a sample stream's resources, including any sync/DSP/FX it has."""
-        return bass_call(BASS_StreamFree, self.handle)
+        return super(BaseStream, self).free()
 
     def get_file_position(self, mode):
         """
@@ -91,16 +98,13 @@ class BaseStream(Channel):
             )
         return bass_call_0(BASS_StreamPutFileData, self.handle, data, len(data))
 
-    def setup_flag_mapping(self):
-        """ """
-        super(BaseStream, self).setup_flag_mapping()
-        self.flag_mapping.update({"unicode": BASS_UNICODE})
-
 
 class Stream(BaseStream):
     """A sample stream.
     Higher-level streams are used in 90% of cases."""
 
+    __slots__ = ("proc",)
+
     def __init__(
         self,
         freq=44100,
@@ -113,7 +117,6 @@ class Stream(BaseStream):
         decode=False,
     ):
         self.proc = STREAMPROC(proc)
-        self.setup_flag_mapping()
         flags = flags | self.flags_for(
             three_d=three_d, autofree=autofree, decode=decode
         )
@@ -139,6 +142,8 @@ class FileStream(BaseStream):
         unicode (bool): Filename is in Unicode format.
     """
 
+    __slots__ = ("file",)
+
     def __init__(
         self,
         mem=False,
@@ -155,7 +160,6 @@ class FileStream(BaseStream):
         if platform.system() == "Darwin" and file and not mem:
             unicode = False
             file = file.encode(sys.getfilesystemencoding())
-        self.setup_flag_mapping()
         flags = flags | self.flags_for(
             three_d=three_d,
             autofree=autofree,
@@ -175,6 +179,8 @@ class URLStream(BaseStream):
     """Creates a sample stream from a file found on the internet.
     Downloaded data can optionally be received through a callback function for further manipulation."""
 
+    __slots__ = ("_downloadproc", "downloadproc", "url")
+
     def __init__(
         self,
         url="",
@@ -193,7 +199,6 @@ class URLStream(BaseStream):
         self._downloadproc = downloadproc or self._callback  # we *must hold on to this
         self.downloadproc = DOWNLOADPROC(self._downloadproc)
         self.url = url
-        self.setup_flag_mapping()
         flags = flags | self.flags_for(
             three_d=three_d, autofree=autofree, decode=decode, unicode=unicode
         )
@@ -207,6 +212,8 @@ class URLStream(BaseStream):
 class PushStream(BaseStream):
     """A stream that receives and plays raw audio data in realtime."""
 
+    __slots__ = ("proc",)
+
     def __init__(
         self,
         freq=44100,
@@ -218,7 +225,6 @@ class PushStream(BaseStream):
         decode=False,
     ):
         self.proc = STREAMPROC_PUSH
-        self.setup_flag_mapping()
         flags = flags | self.flags_for(
             three_d=three_d, autofree=autofree, decode=decode
         )
@@ -296,6 +302,16 @@ class FileUserStream(BaseStream):
         decode (bool): Create a decoding channel
     """
 
+    __slots__ = (
+        "file_obj",
+        "_original_position",
+        "_close_func",
+        "_length_func",
+        "_read_func",
+        "_seek_func",
+        "file_procs",
+    )
+
     def __init__(
         self,
         file_obj,
@@ -307,7 +323,6 @@ class FileUserStream(BaseStream):
         decode=False,
     ):
         self.file_obj = file_obj
-        self.setup_flag_mapping()
         flags = flags | self.flags_for(
             three_d=three_d,
             autofree=autofree,
@@ -0,0 +1,271 @@
+from __future__ import absolute_import
+
+import collections
+import ctypes
+import multiprocessing
+import os
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from logging import getLogger
+
+from .encoder import Encoder, command_line
+from .external import pybass
+from .main import BassError, bass_call, get_error_description
+from .stream import FileStream
+
+logger = getLogger("sound_lib.transcode")
+
+#: BASS_ChannelGetData's error result, as its DWORD return type comes back
+_GET_DATA_ERROR = 0xFFFFFFFF
+
+TranscodeJob = collections.namedtuple("TranscodeJob", ("input", "output", "spec"))
+TranscodeJob.__doc__ = """A file to transcode: the input path, output path and encoder spec (see :func:`transcode`)."""
+
+TranscodeResult = collections.namedtuple(
+    "TranscodeResult",
+    ("job", "duration", "elapsed", "realtime_factor", "attempts", "error"),
+)
+TranscodeResult.__doc__ = """The outcome of a :class:`TranscodeJob`.
+
+duration is the length of the audio in seconds, elapsed the seconds the successful attempt took,
+and realtime_factor their ratio (eg. 50 for an hour of audio transcoded in 72 seconds); all three
+are None if every attempt failed. attempts is the number of attempts made, and error the message
+of the last failure, or None on success.
+"""
+
+
+def _encoder_for(stream, path, spec):
+    """Starts an encoder writing the stream to path, as described by spec."""
+    spec = dict(spec)
+    format = spec.pop("format")
+    if format == "wav":
+        return Encoder(stream, os.fsencode(path), pcm=True, autofree=True, pause=False)
+    cmd, flags = command_line(format, path, spec.pop("bitrate", None), spec.pop("quality", None))
+    flags.update(spec)
+    return Encoder(stream, cmd, autofree=True, pause=False, **flags)
+
+
+def _open(path):
+    """Opens a file for decoding."""
+    if os.name == "nt":
+        return FileStream(file=path, decode=True)
+    # Elsewhere BASS takes filenames as bytes; a str would be passed as wide characters
+    return FileStream(file=os.fsencode(path), decode=True, unicode=False)
+
+
+def transcode(input, output, spec, chunk_size=1 << 20, progress=None, progress_interval=0.5):
+    """Transcodes a file, as fast as it can be decoded and encoded.
+
+    The input is decoded by a decoding :class:`sound_lib.stream.FileStream` with an
+    :class:`sound_lib.encoder.Encoder` attached, and pumped with large reads into a reused buffer.
+    The output is written to a temporary file next to it, which replaces the output only once
+    encoding has finished, so the output is never left half written. BASS must be initialized
+    (device 0, "no sound", is enough).
+
+    Args:
+      input (str): The file to read.
+      output (str): The file to write.
+      spec (dict): The encoding: "format" ("wav", or a format of :func:`sound_lib.encoder.command_line`),
+        optionally with "bitrate" and "quality", and any other :class:`sound_lib.encoder.Encoder` flags.
+      chunk_size (int): Bytes decoded per read. Defaults to 1 MB.
+      progress: A function taking the fraction done (0 to 1), called every progress_interval
+        seconds and at the end. Defaults to None.
+      progress_interval (float): Seconds between progress calls. Defaults to 0.5.
+
+    Returns:
+        tuple: (duration, elapsed): the length of the audio and the time taken, in seconds.
+    """
+    began = time.monotonic()
+    directory, name = os.path.split(os.path.abspath(output))
+    fd, temp = tempfile.mkstemp(prefix="." + name + ".", suffix=".part", dir=directory)
+    os.close(fd)
+    stream = None
+    try:
+        stream = _open(input)
+        total = stream.get_length()
+        duration = stream.length_in_seconds()
+        encoder = _encoder_for(stream, temp, spec)
+        buffer = ctypes.create_string_buffer(chunk_size)
+        decoded = 0
+        reported = began
+        while True:
+            got = pybass.BASS_ChannelGetData(stream.handle, buffer, chunk_size)
+            if got == _GET_DATA_ERROR or got == -1:
+                code = pybass.BASS_ErrorGetCode()
+                if code == pybass.BASS_ERROR_ENDED:
+                    break
+                raise BassError(code, get_error_description(code))
+            decoded += got
+            if progress is not None and time.monotonic() - reported >= progress_interval:
+                reported = time.monotonic()
+                progress(min(decoded / total, 1.0) if total > 0 else 0.0)
+        # Waits for the encoder to finish writing
+        encoder.stop()
+        stream.free()
+        stream = None
+        os.replace(temp, output)
+    except BaseException:
+        if stream is not None:
+            # Also stops the encoder, as it was started with autofree
+            stream.free()
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+    if progress is not None:
+        progress(1.0)
+    return duration, time.monotonic() - began
+
+
+def _init_worker():
+    """Initializes the "no sound" device in a worker process."""
+    try:
+        bass_call(pybass.BASS_Init, 0, 44100, 0, 0, None)
+    except BassError as e:
+        if e.code != pybass.BASS_ERROR_ALREADY:
+            raise
+
+
+def _run_job(index, job, retries, chunk_size, progress_queue):
+    """Runs a job, retrying failures, and returns its :class:`TranscodeResult`."""
+    progress = None
+    if progress_queue is not None:
+        progress = lambda fraction: progress_queue.put((index, fraction))
+    error = None
+    for attempt in range(1, retries + 2):
+        try:
+            duration, elapsed = transcode(
+                job.input, job.output, job.spec, chunk_size=chunk_size, progress=progress
+            )
+        except Exception as e:
+            # Kept as text, as not every exception survives the trip back from a worker process
+            error = "%s: %s" % (type(e).__name__, e)
+            logger.warning("Transcoding %s failed (attempt %d): %s", job.input, attempt, error)
+            continue
+        factor = duration / elapsed if elapsed > 0 else None
+        return TranscodeResult(job, duration, elapsed, factor, attempt, None)
+    return TranscodeResult(job, None, None, None, retries + 1, error)
+
+
+class TranscodePool(object):
+    """Transcodes many files at once, on a pool of worker processes.
+
+    Each worker process initializes BASS's "no sound" device and runs jobs with :func:`transcode`,
+    so as many files are decoded and encoded at a time as there are workers. Failed jobs are
+    retried, and reported in their :class:`TranscodeResult` rather than raised.
+
+    Example:
+        with TranscodePool(workers=4, progress=print) as pool:
+            results = pool.run(
+                (path, path[:-4] + ".mp3", {"format": "mp3", "bitrate": 192}) for path in wavs
+            )
+        for result in results:
+            print(result.job.input, result.realtime_factor, result.error)
+
+    Args:
+        workers (int): The number of worker processes. Defaults to the number of CPUs.
+        retries (int): Times a failed job is retried. Defaults to 2.
+        chunk_size (int): Bytes decoded per read. Defaults to 1 MB.
+        progress: A function taking (job, fraction), called in the parent process as jobs
+            progress. Defaults to None.
+        executor: A :mod:`concurrent.futures` executor to run jobs on instead of a process pool,
+            eg. a ThreadPoolExecutor when BASS is already initialized. It isn't shut down with
+            the pool. Defaults to None.
+    """
+
+    def __init__(self, workers=None, retries=2, chunk_size=1 << 20, progress=None, executor=None):
+        self.retries = retries
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self._owns_executor = executor is None
+        if executor is None:
+            # Spawned rather than forked: BASS's threads don't survive a fork
+            executor = ProcessPoolExecutor(
+                workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        self.executor = executor
+        self._jobs = []
+        self._lock = threading.Lock()
+        self._manager = None
+        self._progress_queue = None
+        self._progress_thread = None
+        if progress is not None:
+            if self._owns_executor:
+                self._manager = multiprocessing.get_context("spawn").Manager()
+                self._progress_queue = self._manager.Queue()
+            else:
+                self._progress_queue = queue.Queue()
+            self._progress_thread = threading.Thread(
+                target=self._report_progress, name="TranscodeProgress"
+            )
+            self._progress_thread.daemon = True
+            self._progress_thread.start()
+
+    def submit(self, input, output, spec):
+        """Queues a job.
+
+        Args:
+          input (str): The file to read.
+          output (str): The file to write.
+          spec (dict): The encoding, as for :func:`transcode`.
+
+        Returns:
+            concurrent.futures.Future: The future :class:`TranscodeResult`.
+        """
+        job = TranscodeJob(input, output, spec)
+        with self._lock:
+            index = len(self._jobs)
+            self._jobs.append(job)
+        return self.executor.submit(
+            _run_job, index, job, self.retries, self.chunk_size, self._progress_queue
+        )
+
+    def run(self, jobs):
+        """Runs jobs and waits for them all.
+
+        Args:
+          jobs: (input, output, spec) tuples.
+
+        Returns:
+            list: The :class:`TranscodeResult` of each job, in the order given.
+        """
+        futures = [self.submit(*job) for job in jobs]
+        return [future.result() for future in futures]
+
+    def _report_progress(self):
+        while True:
+            item = self._progress_queue.get()
+            if item is None:
+                return
+            index, fraction = item
+            try:
+                self.progress(self._jobs[index], fraction)
+            except Exception:
+                logger.exception("Error in transcode progress callback")
+
+    def shutdown(self, wait=True):
+        """Stops the pool once the queued jobs are done.
+
+        Args:
+          wait (bool): Wait for the jobs to finish. Defaults to True.
+        """
+        if self._owns_executor:
+            self.executor.shutdown(wait)
+        if self._progress_thread is not None:
+            self._progress_queue.put(None)
+            if wait:
+                self._progress_thread.join()
+            self._progress_thread = None
+        if self._manager is not None and wait:
+            self._manager.shutdown()
+            self._manager = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
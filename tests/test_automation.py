@@ -0,0 +1,167 @@
+"""Test cases for sound_lib.automation."""
+
+import time
+
+import pytest
+
+from sound_lib.automation import Automation, Curve
+from sound_lib.effects.effect import SoundEffect
+from sound_lib.external.pybass import BASS_SYNC_POS
+from sound_lib.main import BassError
+
+
+class FakeEffect(SoundEffect):
+    """Counts batches instead of talking to BASS."""
+
+    @classmethod
+    def _field_names(cls):
+        return {"cut_off_freq": "fCutOffFreq", "resonance": "fResonance", "gain": "fGain"}
+
+    def __init__(self):
+        object.__setattr__(self, "values", {})
+        object.__setattr__(self, "batches", 0)
+
+    def batch(self):
+        test = self
+
+        class Batch(object):
+            def __enter__(self):
+                return test
+
+            def __exit__(self, *exc):
+                object.__setattr__(test, "batches", test.batches + 1)
+
+        return Batch()
+
+    def __setattr__(self, attr, value):
+        self.values[attr] = value
+
+
+class FakeChannel(object):
+    def __init__(self):
+        self.attributes = {}
+        self.syncs = []
+
+    def set_attribute(self, attribute, value):
+        self.attributes[attribute] = value
+
+    def seconds_to_bytes(self, seconds):
+        return int(seconds * 1000)
+
+    def set_sync(self, type, param, callback, mixtime=False, onetime=False):
+        assert mixtime and onetime
+        self.syncs.append((type, param, callback))
+        return len(self.syncs)
+
+
+def test_curve_interpolation():
+    linear = Curve([(0, 0), (2, 10)])
+    assert linear.value_at(-1) == 0
+    assert linear.value_at(1) == 5
+    assert linear.value_at(3) == 10
+    assert Curve([(0, 0), (2, 10)], "step").value_at(1.9) == 0
+    assert Curve([(0, 100), (1, 10000)], "exponential").value_at(0.5) == pytest.approx(1000)
+    assert Curve([(0, 0), (2, 10)], loop=True).value_at(3) == 5
+    with pytest.raises(ValueError):
+        Curve([(1, 0), (0, 1)])
+    for values in ((0, 1), (1, -1)):
+        with pytest.raises(ValueError):
+            Curve([(0, values[0]), (1, values[1])], "exponential")
+
+
+def test_tick_coalesces_per_effect():
+    """All of an effect's lanes are applied in one batch per tick."""
+    automation = Automation(clock=lambda: 0.0)
+    effect = FakeEffect()
+    channel = FakeChannel()
+    automation.automate(effect, "cut_off_freq", [(0, 100), (1, 200)])
+    automation.automate(effect, "resonance", [(0, 1), (1, 2)])
+    automation.automate(channel, "volume", [(0, 0), (1, 1)])
+    assert automation.tick(0.5) == 2
+    assert effect.batches == 1
+    assert effect.values == {"cut_off_freq": 150.0, "resonance": 1.5}
+    assert channel.attributes == {"volume": 0.5}
+    # Nothing changed, so nothing is sent
+    assert automation.tick(0.5) == 0
+    assert effect.batches == 1
+
+
+def test_finished_lanes_are_dropped():
+    automation = Automation(clock=lambda: 0.0)
+    channel = FakeChannel()
+    automation.automate(channel, "pan", [(0, -1), (1, 1)])
+    automation.tick(2)
+    assert channel.attributes == {"pan": 1.0}
+    assert automation.lanes == []
+
+
+def test_new_curve_replaces_old_lane():
+    automation = Automation(clock=lambda: 0.0)
+    channel = FakeChannel()
+    automation.automate(channel, "pan", [(0, -1)])
+    lane = automation.automate(channel, "pan", [(0, 1)])
+    assert automation.lanes == [lane]
+
+
+def test_failing_target_is_dropped():
+    class Freed(FakeChannel):
+        def set_attribute(self, attribute, value):
+            raise BassError(5, "handle")
+
+    automation = Automation(clock=lambda: 0.0)
+    automation.automate(Freed(), "volume", [(0, 0), (10, 1)])
+    automation.tick(1)
+    assert automation.lanes == []
+
+
+def test_broken_lane_does_not_stop_the_others():
+    class Broken(Curve):
+        def value_at(self, t):
+            raise ZeroDivisionError("float division by zero")
+
+    automation = Automation(clock=lambda: 0.0)
+    broken, channel = FakeChannel(), FakeChannel()
+    automation.automate(broken, "volume", Broken([(0, 1), (10, 2)]))
+    lane = automation.automate(channel, "volume", [(0, 0), (10, 1)])
+    assert automation.tick(5) == 1
+    assert channel.attributes == {"volume": 0.5}
+    assert automation.lanes == [lane]
+
+
+def test_scheduler_thread():
+    automation = Automation(interval=0.001)
+    channel = FakeChannel()
+    automation.start()
+    try:
+        automation.automate(channel, "volume", [(0, 0), (0.05, 1)])
+        deadline = time.time() + 2
+        while channel.attributes.get("volume") != 1.0 and time.time() < deadline:
+            time.sleep(0.005)
+    finally:
+        automation.stop()
+    assert channel.attributes["volume"] == 1.0
+
+
+def test_schedule_curve_uses_mixtime_syncs():
+    automation = Automation()
+    channel = FakeChannel()
+    effect = FakeEffect()
+    automation.schedule_curve(channel, effect, "gain", [(0, 0), (0.5, -6)], offset=1)
+    assert [(t, p) for t, p, c in channel.syncs] == [
+        (BASS_SYNC_POS, 1000),
+        (BASS_SYNC_POS, 1500),
+    ]
+    channel.syncs[1][2](1, 2, 0, None)
+    assert effect.values == {"gain": -6.0}
+
+
+def test_unknown_effect_parameters_are_rejected():
+    automation = Automation()
+    channel = FakeChannel()
+    with pytest.raises(ValueError):
+        automation.automate(FakeEffect(), "cutoff_freq", [(0, 100)])
+    with pytest.raises(ValueError):
+        automation.set_at(channel, 1.0, FakeEffect(), "gian", -6)
+    with pytest.raises(ValueError):
+        automation.schedule_curve(channel, FakeEffect(), "gian", [(0, 0)])
+    assert automation.lanes == []
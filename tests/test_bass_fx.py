@@ -0,0 +1,122 @@
+"""Test cases for sound_lib.effects.bass_fx."""
+
+import ctypes
+
+import pytest
+
+from sound_lib.effects import bass_fx
+from sound_lib.effects.chain import EffectSpec
+from sound_lib.external import pybass, pybass_fx
+
+
+@pytest.fixture
+def bass(monkeypatch):
+    """Keeps every structure set on an effect, keyed by PeakEQ band where there is one."""
+    calls = {"set": [], "get": 0}
+    state = {}
+
+    def get_parameters(handle, params):
+        calls["get"] += 1
+        params = params.contents
+        key = getattr(params, "lBand", None)
+        if key not in state:
+            # Unset PeakEQ bands are an error; other effects start with their defaults
+            return int(key is None)
+        ctypes.memmove(ctypes.byref(params), state[key], ctypes.sizeof(params))
+        return 1
+
+    def set_parameters(handle, params):
+        params = params.contents
+        copy = type(params).from_buffer_copy(params)
+        state[getattr(copy, "lBand", None)] = ctypes.byref(copy)
+        calls["set"].append(copy)
+        return 1
+
+    monkeypatch.setattr(pybass, "BASS_ChannelSetFX", lambda channel, type, priority: 9)
+    monkeypatch.setattr(pybass, "BASS_FXGetParameters", get_parameters)
+    monkeypatch.setattr(pybass, "BASS_FXSetParameters", set_parameters)
+    return calls
+
+
+def test_structure_layouts():
+    """Structures match bass_fx.h on every platform."""
+    assert pybass_fx.BASS_BFX_PEAKEQ.lChannel.size == ctypes.sizeof(ctypes.c_int)
+    assert ctypes.sizeof(pybass_fx.BASS_BFX_ENV_NODE) == 16
+    assert pybass_fx.BASS_BFX_VOLUME_ENV.bFollow.size == 4
+    assert pybass_fx.BASS_BFX_VOLUME_ENV.pNodes.size == ctypes.sizeof(ctypes.c_void_p)
+    assert pybass_fx.BASS_BFX_MIX.lChannel.size == ctypes.sizeof(ctypes.c_void_p)
+
+
+def test_simple_effects_map_their_fields(bass):
+    compressor = bass_fx.Compressor2(1)
+    compressor.set_parameters(
+        {"fGain": 3, "fThreshold": -20, "fRatio": 4, "fAttack": 10, "fRelease": 200, "lChannel": -1}
+    )
+    compressor.ratio = 8
+    assert bass["set"][-1].fRatio == 8.0
+    assert bass["set"][-1].fThreshold == -20.0
+    assert "cut_off_freq" in dir(bass_fx.LPF(1))
+
+
+def test_peak_eq_bands(bass):
+    eq = bass_fx.PeakEq(1)
+    low = eq.add_band(center=125, gain=3)
+    high = eq.add_band(center=8000, gain=-2, bandwidth=2)
+    assert (low, high) == (0, 1)
+    assert eq.bands == [0, 1]
+    assert eq.get_band(high) == {
+        "center": 8000.0,
+        "gain": -2.0,
+        "bandwidth": 2.0,
+        "q": 0.0,
+        "channel": pybass_fx.BASS_BFX_CHANALL,
+    }
+    assert eq.center == 125.0
+    del bass["set"][:]
+    with eq.batch():
+        eq.set_band(low, gain=4)
+        eq.set_band(high, gain=-4)
+        eq.set_band(low, center=100)
+    assert [(s.lBand, s.fCenter, s.fGain) for s in bass["set"]] == [
+        (0, 100.0, 4.0),
+        (1, 8000.0, -4.0),
+    ]
+    eq.remove_band(low)
+    assert bass["set"][-1].fGain == 0.0
+    assert eq.bands == [1]
+    assert eq.add_band(center=60) == 0
+
+
+def test_multi_band_peak_eq_is_not_captured(bass):
+    eq = bass_fx.PeakEq(1)
+    eq.add_band(center=125, gain=3)
+    assert EffectSpec.from_effect(eq).parameters["center"] == 125.0
+    eq.add_band(center=8000, gain=-2)
+    # Only band 0 would be kept
+    with pytest.raises(ValueError):
+        EffectSpec.from_effect(eq)
+
+
+def test_volume_env_nodes(bass):
+    env = bass_fx.VolumeEnv(1)
+    env.set_nodes([(0, 0.0), (2, 1.0), (4.5, 0.5)], follow=False)
+    sent = bass["set"][-1]
+    assert sent.lNodeCount == 3
+    assert [(sent.pNodes[i].pos, sent.pNodes[i].val) for i in range(3)] == [
+        (0.0, 0.0),
+        (2.0, 1.0),
+        (4.5, 0.5),
+    ]
+    assert sent.bFollow == 0
+    assert env.get_nodes() == [(0.0, 0.0), (2.0, 1.0), (4.5, 0.5)]
+    env.follow = True
+    assert bass["set"][-1].lNodeCount == 3
+    assert bass["get"] == 0
+
+
+def test_mix_mapping(bass):
+    swap = (pybass_fx.BASS_BFX_CHAN2, pybass_fx.BASS_BFX_CHAN1)
+    mix = bass_fx.Mix(1, swap)
+    sent = bass["set"][-1]
+    assert [sent.lChannel[0], sent.lChannel[1]] == list(swap)
+    assert mix.get_mapping() == swap
@@ -0,0 +1,70 @@
+"""Test cases for batched 3d updates."""
+
+from sound_lib.channel import Channel
+from sound_lib.main import batch_3d
+import sound_lib.channel
+import sound_lib.main
+
+
+class FakeBass(object):
+    """Records 3d calls and keeps positions per handle."""
+
+    def __init__(self):
+        self.calls = []
+        self.positions = {}
+
+    def apply(self):
+        self.calls.append("apply")
+        return 1
+
+    def get_position(self, handle, position, orientation, velocity):
+        self.calls.append("get")
+        x, y, z = self.positions.get(handle, (0.0, 0.0, 0.0))
+        position.contents.x, position.contents.y, position.contents.z = x, y, z
+        return 1
+
+    def set_position(self, handle, position, orientation, velocity):
+        self.calls.append("set")
+        vector = position.contents
+        self.positions[handle] = (vector.x, vector.y, vector.z)
+        return 1
+
+
+def install(monkeypatch):
+    bass = FakeBass()
+    monkeypatch.setattr(sound_lib.main, "BASS_Apply3D", bass.apply)
+    monkeypatch.setattr(sound_lib.channel, "BASS_ChannelGet3DPosition", bass.get_position)
+    monkeypatch.setattr(sound_lib.channel, "BASS_ChannelSet3DPosition", bass.set_position)
+    return bass
+
+
+def test_unbatched_changes_apply_immediately(monkeypatch):
+    bass = install(monkeypatch)
+    channel = Channel(1)
+    channel.x = 2.0
+    assert bass.calls == ["get", "set", "apply"]
+    assert bass.positions[1] == (2.0, 0.0, 0.0)
+
+
+def test_batch_applies_once(monkeypatch):
+    """Any number of changes inside a batch cost a single Apply3D."""
+    bass = install(monkeypatch)
+    channels = [Channel(i) for i in range(1, 4)]
+    with batch_3d():
+        for channel in channels:
+            channel.x = 1.0
+            channel.y = 2.0
+            channel.z = 3.0
+        with batch_3d():
+            channels[0].x = 5.0
+        assert "apply" not in bass.calls
+    assert bass.calls.count("apply") == 1
+    assert bass.positions[1] == (5.0, 2.0, 3.0)
+    assert bass.positions[3] == (1.0, 2.0, 3.0)
+
+
+def test_empty_batch_does_not_apply(monkeypatch):
+    bass = install(monkeypatch)
+    with batch_3d():
+        pass
+    assert bass.calls == []
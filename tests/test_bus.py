@@ -0,0 +1,126 @@
+"""Test cases for sound_lib.bus."""
+
+import pytest
+
+import sound_lib.bus
+import sound_lib.mixer
+from sound_lib.bus import Bus
+from sound_lib.channel import Channel
+from sound_lib.external import pybassmix
+from sound_lib.external.pybass import BASS_CHANNELINFO
+
+
+class FakeBass(object):
+    """Tracks which mixer each handle is plugged into."""
+
+    def __init__(self):
+        self.next_handle = 100
+        self.mixer_of = {}
+        self.volumes = {}
+
+    def __call__(self, func, *args):
+        if func is pybassmix.BASS_Mixer_StreamCreate or func is pybassmix.BASS_Split_StreamCreate:
+            self.next_handle += 1
+            return self.next_handle
+        if func is pybassmix.BASS_Mixer_StreamAddChannel:
+            mixer, channel, flags = args
+            assert channel not in self.mixer_of
+            self.mixer_of[channel] = mixer
+        elif func is pybassmix.BASS_Mixer_ChannelRemove:
+            del self.mixer_of[args[0]]
+        return 1
+
+    def get_mixer(self, handle):
+        return self.mixer_of.get(handle, 0)
+
+
+@pytest.fixture
+def bass(monkeypatch):
+    bass = FakeBass()
+    monkeypatch.setattr(sound_lib.mixer, "bass_call", bass)
+    monkeypatch.setattr(sound_lib.bus, "bass_call", bass)
+    monkeypatch.setattr(pybassmix, "BASS_Mixer_ChannelGetMixer", bass.get_mixer)
+    monkeypatch.setattr(
+        Channel, "set_attribute", lambda self, attribute, value: bass.volumes.__setitem__(self.handle, value)
+    )
+    monkeypatch.setattr(
+        Channel, "get_info", lambda self: BASS_CHANNELINFO(freq=48000, chans=2)
+    )
+    return bass
+
+
+def test_bus_feeds_its_parent(bass):
+    master = sound_lib.mixer.Mixer(decode=True)
+    bus = Bus(master)
+    nested = Bus(bus)
+    assert bass.mixer_of[bus.handle] == master.handle
+    assert bass.mixer_of[nested.handle] == bus.handle
+
+
+def test_route_moves_sources_between_buses(bass):
+    master = sound_lib.mixer.Mixer(decode=True)
+    dry, wet = Bus(master), Bus(master)
+    source = Channel(5)
+    dry.route(source)
+    assert bass.mixer_of[5] == dry.handle
+    wet.route(source)
+    assert bass.mixer_of[5] == wet.handle
+    assert wet.route(source) is True
+    wet.unroute(source)
+    assert 5 not in bass.mixer_of
+
+
+def test_send_creates_one_splitter_per_source(bass):
+    master = sound_lib.mixer.Mixer(decode=True)
+    reverb = Bus(master)
+    source = Channel(5)
+    split = reverb.send(source, 0.3)
+    assert bass.mixer_of[split.handle] == reverb.handle
+    assert bass.volumes[split.handle] == 0.3
+    assert reverb.send(source, 0.6) is split
+    assert bass.volumes[split.handle] == 0.6
+    assert 5 not in bass.mixer_of
+
+
+def test_effects_are_applied_to_the_bus(bass, monkeypatch):
+    created = []
+
+    class FakeEffect(object):
+        @classmethod
+        def _check_parameters(cls, names):
+            for name in names:
+                if name != "reverb_time":
+                    raise ValueError(name)
+
+        def __init__(self, channel, priority=0):
+            self.channel = channel
+            self.values = {}
+            self.removed = False
+            created.append(self)
+
+        def batch(self):
+            import contextlib
+
+            return contextlib.nullcontext()
+
+        def __setattr__(self, name, value):
+            if name in ("channel", "values", "removed"):
+                object.__setattr__(self, name, value)
+            else:
+                self.values[name] = value
+
+        def remove(self):
+            self.removed = True
+
+    master = sound_lib.mixer.Mixer(decode=True)
+    bus = Bus(master)
+    effect = bus.add_effect(FakeEffect, reverb_time=2000)
+    assert effect.channel is bus
+    assert effect.values == {"reverb_time": 2000}
+    with pytest.raises(ValueError):
+        bus.add_effect(FakeEffect, reverb_tme=2000)
+    # Rejected before the effect is created
+    assert len(created) == 1
+    bus.remove_effect(effect)
+    assert effect.removed
+    assert bus.effects == []
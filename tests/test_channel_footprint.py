@@ -0,0 +1,167 @@
+"""Benchmarks for the per-instance cost of channel objects."""
+
+import gc
+import time
+import tracemalloc
+
+import pytest
+
+import sound_lib.channel
+from sound_lib.external import pybass
+import sound_lib.stream
+from sound_lib.bus import Bus
+from sound_lib.channel import Channel
+from sound_lib.effects.tempo import Tempo
+from sound_lib.mixer import Mixer
+from sound_lib.music import Music
+from sound_lib.recording import Recording, WaveRecording
+from sound_lib.stream import (
+    BaseStream,
+    FileStream,
+    FileUserStream,
+    PushStream,
+    Stream,
+    URLStream,
+)
+
+CHANNEL_CLASSES = [
+    Channel,
+    BaseStream,
+    Stream,
+    FileStream,
+    URLStream,
+    PushStream,
+    FileUserStream,
+    Mixer,
+    Bus,
+    Tempo,
+    Music,
+    Recording,
+    WaveRecording,
+]
+
+
+@pytest.mark.parametrize("cls", CHANNEL_CLASSES)
+def test_no_instance_dict(cls):
+    """Channel classes use __slots__, so instances carry no __dict__."""
+    instance = cls.__new__(cls)
+    assert not hasattr(instance, "__dict__")
+
+
+def test_mappings_are_shared():
+    """Flag and attribute mappings are built once per class, not per instance."""
+    first, second = Channel(1), Channel(2)
+    assert first.attribute_mapping is second.attribute_mapping
+    assert first.flag_mapping is second.flag_mapping
+    with pytest.raises(TypeError):
+        Channel.attribute_mapping["volume"] = 0
+    assert Tempo.attribute_mapping["volume"] == Channel.attribute_mapping["volume"]
+    assert "free_source" in Tempo.flag_mapping
+    assert "unicode" in FileStream.flag_mapping
+
+
+@pytest.mark.parametrize("cls", [FileStream, Mixer, Music, Recording, Tempo])
+def test_add_attributes_to_mapping(cls, monkeypatch):
+    """Extra attributes apply to one slotted instance, leaving the class mapping alone."""
+    calls = []
+    monkeypatch.setattr(
+        sound_lib.channel, "bass_call", lambda func, *args: calls.append(args) or 1
+    )
+    first, second = cls.__new__(cls), cls.__new__(cls)
+    first.handle = second.handle = 5
+    first.add_attributes_to_mapping(custom=0x13000)
+    assert first._attributes()["custom"] == 0x13000
+    assert first._attributes()["volume"] == cls.attribute_mapping["volume"]
+    assert "custom" not in second._attributes() and "custom" not in cls.attribute_mapping
+    first.set_attribute("custom", 0.5)
+    assert calls[-1][:2] == (5, 0x13000)
+
+
+def test_one_time_syncs_are_not_kept(monkeypatch):
+    """A one-time sync's callback is dropped from the channel once it fires."""
+    procs = []
+    monkeypatch.setattr(
+        sound_lib.channel,
+        "bass_call",
+        lambda func, *args: procs.append(args[3]) or 100 + len(procs)
+        if func is pybass.BASS_ChannelSetSync
+        else 1,
+    )
+    channel = Channel(1)
+    fired = []
+    for i in range(3):
+        channel.set_sync(pybass.BASS_SYNC_POS, i, lambda *args: fired.append(args[0]), onetime=True)
+    repeating = channel.set_sync(pybass.BASS_SYNC_END, 0, lambda *args: fired.append("end"))
+    assert len(channel._syncs) == 4
+    procs[0](101, 1, 0, None)
+    procs[2](103, 1, 0, None)
+    procs[3](repeating, 1, 0, None)
+    assert fired == [101, 103, "end"]
+    assert sorted(channel._syncs) == [102, repeating]
+    # Their callbacks are kept until the channel is next changed, from outside BASS's threads
+    assert channel._fired_syncs == [procs[0], procs[2]]
+    monkeypatch.setattr(sound_lib.channel, "_on_bass_thread", lambda: True)
+    channel.remove_sync(102)
+    assert len(channel._fired_syncs) == 2
+    monkeypatch.setattr(sound_lib.channel, "_on_bass_thread", lambda: False)
+    channel.free()
+    assert channel._fired_syncs == []
+
+
+def test_push_stream_flags(monkeypatch):
+    """Flags still resolve through the class-level mapping."""
+    calls = []
+    monkeypatch.setattr(
+        sound_lib.stream, "bass_call", lambda func, *args: calls.append(args) or 7
+    )
+    stream = PushStream(decode=True, autofree=True)
+    assert stream.handle == 7
+    flags = calls[0][2]
+    assert flags == PushStream.flag_mapping["decode"] | PushStream.flag_mapping["autofree"]
+
+
+def test_old_style_flag_mapping(monkeypatch):
+    """Subclasses extending the flag mapping per instance, as they used to, still work."""
+    calls = []
+    monkeypatch.setattr(
+        sound_lib.stream, "bass_call", lambda func, *args: calls.append(args) or 7
+    )
+
+    class OldStyleStream(PushStream):
+        def setup_flag_mapping(self):
+            super(OldStyleStream, self).setup_flag_mapping()
+            self.flag_mapping.update({"custom": 0x8000000})
+
+    stream = OldStyleStream(decode=True)
+    assert calls[0][2] == PushStream.flag_mapping["decode"]
+    assert stream.flags_for(custom=True, loop=True) == 0x8000000 | PushStream.flag_mapping["loop"]
+    assert stream.flag_mapping["custom"] == 0x8000000
+    assert "custom" not in PushStream.flag_mapping
+    assert PushStream(decode=True).handle == 7
+
+
+def test_channel_memory_per_instance():
+    """A Channel costs a few hundred bytes at most, including the weak reference the reaper keeps to it."""
+    count = 2000
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        channels = [Channel(100000 + i) for i in range(count)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    per_instance = (after - before) / float(count)
+    assert per_instance < 400, per_instance
+    del channels
+
+
+def test_stream_construction_time(monkeypatch):
+    """Constructing a stream object adds little on top of the BASS call itself."""
+    monkeypatch.setattr(sound_lib.stream, "bass_call", lambda func, *args: 1)
+    count = 10000
+    start = time.perf_counter()
+    streams = [PushStream(decode=True) for i in range(count)]
+    elapsed = time.perf_counter() - start
+    assert elapsed / count < 50e-6, elapsed
+    del streams
@@ -0,0 +1,72 @@
+"""Test cases for sound_lib.effects.effect."""
+
+import ctypes
+
+import pytest
+
+from sound_lib.effects.bass import Reverb
+from sound_lib.external import pybass
+
+
+@pytest.fixture
+def bass(monkeypatch):
+    calls = {"get": 0, "set": []}
+    state = pybass.BASS_DX8_REVERB(0.0, 0.0, 1000.0, 0.001)
+
+    def get_parameters(handle, params):
+        calls["get"] += 1
+        ctypes.memmove(params, ctypes.byref(state), ctypes.sizeof(state))
+        return 1
+
+    def set_parameters(handle, params):
+        ctypes.memmove(ctypes.byref(state), params, ctypes.sizeof(state))
+        calls["set"].append((state.fReverbTime, state.fReverbMix))
+        return 1
+
+    monkeypatch.setattr(pybass, "BASS_ChannelSetFX", lambda channel, type, priority: 5)
+    monkeypatch.setattr(pybass, "BASS_FXGetParameters", get_parameters)
+    monkeypatch.setattr(pybass, "BASS_FXSetParameters", set_parameters)
+    return calls
+
+
+def test_names_are_translated_once_per_class(bass):
+    reverb = Reverb(1)
+    assert "reverb_time" in dir(reverb)
+    assert Reverb._field_names() is Reverb._field_names()
+    assert Reverb._field_names()["reverb_time"] == "fReverbTime"
+    assert reverb._python_to_bass("high_freq_r_t_ratio") == "fHighFreqRTRatio"
+
+
+def test_reads_use_the_cached_parameters(bass):
+    reverb = Reverb(1)
+    assert reverb.reverb_time == 1000.0
+    assert reverb.in_gain == 0.0
+    assert bass["get"] == 1
+
+
+def test_writes_send_one_set_each(bass):
+    reverb = Reverb(1)
+    reverb.reverb_time = 2000
+    reverb.reverb_mix = -6
+    assert bass["set"] == [(2000.0, 0.0), (2000.0, -6.0)]
+    assert bass["get"] == 1
+    assert reverb.reverb_time == 2000.0
+
+
+def test_batch_applies_once(bass):
+    reverb = Reverb(1)
+    with reverb.batch():
+        reverb.reverb_time = 500
+        with reverb.batch():
+            reverb.reverb_mix = -3
+        reverb.set_parameters({"fInGain": -1.0})
+        assert bass["set"] == []
+    assert bass["set"] == [(500.0, -3.0)]
+    assert reverb.get_parameters()["fInGain"] == -1.0
+
+
+def test_unknown_attributes_raise_attribute_error(bass):
+    reverb = Reverb(1)
+    with pytest.raises(AttributeError):
+        reverb.no_such_parameter
+    assert not hasattr(reverb, "no_such_parameter")
@@ -0,0 +1,162 @@
+"""Test cases for sound_lib.effects.chain."""
+
+import ctypes
+
+import pytest
+
+import sound_lib.effects.chain
+from sound_lib.effects.bass import Echo, Reverb
+from sound_lib.effects.bass_fx import VolumeEnv
+from sound_lib.effects.chain import EffectChain, EffectSpec, register_effect
+from sound_lib.effects.effect import SoundEffect
+from sound_lib.external import pybass
+
+
+class FakeBass(object):
+    """Keeps each effect's parameter structure, and counts calls."""
+
+    defaults = {
+        pybass.BASS_FX_DX8_REVERB: pybass.BASS_DX8_REVERB(0.0, 0.0, 1000.0, 0.001),
+        pybass.BASS_FX_DX8_ECHO: pybass.BASS_DX8_ECHO(50.0, 50.0, 500.0, 500.0, False),
+    }
+
+    def __init__(self):
+        self.next_handle = 100
+        self.effects = {}
+        self.calls = {"add": 0, "remove": 0, "get": 0, "set": 0}
+
+    def set_fx(self, channel, effect_type, priority):
+        self.calls["add"] += 1
+        self.next_handle += 1
+        default = self.defaults[effect_type]
+        self.effects[self.next_handle] = type(default).from_buffer_copy(default)
+        return self.next_handle
+
+    def remove_fx(self, channel, fx):
+        self.calls["remove"] += 1
+        return self.effects.pop(fx) is not None
+
+    def get_parameters(self, handle, params):
+        self.calls["get"] += 1
+        state = self.effects[handle]
+        ctypes.memmove(params, ctypes.byref(state), ctypes.sizeof(state))
+        return 1
+
+    def set_parameters(self, handle, params):
+        self.calls["set"] += 1
+        state = self.effects[handle]
+        ctypes.memmove(ctypes.byref(state), params, ctypes.sizeof(state))
+        return 1
+
+
+@pytest.fixture
+def bass(monkeypatch):
+    bass = FakeBass()
+    monkeypatch.setattr(pybass, "BASS_ChannelSetFX", bass.set_fx)
+    monkeypatch.setattr(pybass, "BASS_ChannelRemoveFX", bass.remove_fx)
+    monkeypatch.setattr(pybass, "BASS_FXGetParameters", bass.get_parameters)
+    monkeypatch.setattr(pybass, "BASS_FXSetParameters", bass.set_parameters)
+    return bass
+
+
+def test_json_round_trip():
+    chain = EffectChain().add(Reverb, priority=2, reverb_time=2500.0).add(Echo, feedback=30.0)
+    text = chain.to_json(indent=2)
+    loaded = EffectChain.from_json(text)
+    assert loaded == chain
+    assert loaded.to_list()[0] == {
+        "effect": "sound_lib.effects.bass.Reverb",
+        "priority": 2,
+        "parameters": {"reverb_time": 2500.0},
+    }
+
+
+def test_rejects_unknown_effects_and_parameters():
+    with pytest.raises(ValueError):
+        EffectChain.from_list([{"effect": "os.system"}])
+    with pytest.raises(ValueError):
+        EffectChain.from_list([{"effect": "sound_lib.effects.bass.Nothing"}])
+    with pytest.raises(ValueError):
+        EffectChain.from_list([{"effect": "sound_lib.effects.bass.SoundEffect"}])
+    with pytest.raises(ValueError):
+        EffectChain().add(Reverb, loudness=11)
+    with pytest.raises(ValueError):
+        EffectSpec(VolumeEnv)
+
+
+def test_presets_only_import_known_modules(monkeypatch):
+    imported = []
+    monkeypatch.setattr(
+        sound_lib.effects.chain.importlib, "import_module", lambda name: imported.append(name)
+    )
+    with pytest.raises(ValueError):
+        EffectChain.from_list([{"effect": "antigravity.Effect"}])
+    assert imported == []
+
+
+def test_registered_effects_load(monkeypatch):
+    monkeypatch.setattr(sound_lib.effects.chain, "_registered", {})
+
+    @register_effect
+    class Distortion(SoundEffect):
+        effect_type = pybass.BASS_FX_DX8_DISTORTION
+        struct = pybass.BASS_DX8_DISTORTION
+
+    chain = EffectChain().add(Distortion, gain=-10.0)
+    assert EffectChain.from_json(chain.to_json()) == chain
+    with pytest.raises(ValueError):
+        register_effect(dict)
+
+
+def test_apply_costs_two_calls_per_effect(bass):
+    chain = EffectChain().add(Reverb, reverb_time=2500.0).add(Echo, feedback=30.0)
+    effects = chain.apply(1)
+    assert [type(e) for e in effects] == [Reverb, Echo]
+    # Missing parameters are read once, for the first channel
+    assert bass.calls == {"add": 2, "remove": 0, "get": 2, "set": 2}
+    assert effects[0].reverb_time == 2500.0
+    assert effects[0].high_freq_r_t_ratio == pytest.approx(0.001)
+    assert bass.effects[effects[1].handle].fFeedback == 30.0
+    chain.apply(2)
+    assert bass.calls == {"add": 4, "remove": 0, "get": 2, "set": 4}
+
+
+def test_switching_reuses_unchanged_effects(bass):
+    indoor = EffectChain().add(Reverb, reverb_time=800.0).add(Echo, feedback=10.0)
+    cave = EffectChain().add(Reverb, reverb_time=3000.0).add(Echo, feedback=10.0)
+    effects = indoor.apply(1)
+    before = dict(bass.calls)
+    switched = cave.apply(1, effects)
+    assert switched[0] is effects[0] and switched[1] is effects[1]
+    # Only the reverb's parameters differ
+    assert bass.calls["add"] == before["add"]
+    assert bass.calls["remove"] == before["remove"]
+    assert bass.calls["set"] == before["set"] + 1
+    assert bass.effects[effects[0].handle].fReverbTime == 3000.0
+    # Switching to the same chain costs nothing
+    before = dict(bass.calls)
+    cave.apply(1, switched)
+    assert bass.calls == before
+
+
+def test_switching_adds_and_removes(bass):
+    effects = EffectChain().add(Reverb).add(Echo, priority=1).apply(1)
+    echo = effects[1]
+    dry = EffectChain().add(Echo, priority=1)
+    left = dry.apply(1, effects)
+    assert left == [echo]
+    assert effects[0].handle not in bass.effects
+    # A different priority means a different effect
+    moved = EffectChain().add(Echo, priority=5).apply(1, left)
+    assert moved[0] is not echo
+    assert echo.handle not in bass.effects
+
+
+def test_capture_from_effects(bass):
+    effects = EffectChain().add(Reverb, reverb_time=1200.0).apply(1)
+    effects[0].reverb_mix = -4.0
+    chain = EffectChain.from_effects(effects)
+    spec = chain.specs[0]
+    assert spec.parameters["reverb_mix"] == -4.0
+    assert spec.parameters["reverb_time"] == 1200.0
+    assert EffectChain.from_json(chain.to_json()) == chain
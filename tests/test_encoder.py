@@ -0,0 +1,523 @@
+"""Test cases for sound_lib.encoder."""
+
+import asyncio
+import ctypes
+import http.server
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+import pytest
+
+import sound_lib.channel
+import sound_lib.encoder
+from sound_lib.encoder import (
+    AdmissionPolicy,
+    BroadcastEncoder,
+    Encoder,
+    EncoderGroup,
+    EncoderMonitor,
+    MetadataUpdater,
+    RotatingEncoder,
+    Server,
+    command_line,
+)
+from sound_lib.external import pybass, pybassenc
+
+
+class FakeBass(object):
+    """Records BASS calls, and what Encode_Write was given."""
+
+    def __init__(self):
+        self.calls = []
+        self.written = []
+
+    def __call__(self, func, *args):
+        self.calls.append((func, args))
+        if func is pybassenc.BASS_Encode_Write:
+            buffer, length = args[1], args[2]
+            self.written.append((buffer, ctypes.string_at(buffer, length)))
+        if func is pybass.BASS_StreamCreate:
+            return 50
+        return 7
+
+
+class FakeSource(object):
+    handle = 1
+
+
+@pytest.fixture
+def bass(monkeypatch):
+    bass = FakeBass()
+    monkeypatch.setattr(sound_lib.encoder, "bass_call", bass)
+    monkeypatch.setattr(sound_lib.channel, "bass_call", bass)
+    return bass
+
+
+def test_command_lines():
+    cmd, flags = command_line("mp3", "my song.mp3", bitrate=192)
+    assert cmd == b'lame --silent -b 192 - "my song.mp3"'
+    assert flags == {"fp_16bit": True}
+    assert command_line("flac", quality=8) == (
+        b"flac --silent --force -8 -o - -",
+        {"fp_24bit": True},
+    )
+    assert command_line("opus", bitrate=96)[0] == b"opusenc --quiet --bitrate 96 - -"
+    assert command_line("ogg", "out.ogg", quality=5)[0] == b"oggenc --quiet -q 5 -o out.ogg -"
+    with pytest.raises(ValueError):
+        command_line("flac", bitrate=128)
+    with pytest.raises(ValueError):
+        command_line("wma")
+
+
+def test_from_pcm_wraps_a_dummy_stream(bass):
+    encoder = Encoder.from_pcm(48000, 2, b"lame - out.mp3", fp_16bit=True)
+    func, args = bass.calls[0]
+    assert func is pybass.BASS_StreamCreate
+    assert args[:3] == (48000, 2, pybass.BASS_STREAM_DECODE | pybass.BASS_SAMPLE_FLOAT)
+    func, args = bass.calls[1]
+    assert func is pybassenc.BASS_Encode_Start
+    assert args[0] == 50
+    # Not paused, and converting to 16-bit
+    assert args[2] == pybassenc.BASS_ENCODE_FP_16BIT
+    encoder.stop()
+    assert bass.calls[-1] == (pybass.BASS_StreamFree, (50,))
+
+
+def test_write_does_not_copy_writable_buffers(bass):
+    encoder = Encoder.from_pcm(44100, 1, b"cat", sample_format="h")
+    data = bytearray(b"\x01\x00\x02\x00")
+    encoder.write(data)
+    buffer, written = bass.written[-1]
+    assert written == bytes(data)
+    assert ctypes.addressof(buffer) == ctypes.addressof(ctypes.c_char.from_buffer(data))
+    encoder.write(b"\x03\x00")
+    assert bass.written[-1] == (b"\x03\x00", b"\x03\x00")
+
+
+def test_write_numpy(bass):
+    numpy = pytest.importorskip("numpy")
+    encoder = Encoder.from_pcm(44100, 2, b"cat")
+    samples = numpy.linspace(-1, 1, 20, dtype=numpy.float32).reshape(10, 2)
+    encoder.write(samples)
+    buffer, written = bass.written[-1]
+    assert ctypes.addressof(buffer) == samples.ctypes.data
+    assert written == samples.tobytes()
+    # Non-contiguous data is copied first
+    encoder.write(samples[::2])
+    assert bass.written[-1][1] == samples[::2].tobytes()
+    with pytest.raises(ValueError):
+        encoder.write(samples.astype(numpy.int16))
+
+
+def test_stats(bass, monkeypatch):
+    counts = {
+        pybassenc.BASS_ENCODE_COUNT_IN: 1000,
+        pybassenc.BASS_ENCODE_COUNT_OUT: 200,
+        pybassenc.BASS_ENCODE_COUNT_QUEUE: 50,
+        pybassenc.BASS_ENCODE_COUNT_QUEUE_LIMIT: 100,
+        pybassenc.BASS_ENCODE_COUNT_QUEUE_FAIL: 0,
+    }
+    monkeypatch.setattr(
+        pybassenc, "BASS_Encode_GetCount", lambda handle, count: counts.get(count, -1)
+    )
+    monkeypatch.setattr(pybassenc, "BASS_Encode_IsActive", lambda handle: pybass.BASS_ACTIVE_PAUSED)
+    encoder = Encoder(FakeSource(), b"cat", queue=True, limit=True)
+    assert encoder.stats() == {
+        "state": "paused",
+        "in": 1000,
+        "out": 200,
+        "cast": None,
+        "queue": 50,
+        "queue_limit": 100,
+        "queue_fail": 0,
+    }
+
+
+def test_group_shares_one_source(bass):
+    group = EncoderGroup(
+        FakeSource(),
+        [command_line("mp3", bitrate=128), {"name": "archive", "command_line": b"flac -", "queue": True}],
+    )
+    starts = [args for func, args in bass.calls if func is pybassenc.BASS_Encode_Start]
+    assert [args[0] for args in starts] == [1, 1]
+    assert starts[0][2] == pybassenc.BASS_ENCODE_FP_16BIT | pybassenc.BASS_ENCODE_PAUSE
+    assert starts[1][2] == pybassenc.BASS_ENCODE_QUEUE | pybassenc.BASS_ENCODE_PAUSE
+    assert len(group) == 2 and group["archive"] is list(group)[1]
+    del bass.calls[:]
+    group.start()
+    assert [func for func, args in bass.calls] == [
+        pybass.BASS_ChannelLock,
+        pybassenc.BASS_Encode_SetPaused,
+        pybassenc.BASS_Encode_SetPaused,
+        pybass.BASS_ChannelLock,
+    ]
+    assert bass.calls[1][1][1] is False
+    other = FakeSource()
+    other.handle = 2
+    group.set_channel(other)
+    assert bass.calls[-2] == (pybassenc.BASS_Encode_SetChannel, (7, 2))
+    assert group.source is other and group["archive"].source is other
+
+
+def test_group_duplicate_names_stop_started_encoders(bass):
+    with pytest.raises(ValueError):
+        EncoderGroup(FakeSource(), [{"name": "a", "command_line": b"cat"}] * 2)
+    assert bass.calls[-1] == (pybassenc.BASS_Encode_Stop, (7,))
+
+
+def test_group_stats(bass, monkeypatch):
+    counts = {pybassenc.BASS_ENCODE_COUNT_IN: 1000, pybassenc.BASS_ENCODE_COUNT_OUT: 300}
+    monkeypatch.setattr(pybassenc, "BASS_Encode_GetCount", lambda handle, count: counts.get(count, -1))
+    monkeypatch.setattr(pybassenc, "BASS_Encode_IsActive", lambda handle: pybass.BASS_ACTIVE_PAUSED)
+    group = EncoderGroup(FakeSource(), [(b"cat", {}), (b"cat", {})])
+    stats = group.stats()
+    assert stats["state"] == "paused"
+    assert (stats["in"], stats["out"], stats["queue"]) == (2000, 600, None)
+    assert stats["encoders"][1]["out"] == 300
+
+
+@pytest.fixture
+def rotating_bass(monkeypatch):
+    """Gives encoders handles from 10 up, with their input counts in counts."""
+    state = {"calls": [], "next": 10, "counts": {}}
+
+    def bass_call(func, *args):
+        state["calls"].append((func, args))
+        if func is pybass.BASS_ChannelGetInfo:
+            info = args[1]._obj
+            info.freq, info.chans = 8000, 1
+        if func is pybassenc.BASS_Encode_Start:
+            state["next"] += 1
+            return state["next"]
+        return 1
+
+    monkeypatch.setattr(sound_lib.encoder, "bass_call", bass_call)
+    monkeypatch.setattr(
+        pybassenc, "BASS_Encode_GetCount", lambda handle, count: state["counts"].get(handle, 0)
+    )
+    return state
+
+
+def test_rotating_encoder(rotating_bass, tmp_path):
+    path = str(tmp_path / "capture.flac")
+    rotating = RotatingEncoder(FakeSource(), path, max_seconds=60, check_interval=100)
+    assert rotating.files == [str(tmp_path / "capture-000.flac")]
+    start = [args for func, args in rotating_bass["calls"] if func is pybassenc.BASS_Encode_Start][0]
+    assert start[1].startswith(b"flac ") and str(tmp_path / "capture-000.flac").encode() in start[1]
+    rotating_bass["counts"][11] = 8000 * 2 * 59
+    assert not rotating.check()
+    rotating_bass["counts"][11] = 8000 * 2 * 60
+    del rotating_bass["calls"][:]
+    assert rotating.check()
+    assert [func for func, args in rotating_bass["calls"]] == [
+        pybass.BASS_ChannelLock,
+        pybassenc.BASS_Encode_Start,
+        pybassenc.BASS_Encode_SetPaused,
+        pybass.BASS_ChannelLock,
+        pybassenc.BASS_Encode_Stop,
+    ]
+    assert rotating_bass["calls"][2][1] == (11, True)
+    assert rotating.encoder.handle == 12
+    assert rotating.files[-1] == str(tmp_path / "capture-001.flac")
+    rotating.stop()
+    rotating.stop()
+    assert rotating_bass["calls"][-1] == (pybassenc.BASS_Encode_Stop, (12,))
+
+
+def test_rotating_encoder_by_size_and_template(rotating_bass, tmp_path):
+    path = str(tmp_path / "{index}.wav")
+    rotating = RotatingEncoder(FakeSource(), path, max_bytes=10, check_interval=100)
+    assert rotating.files == [str(tmp_path / "0.wav")]
+    assert not rotating.check()
+    with open(rotating.files[0], "wb") as f:
+        f.write(b"x" * 10)
+    assert rotating.check()
+    assert rotating.files[-1] == str(tmp_path / "1.wav")
+    rotating.stop()
+    with pytest.raises(ValueError):
+        RotatingEncoder(FakeSource(), str(tmp_path / "capture.xyz"))
+
+
+class ScriptedEncoder(object):
+    """An encoder whose stats are set by the test."""
+
+    handle = 3
+
+    def __init__(self):
+        self.counts = {
+            "state": "active",
+            "in": 0,
+            "out": 0,
+            "cast": None,
+            "queue": 0,
+            "queue_limit": 1000,
+            "queue_fail": 0,
+        }
+
+    def stats(self):
+        return dict(self.counts)
+
+
+def test_monitor_rates_and_queue_events():
+    encoder = ScriptedEncoder()
+    monitor = EncoderMonitor(high=0.8, low=0.5)
+    events = []
+    monitor.add_listener(lambda event, name, enc, record: events.append((event, name)))
+    monitor.add(encoder, name="radio")
+    record = monitor.sample(now=0.0)["radio"]
+    assert record["in_rate"] is None and record["queue_fill"] == 0
+    encoder.counts.update({"in": 4000, "out": 1000, "queue": 900})
+    record = monitor.sample(now=2.0)["radio"]
+    assert (record["in_rate"], record["out_rate"], record["queue_fill"]) == (2000, 500, 0.9)
+    encoder.counts.update({"out": 2000, "queue": 700})
+    monitor.sample(now=3.0)
+    encoder.counts.update({"out": 3000, "queue": 400, "queue_fail": 10})
+    monitor.sample(now=4.0)
+    assert events == [("queue_high", "radio"), ("queue_low", "radio"), ("queue_fail", "radio")]
+    assert len(monitor.history_of("radio")) == 4
+
+
+def test_monitor_detects_stalls_and_stops():
+    encoder = ScriptedEncoder()
+    monitor = EncoderMonitor(stall_after=5)
+    events = []
+    monitor.add_listener(lambda event, name, enc, record: events.append(event))
+    monitor.add(encoder)
+    for now in range(0, 8):
+        monitor.sample(now=float(now))
+    assert events == ["stall"]
+    encoder.counts["out"] = 10
+    monitor.sample(now=8.0)
+    encoder.counts["state"] = "stopped"
+    monitor.sample(now=9.0)
+    monitor.sample(now=10.0)
+    assert events == ["stall", "recovered", "stopped"]
+
+
+def test_monitor_listener_errors_are_logged(caplog):
+    encoder = ScriptedEncoder()
+    encoder.counts["state"] = "stopped"
+    monitor = EncoderMonitor()
+    monitor.add_listener(lambda *args: 1 / 0)
+    monitor.add(encoder)
+    monitor.sample(now=0.0)
+    assert "Error in encoder monitor listener" in caplog.text
+
+
+REQUEST = b"GET / HTTP/1.0\r\nHost: radio\r\nIcy-MetaData: 1\r\nUser-Agent: player\r\n\r\n"
+
+
+def test_admission_policy():
+    policy = AdmissionPolicy(
+        max_clients=2,
+        allow=["10.0.0.0/8", "::1"],
+        deny=["10.0.0.13"],
+        headers={"User-Agent": None, "Host": "radio"},
+    )
+    headers = {"user-agent": "player", "host": "radio"}
+    assert policy.admit("10.1.2.3", headers, 0)
+    assert policy.admit("::1", headers, 1)
+    assert not policy.admit("10.1.2.3", headers, 2)
+    assert not policy.admit("192.168.0.1", headers, 0)
+    assert not policy.admit("10.0.0.13", headers, 0)
+    assert not policy.admit("10.1.2.3", {"host": "radio"}, 0)
+    assert not policy.admit("10.1.2.3", dict(headers, host="tv"), 0)
+    assert not AdmissionPolicy(check=lambda address, headers: False).admit("10.1.2.3", {}, 0)
+
+
+@pytest.fixture
+def server(bass, monkeypatch):
+    counts = {"out": 1000}
+    kicked = []
+    monkeypatch.setattr(
+        pybassenc,
+        "BASS_Encode_GetCount",
+        lambda handle, count: counts["out"] if count == pybassenc.BASS_ENCODE_COUNT_OUT else -1,
+    )
+    monkeypatch.setattr(
+        pybassenc, "BASS_Encode_ServerKick", lambda handle, client: kicked.append(client) or 1
+    )
+    server = Server(FakeSource(), 8000, burst=100, policy=AdmissionPolicy(max_clients=1), max_events=2)
+    server.counts, server.kicked = counts, kicked
+    return server
+
+
+def test_server_events_and_client_stats(server, monkeypatch):
+    now = [10.0]
+    monkeypatch.setattr(sound_lib.encoder.time, "monotonic", lambda: now[0])
+    assert server.client_callback(1, True, b"10.0.0.1:5000", REQUEST, None)
+    assert not server.client_callback(1, True, b"10.0.0.2:5000", REQUEST, None)
+    event = server.events.get_nowait()
+    assert (event.kind, event.client, event.headers["icy-metadata"]) == ("connect", "10.0.0.1:5000", "1")
+    assert server.events.get_nowait().kind == "reject"
+    now[0] = 15.0
+    server.counts["out"] = 3000
+    assert server.clients["10.0.0.1:5000"]["bytes_sent"] == 2100
+    assert server.clients["10.0.0.1:5000"]["duration"] == 5.0
+    server.client_callback(1, False, b"10.0.0.1:5000", None, None)
+    event = server.events.get_nowait()
+    assert (event.kind, event.bytes_sent, event.duration) == ("disconnect", 2100, 5.0)
+    assert server.clients == {}
+    # Rejected clients don't disconnect
+    server.client_callback(1, False, b"10.0.0.2:5000", None, None)
+    assert server.events.empty()
+
+
+def test_server_drops_events_when_full(server):
+    for port in range(4):
+        server.client_callback(1, True, b"10.0.0.%d:80" % port, REQUEST, None)
+    assert server.events.qsize() == 2
+    assert server.dropped_events == 2
+
+
+def test_server_async_subscribers(server):
+    async def main():
+        events = server.subscribe()
+        server.client_callback(1, True, b"10.0.0.1:5000", REQUEST, None)
+        event = await asyncio.wait_for(events.get(), 5)
+        server.unsubscribe(events)
+        server.client_callback(1, False, b"10.0.0.1:5000", None, None)
+        await asyncio.sleep(0)
+        return event, events.qsize()
+
+    event, remaining = asyncio.run(main())
+    assert event.kind == "connect" and remaining == 0
+
+
+def test_server_survives_closed_loops_and_broken_policies(server, caplog):
+    loop = asyncio.new_event_loop()
+    server.subscribe(loop)
+    loop.close()
+    assert server.client_callback(1, True, b"10.0.0.1:5000", REQUEST, None)
+    assert server._subscribers == []
+    assert server.events.get_nowait().kind == "connect"
+
+    def admit(address, headers, connected):
+        raise KeyError("host")
+
+    server.policy.admit = admit
+    assert not server.client_callback(1, True, b"10.0.0.2:5000", REQUEST, None)
+    assert list(server.clients) == ["10.0.0.1:5000"]
+    assert server.events.get_nowait().kind == "reject"
+    assert "Error in admission policy" in caplog.text
+
+
+def test_server_kick(server):
+    assert server.kick("10.0.0.1:5000")
+    assert server.kick()
+    assert server.kicked == [b"10.0.0.1:5000", None]
+
+
+class IcecastStandIn(http.server.ThreadingHTTPServer):
+    """Answers title updates and stats requests like Icecast, slowly."""
+
+    daemon_threads = True
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.requests = []
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(handler):
+                self.requests.append(handler.path)
+                time.sleep(self.delay)
+                body = b"<icestats><listeners>%d</listeners></icestats>" % len(self.requests)
+                handler.send_response(200)
+                handler.send_header("Content-Length", str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, *args):
+                pass
+
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:%d" % self.server_address[1]
+
+    def get(self, path):
+        with urllib.request.urlopen(self.url + path, timeout=5) as response:
+            return response.read()
+
+
+@pytest.fixture
+def icecast():
+    server = IcecastStandIn(0.05)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TitleCaster(object):
+    """Sends titles to the stand-in the way BASS_Encode_CastSetTitle does."""
+
+    def __init__(self, icecast):
+        self.icecast = icecast
+
+    def set_title(self, title, url=None):
+        song = urllib.parse.quote(title.decode("utf-8"))
+        self.icecast.get("/admin/metadata?mode=updinfo&mount=/live&song=" + song)
+
+
+def test_metadata_updater_does_not_block_and_coalesces(icecast):
+    updater = MetadataUpdater(TitleCaster(icecast), min_interval=0.2)
+    began = time.monotonic()
+    for i in range(5):
+        updater.set_title(b"Track %d" % i)
+    assert time.monotonic() - began < icecast.delay
+    assert updater.flush(5)
+    updater.set_title(b"Later")
+    updater.stop()
+    songs = [urllib.parse.parse_qs(urllib.parse.urlsplit(path).query)["song"][0] for path in icecast.requests]
+    # Titles set while one is being sent collapse into the latest
+    assert songs[-1] == "Later"
+    assert "Track 4" in songs and len(songs) <= 3
+    assert updater.sent == len(songs) and updater.current == (b"Later", None)
+    assert updater.coalesced == 5 - (len(songs) - 1)
+
+
+def test_metadata_updater_rate_limit_and_errors(caplog):
+    sent = []
+
+    class Flaky(object):
+        def set_title(self, title, url=None):
+            sent.append(time.monotonic())
+            if title == b"bad":
+                raise RuntimeError("server down")
+
+    updater = MetadataUpdater(Flaky(), min_interval=0.1)
+    updater.set_title(b"bad")
+    updater.flush(5)
+    updater.set_title(b"good", b"http://example.com")
+    updater.stop()
+    assert sent[1] - sent[0] >= 0.1
+    assert (updater.sent, updater.failed) == (1, 1)
+    assert updater.current == (b"good", b"http://example.com")
+    assert "Unable to update the title" in caplog.text
+
+
+def test_broadcast_stats_are_cached(icecast, monkeypatch):
+    def bass_call(func, *args):
+        if func is pybassenc.BASS_Encode_CastGetStats:
+            return icecast.get("/admin/stats")
+        return 1
+
+    monkeypatch.setattr(sound_lib.encoder, "bass_call", bass_call)
+    broadcast = BroadcastEncoder(FakeSource(), b"localhost/live", b"hackme", "mp3", stats_ttl=60)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(broadcast.get_stats("icecast_server")))
+        for i in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert icecast.requests == ["/admin/stats"]
+    assert set(results) == {b"<icestats><listeners>1</listeners></icestats>"}
+    assert broadcast.get_stats("icecast_server", max_age=0).endswith(b"2</listeners></icestats>")
+    assert asyncio.run(broadcast.aget_stats("icecast_server")).endswith(b"2</listeners></icestats>")
+    assert len(icecast.requests) == 2
@@ -0,0 +1,86 @@
+"""Test cases for sound_lib.finalizer."""
+
+import threading
+import time
+
+from sound_lib.external.pybass import BASS_ERROR_HANDLE
+from sound_lib.finalizer import HandleReaper
+import sound_lib.finalizer
+
+
+class FakeFree(object):
+    """Records the handles it is asked to free."""
+
+    def __init__(self, fail=()):
+        self.freed = []
+        self.fail = set(fail)
+
+    def __call__(self, handle):
+        self.freed.append(handle)
+        return handle not in self.fail
+
+
+def test_enqueued_handles_wait_for_flush():
+    """Enqueueing only queues the handle; freeing happens on flush."""
+    reaper = HandleReaper()
+    reaper._start = lambda: None  # keep the work on this thread
+    free = FakeFree()
+    reaper.enqueue(free, 10)
+    assert free.freed == []
+    assert reaper.stats()["pending"] == 1
+    assert reaper.flush() == 1
+    assert free.freed == [10]
+    stats = reaper.stats()
+    assert stats["leaked"] == 1
+    assert stats["freed"] == 1
+    assert stats["pending"] == 0
+
+
+def test_double_frees_are_counted(monkeypatch):
+    """A handle which is already gone is counted as a double free."""
+    reaper = HandleReaper()
+    reaper._start = lambda: None
+    monkeypatch.setattr(sound_lib.finalizer, "BASS_ErrorGetCode", lambda: BASS_ERROR_HANDLE)
+    free = FakeFree(fail=[1])
+    for i in range(3):
+        reaper.enqueue(free, i)
+    reaper.flush()
+    stats = reaper.stats()
+    assert stats["leaked"] == 3
+    assert stats["freed"] == 2
+    assert stats["double_frees"] == 1
+
+
+def test_background_thread_frees_batches():
+    """The reaper's own thread frees handles in batches."""
+    reaper = HandleReaper(batch_size=2, interval=0)
+    free = FakeFree()
+    for i in range(5):
+        reaper.enqueue(free, i)
+    deadline = time.time() + 2
+    while len(free.freed) < 5 and time.time() < deadline:
+        time.sleep(0.001)
+    assert sorted(free.freed) == [0, 1, 2, 3, 4]
+    assert reaper._thread is not threading.current_thread()
+
+
+def test_closed_reaper_ignores_handles():
+    """Once closed at exit, leaked handles are left for BASS to clean up."""
+    reaper = HandleReaper()
+    reaper.close()
+    free = FakeFree()
+    reaper.enqueue(free, 1)
+    assert reaper.stats()["pending"] == 0
+    assert reaper._thread is None
+
+
+def test_interpreter_exit_does_not_hang():
+    """Objects collected during interpreter teardown don't try to start the reaper thread."""
+    import subprocess
+    import sys
+
+    script = (
+        "from sound_lib.channel import Channel\n"
+        "channels = [Channel(i) for i in range(1, 10)]\n"
+    )
+    subprocess.run([sys.executable, "-c", script], timeout=20, check=True)
@@ -0,0 +1,97 @@
+"""Test cases for sound_lib.listener."""
+
+import pytest
+
+from sound_lib.external.pybass import BASS_3DVECTOR
+from sound_lib.listener import Listener
+import sound_lib.listener
+import sound_lib.main
+
+
+class FakeBass(object):
+    """Stands in for the BASS listener calls."""
+
+    def __init__(self):
+        self.state = {
+            "position": (0.0, 0.0, 0.0),
+            "velocity": (0.0, 0.0, 0.0),
+            "front": (0.0, 0.0, 1.0),
+            "top": (0.0, 1.0, 0.0),
+        }
+        self.gets = 0
+        self.sets = []
+        self.applies = 0
+
+    def get(self, *vectors):
+        self.gets += 1
+        for vector, field in zip(vectors, sound_lib.listener._FIELDS):
+            vector.contents.x, vector.contents.y, vector.contents.z = self.state[field]
+        return 1
+
+    def set(self, *vectors):
+        sent = {}
+        for vector, field in zip(vectors, sound_lib.listener._FIELDS):
+            if vector:
+                sent[field] = (vector.contents.x, vector.contents.y, vector.contents.z)
+        self.state.update(sent)
+        self.sets.append(sent)
+        return 1
+
+    def apply(self):
+        self.applies += 1
+        return 1
+
+
+@pytest.fixture
+def bass(monkeypatch):
+    bass = FakeBass()
+    monkeypatch.setattr(sound_lib.listener, "BASS_Get3DPosition", bass.get)
+    monkeypatch.setattr(sound_lib.listener, "BASS_Set3DPosition", bass.set)
+    monkeypatch.setattr(sound_lib.main, "BASS_Apply3D", bass.apply)
+    monkeypatch.setattr(sound_lib.listener, "_state", sound_lib.listener._ListenerState())
+    return bass
+
+
+def test_state_is_read_once(bass):
+    listener = Listener()
+    assert listener.front_z == 1.0
+    assert listener.top_y == 1.0
+    assert Listener().position.x == 0.0
+    assert bass.gets == 1
+
+
+def test_only_changed_vectors_are_sent(bass):
+    listener = Listener()
+    listener.x = 3.0
+    assert bass.sets == [{"position": (3.0, 0.0, 0.0)}]
+    assert bass.applies == 1
+    listener.x = 3.0
+    assert listener.set_3d_position(front=BASS_3DVECTOR(0, 0, 1)) is False
+    assert len(bass.sets) == 1
+    assert bass.applies == 1
+
+
+def test_batched_update(bass):
+    listener = Listener()
+    assert listener.set_3d_position(position=(1, 2, 3), front=(1, 0, 0), top=(0, 0, 1))
+    assert bass.sets == [
+        {"position": (1.0, 2.0, 3.0), "front": (1.0, 0.0, 0.0), "top": (0.0, 0.0, 1.0)}
+    ]
+    assert bass.applies == 1
+
+
+def test_top_properties_use_top(bass):
+    listener = Listener()
+    listener.top_x = 0.5
+    assert bass.state["top"] == (0.5, 1.0, 0.0)
+    assert bass.state["front"] == (0.0, 0.0, 1.0)
+
+
+def test_auto_velocity(bass, monkeypatch):
+    clock = iter([10.0, 10.5])
+    monkeypatch.setattr(sound_lib.listener.time, "monotonic", lambda: next(clock))
+    listener = Listener(auto_velocity=True)
+    listener.position = (0, 0, 0)
+    listener.position = (1, 0, -2)
+    assert bass.state["velocity"] == (2.0, 0.0, -4.0)
+    assert bass.applies == 1
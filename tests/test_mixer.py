@@ -0,0 +1,85 @@
+"""Test cases for sound_lib.mixer."""
+
+import ctypes
+import struct
+
+import pytest
+
+import sound_lib.mixer
+from sound_lib.external.pybass import (
+    BASS_CHANNELINFO,
+    BASS_SAMPLE_FLOAT,
+    BASS_STREAM_DECODE,
+)
+from sound_lib.mixer import Mixer
+
+
+def make_mixer(monkeypatch, flags=BASS_STREAM_DECODE, available=None):
+    """Create a Mixer whose BASS calls are replaced by fakes."""
+    monkeypatch.setattr(sound_lib.mixer, "bass_call", lambda func, *args: 1)
+    mixer = Mixer(decode=True)
+    info = BASS_CHANNELINFO(freq=100, chans=2, flags=flags)
+    monkeypatch.setattr(Mixer, "get_info", lambda self: info)
+    state = {"left": available, "calls": 0}
+
+    def get_data(handle, buf, length):
+        state["calls"] += 1
+        if state["left"] is not None:
+            length = min(length, state["left"])
+            state["left"] -= length
+        ctypes.memset(buf, 1, length)
+        return length
+
+    monkeypatch.setattr(sound_lib.mixer, "BASS_ChannelGetData", get_data)
+    return mixer, state
+
+
+class TestRender:
+    """Test Mixer.render."""
+
+    def test_render_duration_to_wav(self, monkeypatch, tmp_path):
+        """Rendering a fixed duration writes a complete WAV file."""
+        mixer, state = make_mixer(monkeypatch, BASS_STREAM_DECODE | BASS_SAMPLE_FLOAT)
+        path = tmp_path / "out.wav"
+        result = mixer.render(str(path), duration=2, block=256)
+        assert result["bytes"] == 2 * 100 * 2 * 4
+        assert result["seconds"] == 2
+        assert result["realtime_factor"] > 0
+        data = path.read_bytes()
+        header = struct.unpack("<4sI4s4sIHHIIHH4sI", data[:44])
+        assert header[5] == 3  # IEEE float
+        assert header[-1] == result["bytes"]
+        assert len(data) == 44 + result["bytes"]
+        assert state["calls"] == 7
+
+    def test_render_until_end(self, monkeypatch, tmp_path):
+        """Without a duration, rendering stops once the mixer stops producing data."""
+        mixer, state = make_mixer(monkeypatch, available=1000)
+        result = mixer.render(str(tmp_path / "out.wav"), block=300)
+        assert result["bytes"] == 1000
+
+    def test_render_to_encoder(self, monkeypatch):
+        """Encoders not attached to the mixer are fed with BASS_Encode_Write."""
+        import sound_lib.external.pybassenc as pybassenc
+
+        mixer, state = make_mixer(monkeypatch, available=500)
+        written = []
+        monkeypatch.setattr(
+            sound_lib.mixer,
+            "bass_call",
+            lambda func, handle, buf, length: written.append((func, length)) or 1,
+        )
+
+        class FakeEncoder(object):
+            handle = 5
+            source = None
+
+        mixer.render(FakeEncoder(), block=200)
+        write = pybassenc.BASS_Encode_Write
+        assert written == [(write, 200), (write, 200), (write, 100)]
+
+    def test_render_requires_decoding_mixer(self, monkeypatch, tmp_path):
+        """Playing mixers can't be rendered offline."""
+        mixer, state = make_mixer(monkeypatch, flags=0)
+        with pytest.raises(ValueError):
+            mixer.render(str(tmp_path / "out.wav"))
@@ -0,0 +1,248 @@
+"""Test cases for sound_lib.effects.numpy_dsp."""
+
+import ctypes
+import tracemalloc
+
+import pytest
+
+numpy = pytest.importorskip("numpy")
+
+import sound_lib.channel
+import sound_lib.effects.numpy_dsp
+from sound_lib.channel import Channel
+from sound_lib.effects.numpy_dsp import (
+    Band,
+    Compressor,
+    Equalizer,
+    Gate,
+    Limiter,
+    _sliding_min,
+)
+from sound_lib.external.pybass import BASS_CHANNELINFO, BASS_SAMPLE_FLOAT
+
+RATE = 44100
+
+
+def blocks(signal, sizes):
+    """Splits a signal into consecutive blocks of the given sizes, repeating them as needed."""
+    start, i = 0, 0
+    while start < len(signal):
+        size = sizes[i % len(sizes)]
+        yield signal[start : start + size]
+        start += size
+        i += 1
+
+
+def run(effect, signal, sizes=(441,)):
+    signal = numpy.array(signal, numpy.float32)
+    for block in blocks(signal, sizes):
+        effect.process(block)
+    return signal
+
+
+def reference_biquads(bands, signal):
+    """Filters sample by sample in direct form I, in float64."""
+    out = numpy.array(signal, numpy.float64)
+    for band in bands:
+        b0, b1, b2, a1, a2 = band.coefficients(RATE)
+        x1 = x2 = y1 = y2 = numpy.zeros(out.shape[1])
+        for n in range(len(out)):
+            x = out[n].copy()
+            y = b0 * x + b1 * x1 + b2 * x2 - a1 * y1 - a2 * y2
+            x2, x1, y2, y1 = x1, x, y1, y
+            out[n] = y
+    return out
+
+
+def test_sliding_min():
+    values = numpy.random.RandomState(1).rand(50)
+    for width in (1, 3, 7, 50):
+        expected = [values[i : i + width].min() for i in range(len(values) - width + 1)]
+        assert numpy.allclose(_sliding_min(values, width), expected)
+
+
+def test_equalizer_matches_direct_form():
+    signal = numpy.random.RandomState(2).uniform(-1, 1, (3000, 2))
+    bands = [
+        Band("highpass", 100),
+        Band("peaking", 2500, q=2, gain=6),
+        Band("highshelf", 8000, gain=-3),
+    ]
+    eq = Equalizer(bands=bands, chunk=64)
+    eq.configure(RATE, 2)
+    # Irregular block sizes, including single frames and blocks longer than a chunk
+    out = run(eq, signal, sizes=(1, 200, 63, 2, 441))
+    assert numpy.allclose(out, reference_biquads(bands, signal), atol=1e-5)
+
+
+@pytest.mark.parametrize("kind", Band.kinds)
+def test_band_kinds_are_stable(kind):
+    eq = Equalizer(bands=[Band(kind, 1000, q=1, gain=6)])
+    eq.configure(RATE, 1)
+    signal = numpy.random.RandomState(3).uniform(-1, 1, (800, 1))
+    assert numpy.allclose(run(eq, signal), reference_biquads(eq.bands, signal), atol=1e-5)
+
+
+def test_equalizer_flat_without_bands():
+    eq = Equalizer()
+    eq.configure(RATE, 2)
+    signal = numpy.random.RandomState(4).uniform(-1, 1, (500, 2))
+    assert numpy.array_equal(run(eq, signal), signal.astype(numpy.float32))
+
+
+def test_equalizer_band_changes():
+    eq = Equalizer()
+    eq.configure(RATE, 1)
+    band = eq.add_band("lowpass", 500)
+    eq.set_band(band, freq=1000, q=2)
+    assert (band.freq, band.q) == (1000, 2)
+    signal = numpy.random.RandomState(5).uniform(-1, 1, (600, 1))
+    assert numpy.allclose(run(eq, signal), reference_biquads([band], signal), atol=1e-5)
+    with pytest.raises(ValueError):
+        eq.set_band(band, kind="wobble")
+    eq.remove_band(band)
+    assert eq.bands == []
+    with pytest.raises(ValueError):
+        Band("wobble", 100)
+
+
+def test_limiter_keeps_peaks_under_ceiling():
+    limiter = Limiter(ceiling=-6, lookahead=2, hold=10)
+    limiter.configure(RATE, 2)
+    t = numpy.arange(RATE // 2) / float(RATE)
+    signal = numpy.stack([numpy.sin(2 * numpy.pi * 220 * t)] * 2, axis=1) * 0.2
+    signal[5000:5100] *= 10
+    out = run(limiter, signal, sizes=(300, 7))
+    assert numpy.abs(out).max() <= 10 ** (-6 / 20.0) + 1e-5
+    # Quiet parts pass through unchanged, delayed by the lookahead
+    delay = int(round(limiter.latency * RATE))
+    assert delay == 88
+    assert numpy.allclose(out[delay + 100 : 3000], signal[100 : 3000 - delay], atol=1e-6)
+
+
+def test_limiter_grows_for_long_blocks():
+    signal = numpy.random.RandomState(7).uniform(-2, 2, (RATE * 2, 2))
+    outputs = []
+    for sizes in ((441,), (100, RATE, 50)):
+        limiter = Limiter(ceiling=-3)
+        limiter.configure(RATE, 2)
+        outputs.append(run(limiter, signal, sizes))
+    # The state carries over into the larger arrays
+    assert limiter._capacity == RATE
+    assert numpy.allclose(outputs[0], outputs[1], atol=1e-6)
+
+
+@pytest.mark.parametrize(
+    "effect",
+    [
+        Equalizer(bands=[Band("highpass", 100), Band("peaking", 3000, gain=-4)]),
+        Limiter(),
+        Compressor(),
+        Gate(),
+    ],
+    ids=["Equalizer", "Limiter", "Compressor", "Gate"],
+)
+def test_processing_does_not_allocate(effect):
+    effect.configure(RATE, 2)
+    block = numpy.random.RandomState(8).uniform(-1, 1, (4410, 2)).astype(numpy.float32)
+    effect.process(block)
+    tracemalloc.start()
+    try:
+        for i in range(3):
+            effect.process(block)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    # Only small Python objects: a copy of even one chunk of the equalizer's would be more
+    assert peak < 4096
+
+
+def test_compressor_reduces_loud_signals():
+    compressor = Compressor(threshold=-20, ratio=4, attack=1, release=50, knee=0)
+    compressor.configure(RATE, 1)
+    loud = numpy.full((RATE // 4, 1), 0.5)  # about -6 dBFS
+    out = run(compressor, loud)
+    level = 20 * numpy.log10(out[-1, 0])
+    # 14 dB over the threshold comes out 3.5 dB over it
+    assert abs(level - (-20 + 14 / 4.0 + 20 * numpy.log10(0.5) + 6.0206)) < 0.1
+    quiet = numpy.full((1000, 1), 0.01)
+    compressor.reset()
+    assert numpy.allclose(run(compressor, quiet), quiet)
+
+
+def test_compressor_gain_reduction_curve():
+    compressor = Compressor(threshold=-20, ratio=2, knee=10)
+    levels = numpy.array([-40, -25, -20, -15, 0])
+    reduction = compressor.gain_reduction(levels)
+    assert reduction[0] == reduction[1] == 0
+    assert -2.5 < reduction[2] < 0
+    assert reduction[3] == pytest.approx(-2.5)
+    assert reduction[4] == pytest.approx(-10)
+
+
+def test_gate_closes_on_quiet_signals():
+    gate = Gate(threshold=-40, range=-60, attack=1, release=10, hold=10)
+    gate.configure(RATE, 2)
+    rng = numpy.random.RandomState(6)
+    loud = rng.uniform(-0.5, 0.5, (RATE // 10, 2))
+    quiet = rng.uniform(-0.001, 0.001, (RATE // 2, 2))
+    out = run(gate, numpy.concatenate((loud, quiet)))
+    assert numpy.allclose(out[2000:4410], loud[2000:], atol=1e-6)
+    assert numpy.abs(out[-1000:]).max() < 0.001 * 10 ** (-55 / 20.0)
+    assert not gate._open
+
+
+def test_parameters_update_derived_state():
+    limiter = Limiter()
+    limiter.configure(RATE, 1)
+    limiter.lookahead = 10
+    assert limiter.lookahead == 10.0
+    assert limiter.latency == pytest.approx(0.01)
+    assert limiter._frames == 441
+    assert limiter._delay.shape == (441 + limiter._capacity, 1)
+
+
+class FakeChannel(object):
+    def __init__(self, flags=BASS_SAMPLE_FLOAT):
+        self.flags = flags
+        self.dsps = {}
+
+    def get_info(self):
+        return BASS_CHANNELINFO(freq=RATE, chans=2, flags=self.flags)
+
+    def set_dsp(self, callback, user=None, priority=0):
+        self.dsps[1] = callback
+        return 1
+
+    def remove_dsp(self, dsp):
+        return self.dsps.pop(dsp) is not None
+
+
+def test_dsp_callback_processes_buffer_in_place():
+    channel = FakeChannel()
+    gate = Gate(channel, threshold=-20, range=-120, hold=1, release=0)
+    buffer = (ctypes.c_float * 200)(*([0.001] * 200))
+    channel.dsps[1](1, 0, ctypes.addressof(buffer), ctypes.sizeof(buffer), None)
+    assert abs(buffer[-1]) < 1e-7
+    assert gate.detach()
+    assert not channel.dsps
+
+
+def test_requires_float_data(monkeypatch):
+    monkeypatch.setattr(sound_lib.effects.numpy_dsp, "BASS_GetConfig", lambda option: 0)
+    with pytest.raises(ValueError):
+        Limiter(FakeChannel(flags=0))
+    monkeypatch.setattr(sound_lib.effects.numpy_dsp, "BASS_GetConfig", lambda option: 1)
+    assert Limiter(FakeChannel(flags=0)).handle == 1
+
+
+def test_channel_keeps_dsp_callbacks_alive(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        sound_lib.channel, "bass_call", lambda func, *args: calls.append(func) or 5
+    )
+    channel = Channel(12345)
+    dsp = channel.set_dsp(lambda *args: None)
+    assert dsp == 5 and 5 in channel._dsps
+    channel.remove_dsp(dsp)
+    assert not channel._dsps
@@ -0,0 +1,138 @@
+"""Test cases for sound_lib.playlist."""
+
+import time
+
+from sound_lib.external.pybass import BASS_SYNC_END, BASS_SYNC_POS
+from sound_lib.playlist import QueuePlayer
+
+
+class FakeStream(object):
+    """Stands in for a decoding FileStream."""
+
+    def __init__(self, name, handle):
+        self.name = name
+        self.handle = handle
+        self.syncs = {}
+        self.freed = False
+
+    def get_length(self):
+        return 1000
+
+    def seconds_to_bytes(self, seconds):
+        return int(seconds * 100)
+
+    def set_sync(self, type, param, callback, mixtime=False, onetime=False):
+        assert mixtime
+        self.syncs[type] = (param, callback)
+
+    def fire(self, type):
+        callback = self.syncs[type][1]
+        callback(1, self.handle, 0, None)
+
+    def free(self):
+        self.freed = True
+
+
+class FakeMixer(object):
+    """Records what a QueuePlayer does to its mixer."""
+
+    def __init__(self):
+        self.sources = []
+        self.envelopes = {}
+        self.playing = False
+
+    def seconds_to_bytes(self, seconds):
+        return int(seconds * 400)
+
+    def add_channel(self, channel, norampin=False):
+        self.sources.append(channel)
+
+    def remove_channel(self, channel):
+        self.sources.remove(channel)
+
+    def set_envelope(self, channel, nodes):
+        self.envelopes[channel.name] = nodes
+
+    def lock(self):
+        pass
+
+    def unlock(self):
+        pass
+
+    def play(self):
+        self.playing = True
+
+
+def wait_for(condition, timeout=2.0):
+    end = time.time() + timeout
+    while not condition():
+        assert time.time() < end, "timed out"
+        time.sleep(0.001)
+
+
+def make_player(items, **kwargs):
+    opened = []
+
+    def factory(item):
+        stream = FakeStream(item, len(opened) + 1)
+        opened.append(stream)
+        return stream
+
+    mixer = FakeMixer()
+    player = QueuePlayer(items, mixer=mixer, stream_factory=factory, **kwargs)
+    return player, mixer, opened
+
+
+class TestQueuePlayer:
+    """Test QueuePlayer advancing through its queue."""
+
+    def test_gapless_advance_on_end(self):
+        """The next item joins the mixer from the current one's end sync."""
+        advanced = []
+        player, mixer, opened = make_player(
+            ["a", "b", "c"], on_advance=advanced.append
+        )
+        try:
+            player.play()
+            wait_for(lambda: player.current == "a")
+            wait_for(lambda: len(opened) == 2)
+            assert BASS_SYNC_POS not in opened[0].syncs
+            opened[0].fire(BASS_SYNC_END)
+            assert player.current == "b"
+            assert [s.name for s in mixer.sources] == ["b"]
+            wait_for(lambda: opened[0].freed)
+            wait_for(lambda: advanced == ["a", "b"])
+            wait_for(lambda: len(opened) == 3)
+        finally:
+            player.close()
+        assert all(s.freed for s in opened)
+
+    def test_crossfade_overlaps_items(self):
+        """With a crossfade, the next item starts from a position sync and both are faded."""
+        player, mixer, opened = make_player(["a", "b"], crossfade=2)
+        try:
+            player.play()
+            wait_for(lambda: player.current == "a")
+            wait_for(lambda: len(opened) == 2)
+            assert opened[0].syncs[BASS_SYNC_POS][0] == 800
+            opened[0].fire(BASS_SYNC_POS)
+            assert player.current == "b"
+            assert [s.name for s in mixer.sources] == ["a", "b"]
+            assert mixer.envelopes["a"] == [(0, 1.0), (800, 0.0)]
+            assert mixer.envelopes["b"] == [(0, 0.0), (800, 1.0)]
+            opened[0].fire(BASS_SYNC_END)
+            assert player.current == "b"
+            assert [s.name for s in mixer.sources] == ["b"]
+        finally:
+            player.close()
+
+    def test_items_added_after_running_dry_start_playing(self):
+        """Items queued once playback has run out start as soon as they are open."""
+        player, mixer, opened = make_player([])
+        try:
+            player.play()
+            assert player.current is None
+            player.add("late")
+            wait_for(lambda: player.current == "late")
+        finally:
+            player.close()
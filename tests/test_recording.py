@@ -0,0 +1,193 @@
+"""Test cases for sound_lib.recording."""
+
+import ctypes
+import threading
+import time
+import wave
+
+import pytest
+
+import sound_lib.channel
+import sound_lib.encoder
+import sound_lib.recording
+from sound_lib.external import pybass
+from sound_lib.external import pybassenc
+from sound_lib.main import BassError
+from sound_lib.recording import Recording, WaveRecording
+
+
+@pytest.fixture
+def bass(monkeypatch):
+    calls = []
+
+    def bass_call(func, *args):
+        calls.append(func)
+        if func is pybass.BASS_ChannelGetInfo:
+            info = args[1]._obj
+            info.freq, info.chans = 44100, 2
+        if func is pybassenc.BASS_Encode_Start:
+            calls.append(args)
+            return 9
+        return 3
+
+    monkeypatch.setattr(sound_lib.recording, "bass_call", bass_call)
+    monkeypatch.setattr(sound_lib.channel, "bass_call", bass_call)
+    monkeypatch.setattr(sound_lib.encoder, "bass_call", bass_call)
+    return calls
+
+
+def record(recording, data):
+    buffer = ctypes.create_string_buffer(data, len(data))
+    return recording._recording_callback(3, ctypes.addressof(buffer), len(data), None)
+
+
+def test_recording_is_written_by_the_writer_thread(bass, tmp_path):
+    path = str(tmp_path / "out.wav")
+    recording = WaveRecording(path, frequency=8000, channels=1, write_size=64)
+    recording.play()
+    sent = [bytes([i]) * 20 for i in range(1, 30)]
+    for data in sent:
+        assert record(recording, data)
+    recording.pause()
+    recording.play()
+    record(recording, b"\x7f" * 20)
+    recording.stop()
+    assert pybass.BASS_ChannelStop in bass
+    with wave.open(path) as f:
+        assert (f.getnchannels(), f.getsampwidth(), f.getframerate()) == (1, 2, 8000)
+        assert f.readframes(1000) == b"".join(sent) + b"\x7f" * 20
+    assert recording.overruns == 0
+
+
+def test_slow_disk_does_not_block_the_callback(bass, tmp_path):
+    path = str(tmp_path / "out.wav")
+    # A quarter of a second of 8 kHz mono
+    recording = WaveRecording(path, frequency=8000, channels=1, buffer_seconds=0.25)
+    recording.play()
+    blocked = threading.Event()
+    release = threading.Event()
+    writeframes = recording.file.writeframes
+
+    def slow_writeframes(data):
+        blocked.set()
+        release.wait(5)
+        writeframes(data)
+
+    recording.file.writeframes = slow_writeframes
+    record(recording, b"\x01" * 1000)
+    assert blocked.wait(5)
+    began = time.monotonic()
+    for i in range(10):
+        record(recording, b"\x02" * 1000)
+    assert time.monotonic() - began < 0.5
+    release.set()
+    recording.stop()
+    # 4000 bytes fit in the ring buffer, so 6 of the 10 buffers were dropped
+    assert (recording.overruns, recording.dropped_bytes) == (6, 6000)
+    with wave.open(path) as f:
+        assert f.readframes(10000) == b"\x01" * 1000 + b"\x02" * 4000
+
+
+def test_default_callback_keeps_recording(bass):
+    recording = Recording()
+    assert recording.callback(3, None, 0, None) == 1
+    assert recording.encoder is None
+
+
+def test_recording_encodes_to_a_file(bass, tmp_path):
+    path = str(tmp_path / "capture.opus")
+    recording = Recording(encode_to=path, bitrate=64, rotate_seconds=3600)
+    start = bass[bass.index(pybassenc.BASS_Encode_Start) + 1]
+    # Encoding the recording channel itself
+    assert start[0] == 3
+    assert start[1].startswith(b"opusenc --quiet --bitrate 64 - ")
+    assert recording.encoder.files == [str(tmp_path / "capture-000.opus")]
+    recording.stop()
+    # The encoder is stopped before the recording, which frees it
+    assert bass[-2:] == [pybassenc.BASS_Encode_Stop, pybass.BASS_ChannelStop]
+    assert recording.encoder.stopped
+
+
+def test_stop_after_the_channel_freed_its_encoders(bass, monkeypatch, tmp_path):
+    pytest.importorskip("numpy")
+    freed = []
+
+    def bass_call(func, *args):
+        if func is pybass.BASS_ChannelStop:
+            freed.append(args[0])
+        if func is pybassenc.BASS_Encode_Stop and freed:
+            raise BassError(pybass.BASS_ERROR_HANDLE, "invalid handle")
+        bass.append(func)
+        return 3
+
+    recording = Recording(encode_to=str(tmp_path / "capture.flac"))
+    recording.enable_preroll(0.1)
+    recording.start_saving(str(tmp_path / "preroll.wav"))
+    monkeypatch.setattr(sound_lib.channel, "bass_call", bass_call)
+    monkeypatch.setattr(sound_lib.encoder, "bass_call", bass_call)
+    recording.stop()
+    assert freed == [3]
+    assert bass[-2:] == [pybassenc.BASS_Encode_Stop, pybass.BASS_ChannelStop]
+    assert recording.encoder.stopped
+    assert not recording.preroll.saving
+
+
+def test_rotating_encoder_already_freed(bass, monkeypatch, tmp_path):
+    recording = Recording(encode_to=str(tmp_path / "capture.flac"))
+
+    def bass_call(func, *args):
+        if func is pybassenc.BASS_Encode_Stop:
+            raise BassError(pybass.BASS_ERROR_HANDLE, "invalid handle")
+        return 3
+
+    monkeypatch.setattr(sound_lib.encoder, "bass_call", bass_call)
+    # Eg. the recording stopped because its device went away, freeing the encoder
+    recording.encoder.stop()
+    assert recording.encoder.stopped
+
+
+def feed(recording, samples, ctype=ctypes.c_int16):
+    buffer = (ctype * len(samples))(*samples)
+    return recording._record(3, ctypes.addressof(buffer), ctypes.sizeof(buffer), None)
+
+
+def test_preroll_keeps_the_last_seconds(bass):
+    numpy = pytest.importorskip("numpy")
+    recording = Recording(frequency=10, channels=1)
+    preroll = recording.enable_preroll(1.0)
+    feed(recording, [1000, 2000, 3000])
+    assert numpy.allclose(recording.snapshot()[:, 0], numpy.array([1000, 2000, 3000]) / 32768.0)
+    samples = [i * 100 for i in range(1, 16)]
+    for i in range(0, 15, 4):
+        feed(recording, samples[i : i + 4])
+    kept = recording.snapshot()
+    assert kept.shape == (10, 1) and kept.dtype == numpy.float32
+    assert numpy.allclose(kept[:, 0], numpy.array(samples[-10:]) / 32768.0)
+    # A buffer longer than the pre-roll keeps only its end
+    feed(recording, list(range(25)))
+    assert numpy.allclose(preroll.snapshot()[:, 0], numpy.arange(15, 25) / 32768.0)
+
+
+def test_preroll_saves_kept_and_live_audio(bass, tmp_path):
+    numpy = pytest.importorskip("numpy")
+    path = str(tmp_path / "trigger.wav")
+    recording = Recording(frequency=8000, channels=2, flags=pybass.BASS_SAMPLE_FLOAT)
+    recording.enable_preroll(0.5)
+    before = [0.5, -0.5] * 3
+    after = [0.25, -0.25, 1.5, -1.5]
+    feed(recording, before, ctypes.c_float)
+    recording.start_saving(path)
+    assert recording.preroll.saving
+    feed(recording, after, ctypes.c_float)
+    recording.stop()
+    assert not recording.preroll.saving
+    with wave.open(path) as f:
+        assert (f.getnchannels(), f.getsampwidth(), f.getframerate()) == (2, 2, 8000)
+        saved = numpy.frombuffer(f.readframes(100), "<i2")
+    expected = numpy.clip(numpy.array(before + after), -1, 1) * 32767
+    assert numpy.allclose(saved, expected, atol=1)
+
+
+def test_preroll_needs_enabling(bass):
+    with pytest.raises(ValueError):
+        Recording().snapshot()
@@ -0,0 +1,139 @@
+"""Test cases for sound_lib.registry."""
+
+import gc
+
+from sound_lib.channel import Channel
+from sound_lib.finalizer import HandleReaper
+from sound_lib.registry import HandleRegistry, registry
+import sound_lib.channel
+import sound_lib.registry
+
+
+class FakeFree(object):
+    """Records the handles it is asked to free."""
+
+    def __init__(self):
+        self.freed = []
+
+    def __call__(self, handle):
+        self.freed.append(handle)
+        return True
+
+
+class Owner(object):
+    def __init__(self, handle=0):
+        self.handle = handle
+        self.freed = False
+
+    def free(self):
+        self.freed = True
+
+
+class OtherOwner(Owner):
+    pass
+
+
+def make_registry():
+    reaper = HandleReaper()
+    reaper._start = lambda: None  # keep the work on this thread
+    return HandleRegistry(reaper), reaper
+
+
+def test_collected_objects_go_to_the_reaper():
+    """Objects collected while still tracked have their handles queued for freeing."""
+    reg, reaper = make_registry()
+    free = FakeFree()
+    owner = Owner()
+    reg.track(owner, 10, free)
+    del owner
+    gc.collect()
+    assert reg.live() == []
+    assert reaper.flush() == 1
+    assert free.freed == [10]
+
+
+def test_untracked_objects_are_left_alone():
+    """Handles freed explicitly aren't freed again when their owner goes away."""
+    reg, reaper = make_registry()
+    free = FakeFree()
+    owner = Owner()
+    reg.untrack(reg.track(owner, 11, free))
+    del owner
+    gc.collect()
+    assert reaper.flush() == 0
+    assert free.freed == []
+
+
+def test_counts_and_describe():
+    """Live objects are counted by type and described oldest first."""
+    reg, reaper = make_registry()
+    reg.record_sites = True
+    owners = [Owner(1), OtherOwner(2), Owner(3)]
+    for owner in owners:
+        reg.track(owner, owner.handle)
+    counts = reg.counts()
+    assert counts["Owner"] == 2
+    assert counts["OtherOwner"] == 1
+    assert counts["total"] == 3
+    assert "bass_handles" in counts
+    described = reg.describe()
+    assert [d["handle"] for d in described] == [1, 2, 3]
+    assert "test_counts_and_describe" in described[0]["site"]
+    assert [d["handle"] for d in reg.describe(OtherOwner)] == [2]
+
+
+def test_bulk_channel_operations(monkeypatch):
+    """stop_all, pause_all and fade_all act on every live channel and nothing else."""
+    calls = []
+    for name in ("BASS_ChannelStop", "BASS_ChannelPause"):
+        monkeypatch.setattr(
+            sound_lib.registry, name, lambda handle, name=name: calls.append((name, handle)) or True
+        )
+    monkeypatch.setattr(
+        sound_lib.registry,
+        "BASS_ChannelSlideAttribute",
+        lambda handle, attrib, value, time: calls.append(("slide", handle, value, time)) or True,
+    )
+    reg, reaper = make_registry()
+    monkeypatch.setattr(sound_lib.channel, "registry", reg)
+    channels = [Channel(5), Channel(6)]
+    owner = Owner(7)
+    reg.track(owner, owner.handle)
+    assert reg.stop_all() == 2
+    assert reg.pause_all() == 2
+    assert reg.fade_all(0.5, stop=True) == 2
+    assert sorted(calls) == [
+        ("BASS_ChannelPause", 5),
+        ("BASS_ChannelPause", 6),
+        ("BASS_ChannelStop", 5),
+        ("BASS_ChannelStop", 6),
+        ("slide", 5, -1.0, 500),
+        ("slide", 6, -1.0, 500),
+    ]
+    del channels
+
+
+def test_free_where():
+    """free_where frees the live objects matching the predicate."""
+    reg, reaper = make_registry()
+    owners = [Owner(i) for i in range(4)]
+    for owner in owners:
+        reg.track(owner, owner.handle)
+    assert reg.free_where(lambda o: o.handle % 2 == 0) == 2
+    assert [o.freed for o in owners] == [True, False, True, False]
+
+
+def test_channels_register_and_unregister(monkeypatch):
+    """Channels register themselves on creation and unregister when freed."""
+    free = FakeFree()
+
+    class FakeChannel(Channel):
+        __slots__ = ()
+        _free_function = staticmethod(free)
+
+    monkeypatch.setattr(sound_lib.channel, "bass_call", lambda func, *args: func(*args))
+    channel = FakeChannel(42)
+    assert channel in registry.live(FakeChannel)
+    channel.free()
+    assert free.freed == [42]
+    assert registry.live(FakeChannel) == []
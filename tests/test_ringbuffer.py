@@ -0,0 +1,148 @@
+"""Test cases for sound_lib.ringbuffer and the encoder's chunk queue."""
+
+import asyncio
+import ctypes
+import threading
+
+import pytest
+
+import sound_lib.encoder
+from sound_lib.encoder import Encoder
+from sound_lib.external import pybassenc
+from sound_lib.ringbuffer import RingBuffer
+
+
+def write(ring, data):
+    buffer = ctypes.create_string_buffer(data, len(data))
+    return ring.write(ctypes.addressof(buffer), len(data))
+
+
+def test_chunks_come_out_in_order():
+    ring = RingBuffer(16)
+    assert write(ring, b"abc") and write(ring, b"defg")
+    assert len(ring) == 2 and ring.used == 7
+    assert bytes(ring.get()) == b"abc"
+    ring.release()
+    assert bytes(ring.get()) == b"defg"
+    ring.release()
+    assert ring.get(timeout=0) is None
+
+
+def test_chunks_wrap_around_and_stay_contiguous():
+    ring = RingBuffer(10)
+    assert write(ring, b"aaaa") and write(ring, b"bbbb")
+    ring.get()
+    ring.release()
+    # Doesn't fit after "bbbb", so it goes to the start, before it
+    assert write(ring, b"cccc")
+    assert not write(ring, b"d")
+    assert bytes(ring.get()) == b"bbbb"
+    ring.release()
+    assert bytes(ring.get()) == b"cccc"
+
+
+def test_overflow_drops_and_is_reported(caplog):
+    ring = RingBuffer(8)
+    assert write(ring, b"12345")
+    assert not write(ring, b"6789")
+    assert not write(ring, b"123456789")
+    assert (ring.dropped_bytes, ring.dropped_chunks) == (13, 2)
+    with caplog.at_level("WARNING", logger="sound_lib.ringbuffer"):
+        ring.get()
+        ring.get()
+    assert len(caplog.records) == 1
+    assert "13 bytes dropped" in caplog.records[0].getMessage()
+
+
+def test_iteration_across_threads():
+    ring = RingBuffer(64)
+    sent = [bytes([i]) * (i % 7 + 1) for i in range(200)]
+
+    def produce():
+        for data in sent:
+            # Retry whatever doesn't fit until the consumer catches up
+            while not write(ring, data):
+                pass
+        ring.close()
+
+    thread = threading.Thread(target=produce)
+    thread.start()
+    received = [bytes(chunk) for chunk in ring]
+    thread.join()
+    assert received == sent
+
+
+def test_chunks_are_released_after_use():
+    ring = RingBuffer(8)
+    write(ring, b"abc")
+    ring.close()
+    chunks = list(ring)
+    with pytest.raises(ValueError):
+        bytes(chunks[0])
+    assert ring.used == 0
+
+
+def test_async_iteration():
+    ring = RingBuffer(64)
+
+    async def consume():
+        return [bytes(chunk) async for chunk in ring]
+
+    async def main():
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.01)
+        thread = threading.Thread(
+            target=lambda: [write(ring, b"x%d" % i) for i in range(5)] and ring.close()
+        )
+        thread.start()
+        result = await asyncio.wait_for(task, 5)
+        thread.join()
+        return result
+
+    assert asyncio.run(main()) == [b"x%d" % i for i in range(5)]
+
+
+class FakeSource(object):
+    handle = 1
+
+
+@pytest.fixture
+def bass(monkeypatch):
+    procs = {}
+
+    def bass_call(func, *args):
+        if func is pybassenc.BASS_Encode_Start:
+            procs["encode"] = args[3]
+            return 9
+        if func is pybassenc.BASS_Encode_SetNotify:
+            procs["notify"] = args[1]
+        return 1
+
+    monkeypatch.setattr(sound_lib.encoder, "bass_call", bass_call)
+    return procs
+
+
+def test_encoder_queues_chunks(bass):
+    encoder = Encoder(FakeSource(), b"lame - -", max_queue_bytes=32)
+    for data in (b"first", b"second", b"x" * 40):
+        buffer = ctypes.create_string_buffer(data, len(data))
+        bass["encode"](9, 1, ctypes.addressof(buffer), len(data), None)
+    assert encoder.dropped_bytes == 40
+    chunks = encoder.iter_chunks()
+    assert bytes(next(chunks)) == b"first"
+    encoder.stop()
+    assert [bytes(chunk) for chunk in chunks] == [b"second"]
+
+
+def test_encoder_death_ends_iteration(bass):
+    encoder = Encoder(FakeSource(), b"lame - -", max_queue_bytes=32)
+    bass["notify"](9, pybassenc.BASS_ENCODE_NOTIFY_ENCODER, None)
+    assert list(encoder.iter_chunks()) == []
+
+
+def test_encoder_needs_queue_for_chunks(bass):
+    encoder = Encoder(FakeSource(), b"lame - -")
+    with pytest.raises(ValueError):
+        encoder.iter_chunks()
+    with pytest.raises(ValueError):
+        Encoder(FakeSource(), b"lame - -", callback=lambda *args: None, max_queue_bytes=8)
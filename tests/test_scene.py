@@ -0,0 +1,134 @@
+"""Test cases for sound_lib.scene."""
+
+import pytest
+
+numpy = pytest.importorskip("numpy")
+
+from sound_lib.channel import Channel
+from sound_lib.main import batch_3d
+from sound_lib.scene import Scene
+import sound_lib.main
+import sound_lib.scene
+
+
+class FakeBass(object):
+    """Records the calls a Scene makes and which channels are playing."""
+
+    def __init__(self, playing=()):
+        self.playing = set(playing)
+        self.positions = {}
+        self.applies = 0
+        self.plays = []
+
+    def pause(self, handle):
+        if handle not in self.playing:
+            return 0
+        self.playing.discard(handle)
+        return 1
+
+    def play(self, handle, restart):
+        self.plays.append(handle)
+        self.playing.add(handle)
+        return 1
+
+    def set_position(self, handle, position, orientation, velocity):
+        vector = position.contents
+        self.positions[handle] = (vector.x, vector.y, vector.z)
+        return 1
+
+    def apply(self):
+        self.applies += 1
+        return 1
+
+
+def make_scene(monkeypatch, handles, playing=None, **kwargs):
+    bass = FakeBass(handles if playing is None else playing)
+    monkeypatch.setattr(sound_lib.scene, "BASS_ChannelPause", bass.pause)
+    monkeypatch.setattr(sound_lib.scene, "BASS_ChannelPlay", bass.play)
+    monkeypatch.setattr(sound_lib.scene, "BASS_ChannelSet3DPosition", bass.set_position)
+    monkeypatch.setattr(sound_lib.main, "BASS_Apply3D", bass.apply)
+    scene = Scene(listener=object(), capacity=2, **kwargs)
+    channels = [Channel(handle) for handle in handles]
+    return scene, bass, channels
+
+
+def test_update_pushes_in_range_sources_once(monkeypatch):
+    """Only moved sources in range are sent, with a single Apply3D."""
+    scene, bass, channels = make_scene(monkeypatch, [1, 2, 3], max_distance=10)
+    scene.add(channels[0], position=(1, 0, 0))
+    scene.add(channels[1], position=(0, 5, 0))
+    scene.add(channels[2], position=(0, 0, 50))
+    assert len(scene) == 3
+    res = scene.update((0, 0, 0))
+    assert res == {"culled": 1, "resumed": 0, "updated": 2}
+    assert bass.applies == 1
+    assert bass.positions == {1: (1.0, 0.0, 0.0), 2: (0.0, 5.0, 0.0)}
+    assert scene.audible() == channels[:2]
+    assert scene.distances[:3].tolist() == [1.0, 5.0, 50.0]
+    assert scene.update((0, 0, 0)) == {"culled": 0, "resumed": 0, "updated": 0}
+    assert bass.applies == 1
+
+
+def test_sources_resume_when_back_in_range(monkeypatch):
+    scene, bass, channels = make_scene(monkeypatch, [1], max_distance=10)
+    scene.add(channels[0], position=(20, 0, 0))
+    scene.update((0, 0, 0))
+    assert 1 not in bass.playing
+    assert 1 not in bass.positions
+    scene.move(numpy.array([[-15.0, 0, 0]]))
+    res = scene.update((0, 0, 0))
+    assert res == {"culled": 0, "resumed": 1, "updated": 1}
+    assert bass.positions[1] == (5.0, 0.0, 0.0)
+    assert 1 in bass.playing
+
+
+def test_stopped_sources_are_not_resumed(monkeypatch):
+    """Sources which weren't playing when culled stay stopped."""
+    scene, bass, channels = make_scene(monkeypatch, [1], playing=(), max_distance=10)
+    scene.add(channels[0], position=(20, 0, 0))
+    scene.update((0, 0, 0))
+    scene.set_position(channels[0], position=(1, 0, 0))
+    scene.update((0, 0, 0))
+    assert bass.plays == []
+
+
+def test_out_of_range_sources_are_paused_once(monkeypatch):
+    """BASS is only asked to pause a source as it leaves range, playing or not."""
+    scene, bass, channels = make_scene(monkeypatch, [1, 2], playing=[1], max_distance=10)
+    pauses = []
+    pause = bass.pause
+    monkeypatch.setattr(
+        sound_lib.scene, "BASS_ChannelPause", lambda handle: pauses.append(handle) or pause(handle)
+    )
+    scene.add(channels[0], position=(20, 0, 0))
+    scene.add(channels[1], position=(30, 0, 0))
+    for i in range(3):
+        scene.update((0, 0, 0))
+    assert sorted(pauses) == [1, 2]
+    # Coming back into range and leaving again pauses it again
+    scene.set_position(channels[1], position=(1, 0, 0))
+    scene.update((0, 0, 0))
+    scene.set_position(channels[1], position=(30, 0, 0))
+    scene.update((0, 0, 0))
+    scene.update((0, 0, 0))
+    assert sorted(pauses) == [1, 2, 2]
+
+
+def test_remove_and_grow(monkeypatch):
+    """Removing swaps the last source into the gap; arrays grow past their capacity."""
+    scene, bass, channels = make_scene(monkeypatch, [1, 2, 3, 4])
+    for i, channel in enumerate(channels):
+        scene.add(channel, position=(i, 0, 0))
+    scene.remove(channels[0])
+    assert channels[0] not in scene
+    assert scene.channels == [channels[3], channels[1], channels[2]]
+    assert scene.positions[0].tolist() == [3.0, 0.0, 0.0]
+
+
+def test_update_inside_batch_defers_apply(monkeypatch):
+    scene, bass, channels = make_scene(monkeypatch, [1])
+    scene.add(channels[0])
+    with batch_3d():
+        scene.update((0, 0, 0))
+        assert bass.applies == 0
+    assert bass.applies == 1
@@ -0,0 +1,151 @@
+"""Test cases for sound_lib.spatializer."""
+
+import ctypes
+import math
+
+import pytest
+
+numpy = pytest.importorskip("numpy")
+
+from sound_lib.spatializer import Spatializer
+import sound_lib.spatializer
+
+
+class Info(object):
+    def __init__(self, chans):
+        self.chans = chans
+
+
+class FakeChannel(object):
+    def __init__(self, handle, chans=1):
+        self.handle = handle
+        self.chans = chans
+
+    def get_info(self):
+        return Info(self.chans)
+
+
+class FakeMixer(object):
+    def __init__(self, chans=2):
+        self.chans = chans
+        self.sources = {}
+
+    def get_info(self):
+        return Info(self.chans)
+
+    def add_channel(self, channel, matrix=False, pause=False):
+        assert matrix
+        self.sources[channel.handle] = pause
+
+    def remove_channel(self, channel):
+        del self.sources[channel.handle]
+
+
+class FakeListener(object):
+    """Faces +z with +y up, as BASS does by default."""
+
+    def get_3d_position(self):
+        from sound_lib.external.pybass import BASS_3DVECTOR
+
+        return {"front": BASS_3DVECTOR(0, 0, 1), "top": BASS_3DVECTOR(0, 1, 0)}
+
+
+@pytest.fixture
+def bass(monkeypatch):
+    calls = {"matrices": {}, "flags": []}
+
+    def set_matrix(handle, matrix):
+        # The matrix only has to outlive the call, so copy it now; sources here are at most stereo
+        calls["matrices"][handle] = [matrix[i] for i in range(4)]
+        calls.setdefault("addresses", {}).setdefault(handle, set()).add(
+            ctypes.addressof(matrix.contents)
+        )
+
+    def flags(handle, flags, mask):
+        calls["flags"].append((handle, flags))
+        return flags
+
+    monkeypatch.setattr(sound_lib.spatializer.pybassmix, "BASS_Mixer_ChannelSetMatrix", set_matrix)
+    monkeypatch.setattr(sound_lib.spatializer.pybassmix, "BASS_Mixer_ChannelFlags", flags)
+    return calls
+
+
+def matrix_of(calls, handle, outputs, inputs):
+    values = calls["matrices"][handle]
+    return [[values[o * inputs + i] for i in range(inputs)] for o in range(outputs)]
+
+
+def test_pan_and_rolloff(bass):
+    mixer = FakeMixer()
+    spatializer = Spatializer(mixer, listener=FakeListener(), max_distance=50)
+    right, ahead, far = FakeChannel(1), FakeChannel(2), FakeChannel(3, chans=2)
+    spatializer.add(right, position=(1, 0, 0))
+    spatializer.add(ahead, position=(0, 0, 4))
+    spatializer.add(far, position=(0, 0, 100))
+    res = spatializer.update((0, 0, 0))
+    assert res["updated"] == 2
+    assert res["resumed"] == 2
+    left_gain, right_gain = [row[0] for row in matrix_of(bass, 1, 2, 1)]
+    assert left_gain == pytest.approx(0, abs=1e-6)
+    assert right_gain == pytest.approx(1)
+    centre = [row[0] for row in matrix_of(bass, 2, 2, 1)]
+    assert centre == pytest.approx([0.25 * math.sqrt(0.5)] * 2)
+    assert 3 not in bass["matrices"]
+    assert spatializer.audible() == [right, ahead]
+
+
+def test_only_changed_gains_are_sent(bass):
+    spatializer = Spatializer(FakeMixer(), listener=FakeListener())
+    source = FakeChannel(1)
+    spatializer.add(source, position=(2, 0, 0))
+    spatializer.update((0, 0, 0))
+    bass["matrices"].clear()
+    assert spatializer.update((0, 0, 0))["updated"] == 0
+    spatializer.set_position(source, position=(-2, 0, 0))
+    assert spatializer.update((0, 0, 0))["updated"] == 1
+    left_gain, right_gain = [row[0] for row in matrix_of(bass, 1, 2, 1)]
+    assert left_gain > right_gain
+
+
+def test_head_shadow_attenuates_far_ear(bass):
+    spatializer = Spatializer(FakeMixer(), listener=FakeListener(), head_shadow=0.5)
+    source = FakeChannel(1)
+    spatializer.add(source, position=(1, 0, 1))
+    spatializer.update((0, 0, 0))
+    plain = math.cos((math.sqrt(0.5) + 1) * math.pi / 4)
+    rolloff = 1 / math.sqrt(2)
+    expected = plain * rolloff * (1 - 0.5 * math.sqrt(0.5))
+    assert matrix_of(bass, 1, 2, 1)[0][0] == pytest.approx(expected)
+
+
+def test_matrices_are_reused(bass):
+    spatializer = Spatializer(FakeMixer(), listener=FakeListener())
+    mono, stereo = FakeChannel(1), FakeChannel(2, chans=2)
+    spatializer.add(mono, position=(-1, 0, 0))
+    spatializer.add(stereo, position=(1, 0, 0))
+    spatializer.update((0, 0, 0))
+    spatializer.remove(mono)
+    for x in (2, 3, 4):
+        spatializer.set_position(stereo, position=(x, 0, 0))
+        assert spatializer.update((0, 0, 0))["updated"] == 1
+    # One matrix per source, filled in place on every update, and moved with its source
+    assert len(bass["addresses"][2]) == 1
+    left, right = matrix_of(bass, 2, 2, 2)
+    assert left[0] == left[1] and right[0] == right[1] and right[0] > left[0]
+
+
+def test_out_of_range_sources_are_paused_in_the_mixer(bass):
+    from sound_lib.external.pybassmix import BASS_MIXER_PAUSE
+
+    mixer = FakeMixer()
+    spatializer = Spatializer(mixer, listener=FakeListener(), max_distance=10)
+    source = FakeChannel(1)
+    spatializer.add(source, position=(0, 0, 1))
+    assert mixer.sources == {1: True}
+    spatializer.update((0, 0, 0))
+    assert bass["flags"] == [(1, 0)]
+    spatializer.set_position(source, position=(0, 0, 20))
+    assert spatializer.update((0, 0, 0))["culled"] == 1
+    assert bass["flags"][-1] == (1, BASS_MIXER_PAUSE)
+    spatializer.remove(source)
+    assert mixer.sources == {}
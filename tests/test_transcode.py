@@ -0,0 +1,124 @@
+"""Test cases for sound_lib.transcode."""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import sound_lib.transcode
+from sound_lib.external import pybass
+from sound_lib.transcode import TranscodePool, transcode
+
+
+class FakeStream(object):
+    handle = 5
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.freed = False
+
+    def get_length(self):
+        return 400
+
+    def length_in_seconds(self):
+        return 10.0
+
+    def free(self):
+        self.freed = True
+
+
+class FakeEncoder(object):
+    """Writes what it was fed to its file when stopped, like an encoder finishing."""
+
+    def __init__(self, path):
+        self.path = path
+        self.data = []
+
+    def stop(self):
+        with open(self.path, "w") as f:
+            f.write("".join(self.data))
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    state = {"chunks": [100] * 4, "error": pybass.BASS_ERROR_ENDED}
+    stream = FakeStream([])
+
+    def open_stream(path):
+        stream.chunks = list(state["chunks"])
+        return stream
+
+    def encoder_for(stream, path, spec):
+        state["temp"] = path
+        state["encoder"] = FakeEncoder(path)
+        return state["encoder"]
+
+    def get_data(handle, buffer, length):
+        if not stream.chunks:
+            return 0xFFFFFFFF
+        state["encoder"].data.append("x")
+        return stream.chunks.pop(0)
+
+    monkeypatch.setattr(sound_lib.transcode, "_open", open_stream)
+    monkeypatch.setattr(sound_lib.transcode, "_encoder_for", encoder_for)
+    monkeypatch.setattr(pybass, "BASS_ChannelGetData", get_data)
+    monkeypatch.setattr(pybass, "BASS_ErrorGetCode", lambda: state["error"])
+    state["stream"] = stream
+    return state
+
+
+def test_transcode_replaces_output_when_done(fake, tmp_path):
+    output = tmp_path / "out.mp3"
+    output.write_text("old")
+    progress = []
+    duration, elapsed = transcode(
+        "in.wav", str(output), {"format": "mp3"}, progress=progress.append, progress_interval=0
+    )
+    assert duration == 10.0 and elapsed >= 0
+    assert output.read_text() == "xxxx"
+    assert progress == [0.25, 0.5, 0.75, 1.0, 1.0]
+    assert fake["stream"].freed
+    assert os.listdir(str(tmp_path)) == ["out.mp3"]
+
+
+def test_transcode_failure_leaves_output_alone(fake, tmp_path):
+    output = tmp_path / "out.mp3"
+    output.write_text("old")
+    fake["error"] = pybass.BASS_ERROR_MEM
+    with pytest.raises(sound_lib.transcode.BassError):
+        transcode("in.wav", str(output), {"format": "mp3"})
+    assert output.read_text() == "old"
+    assert fake["stream"].freed
+    assert os.listdir(str(tmp_path)) == ["out.mp3"]
+
+
+def test_pool_retries_and_reports(monkeypatch):
+    attempts = {}
+
+    def flaky(input, output, spec, chunk_size, progress):
+        attempts[input] = attempts.get(input, 0) + 1
+        if input == "broken.wav" or attempts[input] == 1 and input == "flaky.wav":
+            raise IOError("disk on fire")
+        progress(1.0)
+        return 60.0, 2.0
+
+    monkeypatch.setattr(sound_lib.transcode, "transcode", flaky)
+    progress = []
+    with ThreadPoolExecutor(2) as executor:
+        pool = TranscodePool(
+            retries=1, executor=executor, progress=lambda job, f: progress.append((job.input, f))
+        )
+        results = pool.run(
+            [
+                ("ok.wav", "ok.mp3", {"format": "mp3"}),
+                ("flaky.wav", "flaky.mp3", {"format": "mp3"}),
+                ("broken.wav", "broken.mp3", {"format": "mp3"}),
+            ]
+        )
+        pool.shutdown()
+    ok, flaky_result, broken = results
+    assert (ok.realtime_factor, ok.attempts, ok.error) == (30.0, 1, None)
+    assert (flaky_result.attempts, flaky_result.error) == (2, None)
+    assert broken.attempts == 2 and broken.duration is None
+    assert broken.error == "OSError: disk on fire"
+    assert sorted(progress) == [("flaky.wav", 1.0), ("ok.wav", 1.0)]